@@ -6,11 +6,12 @@ from dissect.extfs.exceptions import (
     NotADirectoryError,
     NotASymlinkError,
 )
-from dissect.extfs.extfs import ExtFS, INode
+from dissect.extfs.extfs import DirEntry, ExtFS, INode
 from dissect.extfs.journal import JDB2
 
 __all__ = [
     "JDB2",
+    "DirEntry",
     "Error",
     "ExtFS",
     "FileNotFoundError",
@@ -0,0 +1,477 @@
+from __future__ import annotations
+
+import asyncio
+import io
+import stat
+import struct
+from abc import ABC, abstractmethod
+from bisect import bisect_right
+from typing import TYPE_CHECKING, Protocol
+
+from dissect.extfs.c_ext import EXT2, EXT3, EXT4, c_ext
+from dissect.extfs.exceptions import Error, FileNotFoundError, NotADirectoryError, NotASymlinkError
+from dissect.extfs.extfs import DIR_READ_SIZE, _parse_dir_entries, _parse_inode, _parse_ns_ts
+from dissect.extfs.stream import EXT_INIT_MAX_LEN, Runlist
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator, Awaitable, Callable
+
+    from dissect.extfs.inode import RawInode
+
+DEFAULT_MAX_CONCURRENCY = 64
+# Reads of file data are split in requests of at most this size, so that large runs are read concurrently as well
+MAX_READ_SIZE = 8 * 1024 * 1024
+
+_extent_header = struct.Struct("<4H4x")
+_extent = struct.Struct("<IHHI")
+_extent_idx = struct.Struct("<IIH2x")
+
+
+class AsyncRangeReader(Protocol):
+    """The interface of an asynchronous backend of an image, such as an object store client."""
+
+    async def read_range(self, offset: int, size: int) -> bytes:
+        """Read ``size`` bytes from ``offset``, or less at the end of the image."""
+        ...
+
+
+class AsyncExtFS:
+    """Asynchronous ExtFS implementation, for images that are read through an asynchronous backend.
+
+    Only the read paths are implemented: resolving paths, listing directories and reading files. Reads that don't
+    depend on each other are issued concurrently, such as the children of an extent index node, the inodes of the
+    entries of a directory and the runs of a file. Checksums and the journal are not supported.
+
+    Use :meth:`open` to create an instance.
+
+    Args:
+        reader: The backend to read the image from.
+        sb: The superblock of the filesystem.
+        max_concurrency: The maximum amount of reads to have in flight at the same time.
+    """
+
+    def __init__(
+        self, reader: AsyncRangeReader, sb: c_ext.ext4_super_block, max_concurrency: int = DEFAULT_MAX_CONCURRENCY
+    ):
+        self.reader = reader
+        self.sb = sb
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+        if sb.s_magic != c_ext.EXT2_FS_MAGIC:
+            raise Error("Not a valid ExtFS filesystem (magic mismatch)")
+
+        if sb.s_inodes_count < 10:
+            raise Error("Not a valid ExtFS filesystem (inum count < 10)")
+
+        if sb.s_blocks_per_group == 0 or sb.s_inodes_per_group == 0:
+            raise Error("Not a valid ExtFS filesystem (blocks or inodes per group is 0)")
+
+        self.block_size = c_ext.EXT2_MIN_BLOCK_SIZE << sb.s_log_block_size
+        if self.block_size == 0 or self.block_size % 512:
+            raise Error("Not a valid ExtFS filesystem (invalid block size)")
+
+        if sb.s_feature_incompat & c_ext.EXT4_FEATURE_INCOMPAT_EXTENTS:
+            self.type = EXT4
+        elif sb.s_feature_compat & c_ext.EXT3_FEATURE_COMPAT_HAS_JOURNAL:
+            self.type = EXT3
+        else:
+            self.type = EXT2
+
+        self._has_filetype = bool(sb.s_feature_incompat & c_ext.EXT2_FEATURE_INCOMPAT_FILETYPE)
+
+        self.block_count = (sb.s_blocks_count_hi << 32) | sb.s_blocks_count_lo
+        self.last_block = self.block_count - 1
+
+        if self.type == EXT4 and sb.s_feature_incompat & c_ext.EXT4_FEATURE_INCOMPAT_64BIT and sb.s_desc_size >= 64:
+            self._group_desc_struct = c_ext.ext4_group_desc
+        else:
+            self._group_desc_struct = c_ext.ext2_group_desc
+        self._group_desc_size = sb.s_desc_size if sb.s_desc_size else len(self._group_desc_struct)
+
+        goff = c_ext.EXT2_SBOFF + self._group_desc_size
+        self.groups_offset = goff if goff % self.block_size == 0 else goff + self.block_size - goff % self.block_size
+        self.groups_count = ((self.last_block - sb.s_first_data_block) // sb.s_blocks_per_group) + 1
+
+        self._group_descs = {}
+
+    @classmethod
+    async def open(cls, reader: AsyncRangeReader, max_concurrency: int = DEFAULT_MAX_CONCURRENCY) -> AsyncExtFS:
+        """Open the filesystem on an asynchronous backend.
+
+        Args:
+            reader: The backend to read the image from.
+            max_concurrency: The maximum amount of reads to have in flight at the same time.
+        """
+        buf = await reader.read_range(c_ext.EXT2_SBOFF, len(c_ext.ext4_super_block))
+        if len(buf) != len(c_ext.ext4_super_block):
+            raise Error("Not a valid ExtFS filesystem (truncated superblock)")
+        return cls(reader, c_ext.ext4_super_block(buf), max_concurrency)
+
+    async def read_at(self, offset: int, size: int) -> bytes:
+        """Read ``size`` bytes from ``offset`` of the filesystem."""
+        async with self._semaphore:
+            return await self.reader.read_range(offset, size)
+
+    async def read_block(self, block: int) -> bytes:
+        """Read a single block."""
+        return await self.read_at(block * self.block_size, self.block_size)
+
+    async def get(self, path_or_inum: str | int, node: AsyncINode | None = None) -> AsyncINode:
+        if isinstance(path_or_inum, int):
+            return await self.get_inode(path_or_inum)
+
+        node = node if node else await self.get_inode(c_ext.EXT2_ROOT_INO, "/")
+        for part in path_or_inum.split("/"):
+            if not part:
+                continue
+
+            if (entry := await node._lookup(part)) is None:
+                raise FileNotFoundError(f"File not found: {path_or_inum}")
+            node = entry
+
+        return node
+
+    async def get_inode(self, inum: int, filename: str | None = None, filetype: int | None = None) -> AsyncINode:
+        """Read an inode.
+
+        Args:
+            inum: The inode number.
+            filename: Optional name of the inode.
+            filetype: Optional file type of the inode, e.g. from its directory entry.
+        """
+        if inum < c_ext.EXT2_BAD_INO or inum > self.sb.s_inodes_count:
+            raise Error(f"inum out of range {c_ext.EXT2_BAD_INO}-{self.sb.s_inodes_count}: {inum}")
+
+        group_num, index = divmod(inum - 1, self.sb.s_inodes_per_group)
+        group_desc = await self._read_group_desc(group_num)
+
+        offset = self._inode_table(group_desc) * self.block_size + index * self.sb.s_inode_size
+        buf = await self.read_at(offset, self.sb.s_inode_size)
+        return AsyncINode(self, inum, _parse_inode(buf), filename, filetype)
+
+    async def _read_group_desc(self, group_num: int) -> c_ext.ext2_group_desc | c_ext.ext4_group_desc:
+        if group_num >= self.groups_count:
+            raise Error("Group number exceeds amount of groups")
+
+        if (group_desc := self._group_descs.get(group_num)) is None:
+            offset = self.groups_offset + group_num * self._group_desc_size
+            buf = await self.read_at(offset, max(self._group_desc_size, len(self._group_desc_struct)))
+            group_desc = self._group_desc_struct(buf)
+
+            if self._inode_table(group_desc) > self.last_block:
+                raise Error("Group descriptor block locations exceed last block")
+            self._group_descs[group_num] = group_desc
+
+        return group_desc
+
+    def _inode_table(self, group_desc: c_ext.ext2_group_desc | c_ext.ext4_group_desc) -> int:
+        if self._group_desc_struct == c_ext.ext4_group_desc:
+            return (group_desc.bg_inode_table_hi << 32) | group_desc.bg_inode_table_lo
+        return group_desc.bg_inode_table_lo
+
+
+class AsyncINode:
+    """An inode of an :class:`AsyncExtFS`, of which the on-disk inode has already been read."""
+
+    def __init__(
+        self,
+        extfs: AsyncExtFS,
+        inum: int,
+        inode: RawInode,
+        filename: str | None = None,
+        filetype: int | None = None,
+    ):
+        self.extfs = extfs
+        self.inum = inum
+        self.inode = inode
+        self.filename = filename
+        self.filetype = filetype or stat.S_IFMT(inode.i_mode)
+        self.size = (inode.i_size_high << 32) + inode.i_size_lo
+        self._runlist = None
+
+    def __repr__(self) -> str:
+        return f"<async inode {self.inum}>"
+
+    @property
+    def mtime_ns(self) -> int:
+        return _parse_ns_ts(self.inode.i_mtime, self.inode.i_mtime_extra)
+
+    @property
+    def _is_inline(self) -> bool:
+        return bool(self.inode.i_flags & c_ext.EXT4_INLINE_DATA_FL) or (
+            self.filetype == stat.S_IFLNK and self.size < 60
+        )
+
+    async def link(self) -> str:
+        if self.filetype != stat.S_IFLNK:
+            raise NotASymlinkError(f"{self!r} is not a symlink")
+
+        return (await self.open().read()).decode(errors="surrogateescape")
+
+    async def alistdir(self) -> dict[str, AsyncINode]:
+        return {entry.filename: entry async for entry in self.aiterdir()}
+
+    async def aiterdir(self) -> AsyncIterator[AsyncINode]:
+        """Iterate over the entries of this directory.
+
+        The inodes of the entries in every part of the directory that is read are read concurrently.
+        """
+        extfs = self.extfs
+        async for entries in self._iter_entries():
+            inodes = await asyncio.gather(
+                *(extfs.get_inode(inum, name, ftype) for inum, name, ftype in entries if inum > 0)
+            )
+            for inode in inodes:
+                yield inode
+
+    async def _iter_entries(self) -> AsyncIterator[list[tuple[int, str, int | None]]]:
+        if self.filetype != stat.S_IFDIR:
+            raise NotADirectoryError(f"{self!r} is not a directory")
+
+        fh = self.open()
+        block_size = self.extfs.block_size
+        read_size = max(block_size, DIR_READ_SIZE - DIR_READ_SIZE % block_size)
+        offset = 0
+
+        while offset < self.size and (buf := await fh.read(min(read_size, self.size - offset))):
+            entries, end = _parse_dir_entries(buf, block_size, self.extfs.sb.s_inodes_count, self.extfs._has_filetype)
+            yield entries
+
+            if end != len(buf):
+                raise Error(f"Zero-length directory entry in {self!r} (offset 0x{offset + end:x})")
+
+            offset += len(buf)
+
+    async def _lookup(self, name: str) -> AsyncINode | None:
+        async for entries in self._iter_entries():
+            for inum, entry_name, ftype in entries:
+                if entry_name == name:
+                    return await self.extfs.get_inode(inum, name, ftype)
+        return None
+
+    async def dataruns(self) -> list[tuple[int | None, int]]:
+        """Return the runlist of this inode.
+
+        All extent tree nodes or indirect blocks of the same level are read concurrently.
+        """
+        if self._runlist is None:
+            expected_runs = (self.size + self.extfs.block_size - 1) // self.extfs.block_size
+
+            if self.inode.i_flags & c_ext.EXT4_EXTENTS_FL:
+                runs = []
+                run_offset = 0
+
+                for ee_block, ee_len, ee_start, initialized in await self._read_extents(self.inode.i_block, None):
+                    if ee_block != run_offset:
+                        runs.append((None, ee_block - run_offset))
+                    runs.append((ee_start if initialized else None, ee_len))
+                    run_offset = ee_block + ee_len
+
+                if run_offset < expected_runs:
+                    runs.append((None, expected_runs - run_offset))
+
+                self._runlist = runs
+            else:
+                self._runlist = await self._read_indirect_runs(expected_runs)
+
+        return self._runlist
+
+    async def _read_extents(self, buf: bytes, depth: int | None) -> list[tuple[int, int, int, bool]]:
+        if len(buf) < _extent_header.size:
+            raise Error("Truncated extent tree node")
+
+        magic, entries, _, eh_depth = _extent_header.unpack_from(buf, 0)
+        if magic != 0xF30A:
+            raise Error("Invalid extent_header magic")
+
+        if depth is not None and eh_depth != depth:
+            raise Error(f"Invalid extent tree depth: {eh_depth} (expected {depth})")
+
+        # Don't trust the amount of entries of a corrupt node beyond what fits in it
+        entries = min(entries, (len(buf) - _extent_header.size) // _extent.size)
+        offsets = range(_extent_header.size, _extent_header.size + entries * _extent.size, _extent.size)
+        if eh_depth == 0:
+            extents = []
+            for offset in offsets:
+                ee_block, ee_len, ee_start_hi, ee_start_lo = _extent.unpack_from(buf, offset)
+                initialized = ee_len <= EXT_INIT_MAX_LEN
+                extents.append(
+                    (
+                        ee_block,
+                        ee_len if initialized else ee_len - EXT_INIT_MAX_LEN,
+                        (ee_start_hi << 32) | ee_start_lo,
+                        initialized,
+                    )
+                )
+            return extents
+
+        leaves = []
+        for offset in offsets:
+            _, ei_leaf_lo, ei_leaf_hi = _extent_idx.unpack_from(buf, offset)
+            leaves.append((ei_leaf_hi << 32) | ei_leaf_lo)
+
+        children = await asyncio.gather(*(self.extfs.read_block(leaf) for leaf in leaves))
+        results = await asyncio.gather(*(self._read_extents(child, eh_depth - 1) for child in children))
+        return [extent for result in results for extent in result]
+
+    async def _read_indirect_runs(self, num_blocks: int) -> Runlist:
+        i_blocks = c_ext.uint32[c_ext.EXT2_N_BLOCKS](self.inode.i_block)
+        num_direct_blocks = min(num_blocks, c_ext.EXT2_NDIR_BLOCKS)
+
+        runlist = Runlist((block, 1) for block in i_blocks[:num_direct_blocks])
+        num_blocks -= num_direct_blocks
+
+        parts = []
+        for level in range(c_ext.EXT2_NIND_BLOCKS):
+            if num_blocks <= 0:
+                break
+
+            blocks_per_level = (self.extfs.block_size // 4) ** (level + 1)
+            parts.append(self._read_indirect(i_blocks[c_ext.EXT2_NDIR_BLOCKS + level], num_blocks, level + 1))
+            num_blocks -= blocks_per_level
+
+        for part in await asyncio.gather(*parts):
+            for block, count in part:
+                runlist.append(block, count)
+
+        return runlist
+
+    async def _read_indirect(self, block: int, num_blocks: int, level: int) -> list[tuple[int | None, int]]:
+        offsets_per_block = self.extfs.block_size // 4
+        blocks_per_entry = offsets_per_block ** (level - 1)
+        num_blocks = min(num_blocks, blocks_per_entry * offsets_per_block)
+
+        if block == 0:
+            return [(None, num_blocks)]
+
+        num_entries = (num_blocks + blocks_per_entry - 1) // blocks_per_entry
+        buf = (await self.extfs.read_block(block))[: num_entries * 4]
+        if len(buf) != num_entries * 4:
+            raise Error(f"Indirect block {block} lies beyond the end of the filesystem")
+
+        if level == 1:
+            runlist = Runlist()
+            runlist.extend_blocks(buf)
+            return list(runlist)
+
+        parts = await asyncio.gather(
+            *(
+                self._read_indirect(addr, min(blocks_per_entry, num_blocks - idx * blocks_per_entry), level - 1)
+                for idx, addr in enumerate(c_ext.uint32[num_entries](buf))
+            )
+        )
+        return [run for part in parts for run in part]
+
+    def open(self) -> AsyncStream:
+        """Return a stream of the contents of this inode, of which the runlist is determined on the first read."""
+        if self._is_inline:
+            return AsyncBytesStream(bytes(self.inode.i_block[: self.size]))
+        return AsyncRunlistStream(self.extfs, self.dataruns, self.size)
+
+
+class AsyncStream(ABC):
+    """A seekable stream with an asynchronous :meth:`read`."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._pos = 0
+
+    def seek(self, pos: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            pos += self._pos
+        elif whence == io.SEEK_END:
+            pos += self.size
+        elif whence != io.SEEK_SET:
+            raise ValueError(f"Invalid whence value: {whence}")
+
+        if pos < 0:
+            raise ValueError(f"Negative seek position {pos}")
+
+        self._pos = pos
+        return pos
+
+    def tell(self) -> int:
+        return self._pos
+
+    async def read(self, n: int = -1) -> bytes:
+        """Read and return up to ``n`` bytes, or until the end of the stream if ``n`` is negative."""
+        remaining = self.size - self._pos
+        n = remaining if n is None or n < 0 else min(n, remaining)
+        if n <= 0:
+            return b""
+
+        buf = await self._read(self._pos, n)
+        self._pos += len(buf)
+        return buf
+
+    @abstractmethod
+    async def _read(self, offset: int, length: int) -> bytes:
+        """Read ``length`` bytes from ``offset``, which lie within the stream."""
+
+
+class AsyncBytesStream(AsyncStream):
+    """An asynchronous stream of an in-memory buffer, such as inline data."""
+
+    def __init__(self, buf: bytes):
+        super().__init__(len(buf))
+        self._buf = buf
+
+    async def _read(self, offset: int, length: int) -> bytes:
+        return self._buf[offset : offset + length]
+
+
+class AsyncRunlistStream(AsyncStream):
+    """An asynchronous stream of a runlist, of which every read is split into concurrent reads of the runs.
+
+    Args:
+        extfs: The filesystem to read from.
+        dataruns: Coroutine function that returns the runlist in block units.
+        size: The size of the stream.
+    """
+
+    def __init__(self, extfs: AsyncExtFS, dataruns: Callable[[], Awaitable[list[tuple[int | None, int]]]], size: int):
+        super().__init__(size)
+        self.extfs = extfs
+        self._dataruns = dataruns
+        self.runlist = None
+        self._offsets = None
+
+    async def _read(self, offset: int, length: int) -> bytes:
+        if self.runlist is None:
+            self.runlist = await self._dataruns()
+
+            # Logical starting block of each run, so we can bisect it quickly when reading
+            self._offsets = []
+            run_offset = 0
+            for _, block_count in self.runlist:
+                self._offsets.append(run_offset)
+                run_offset += block_count
+
+        block_size = self.extfs.block_size
+        run_idx = bisect_right(self._offsets, offset // block_size) - 1
+        reads = []
+
+        while length > 0 and 0 <= run_idx < len(self.runlist):
+            run_block, run_count = self.runlist[run_idx]
+
+            run_pos = offset - self._offsets[run_idx] * block_size
+            read_count = min(run_count * block_size - run_pos, length)
+            if read_count <= 0:
+                break
+
+            for chunk_offset in range(0, read_count, MAX_READ_SIZE):
+                chunk_size = min(MAX_READ_SIZE, read_count - chunk_offset)
+                if run_block is None:
+                    reads.append(_zeroes(chunk_size))
+                else:
+                    reads.append(self.extfs.read_at(run_block * block_size + run_pos + chunk_offset, chunk_size))
+
+            offset += read_count
+            length -= read_count
+            run_idx += 1
+
+        return b"".join(await asyncio.gather(*reads))
+
+
+async def _zeroes(size: int) -> bytes:
+    return b"\x00" * size
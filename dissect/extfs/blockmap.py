@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import struct
+import sys
+from array import array
+from bisect import bisect_right
+from typing import TYPE_CHECKING, BinaryIO
+
+from dissect.extfs.exceptions import Error
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+# The header of a persisted block map: magic, version, length of the key, amount of runs
+_header = struct.Struct("<8sHHQ")
+_MAGIC = b"EXTBMAP\x00"
+_VERSION = 1
+
+
+class BlockMap:
+    """A reverse map of physical blocks to the inodes that own them.
+
+    The data runs of all inodes are kept in sorted arrays, so that the owner of a block can be found with a binary
+    search. Every run takes 24 bytes of memory.
+
+    Args:
+        key: Identifies the filesystem state the map was built from, see :meth:`load`.
+        runs: Tuples of the physical block, block count, inode number and logical (file) block of every run.
+    """
+
+    def __init__(self, key: bytes, runs: Iterable[tuple[int, int, int, int]] = ()):
+        self.key = key
+        self._blocks = array("Q")
+        self._counts = array("I")
+        self._inums = array("I")
+        self._file_blocks = array("Q")
+
+        for block, count, inum, file_block in sorted(runs):
+            self._blocks.append(block)
+            self._counts.append(count)
+            self._inums.append(inum)
+            self._file_blocks.append(file_block)
+
+    def __len__(self) -> int:
+        return len(self._blocks)
+
+    def __repr__(self) -> str:
+        return f"<BlockMap runs={len(self)}>"
+
+    def lookup(self, block: int) -> tuple[int, int] | None:
+        """Return the inode number and logical block of the inode that owns a physical block, if any.
+
+        Args:
+            block: The physical block number.
+        """
+        idx = bisect_right(self._blocks, block) - 1
+        if idx >= 0 and block < self._blocks[idx] + self._counts[idx]:
+            return self._inums[idx], self._file_blocks[idx] + block - self._blocks[idx]
+        return None
+
+    def lookup_many(self, blocks: Iterable[int]) -> list[tuple[int, int] | None]:
+        """Look up the owners of many physical blocks at once, see :meth:`lookup`.
+
+        The blocks are looked up in sorted order, so that a run only has to be searched for once for all blocks
+        that fall in it, such as many hits in the same file.
+
+        Returns:
+            A list with the result for every block, in the order of ``blocks``.
+        """
+        blocks = list(blocks)
+        result = [None] * len(blocks)
+
+        starts = self._blocks
+        counts = self._counts
+        idx = 0
+        start = end = 0
+
+        for pos in sorted(range(len(blocks)), key=blocks.__getitem__):
+            block = blocks[pos]
+            if not start <= block < end:
+                idx = bisect_right(starts, block, idx) - 1
+                if idx < 0:
+                    idx = 0
+                    continue
+
+                start = starts[idx]
+                end = start + counts[idx]
+                if block >= end:
+                    continue
+
+            result[pos] = (self._inums[idx], self._file_blocks[idx] + block - start)
+
+        return result
+
+    def save(self, fh: BinaryIO) -> None:
+        """Write the block map to a file-like object, so it can be loaded again with :meth:`load`."""
+        fh.write(_header.pack(_MAGIC, _VERSION, len(self.key), len(self)))
+        fh.write(self.key)
+
+        for column in (self._blocks, self._counts, self._inums, self._file_blocks):
+            if sys.byteorder == "big":
+                column = array(column.typecode, column)
+                column.byteswap()
+            fh.write(column.tobytes())
+
+    @classmethod
+    def load(cls, fh: BinaryIO, key: bytes | None = None) -> BlockMap:
+        """Read a block map that was written with :meth:`save`.
+
+        Args:
+            fh: The file-like object to read from.
+            key: The expected key, to make sure the block map belongs to the same filesystem in the same state.
+
+        Raises:
+            Error: If the block map is invalid or its key doesn't match.
+        """
+        buf = fh.read(_header.size)
+        if len(buf) != _header.size:
+            raise Error("Invalid block map (truncated header)")
+
+        magic, version, key_size, num_runs = _header.unpack(buf)
+        if magic != _MAGIC or version != _VERSION:
+            raise Error("Invalid block map (magic or version mismatch)")
+
+        stored_key = fh.read(key_size)
+        if key is not None and stored_key != key:
+            raise Error("Block map belongs to a different filesystem or filesystem state")
+
+        obj = cls(stored_key)
+        for column in (obj._blocks, obj._counts, obj._inums, obj._file_blocks):
+            size = num_runs * column.itemsize
+            buf = fh.read(size)
+            if len(buf) != size:
+                raise Error("Invalid block map (truncated runs)")
+
+            column.frombytes(buf)
+            if sys.byteorder == "big":
+                column.byteswap()
+
+        return obj
@@ -19,10 +19,13 @@ ext_def = """
 
 #define EXT2_NDIR_BLOCKS        12          // direct blocks in inode
 #define EXT2_NIND_BLOCKS        3           // indirect blocks in inode
+#define EXT2_N_BLOCKS           15          // total blocks in inode
 
 #define EXT2_NAME_LEN           255
 #define EXT2_MIN_BLOCK_SIZE     1024
 #define EXT2_MAX_BLOCK_SIZE     4096
+#define EXT2_GOOD_OLD_INODE_SIZE 128
+#define EXT2_GOOD_OLD_FIRST_INO 11
 #define EXT4_MAX_BLOCK_SIZE     65536
 
 #define EXT2_FEATURE_COMPAT_DIR_PREALLOC        0x0001
@@ -102,6 +105,24 @@ ext_def = """
 #define EXT2_FL_USER_VISIBLE                    0x304BDFFF      // User visible flags
 #define EXT2_FL_USER_MODIFIABLE                 0x204BC0FF      // User modifiable flags
 
+#define EXT4_BG_INODE_UNINIT                    0x0001          // Inode table/bitmap not in use
+#define EXT4_BG_BLOCK_UNINIT                    0x0002          // Block bitmap not in use
+#define EXT4_BG_INODE_ZEROED                    0x0004          // On-disk itable initialized to zero
+
+#define EXT2_FLAGS_SIGNED_HASH                  0x0001          // Signed dirhash in use
+#define EXT2_FLAGS_UNSIGNED_HASH                0x0002          // Unsigned dirhash in use
+#define EXT2_FLAGS_TEST_FILESYS                 0x0004          // OK for use on development code
+
+#define DX_HASH_LEGACY                          0
+#define DX_HASH_HALF_MD4                        1
+#define DX_HASH_TEA                             2
+#define DX_HASH_LEGACY_UNSIGNED                 3
+#define DX_HASH_HALF_MD4_UNSIGNED               4
+#define DX_HASH_TEA_UNSIGNED                    5
+#define DX_HASH_SIPHASH                         6
+
+#define EXT4_HTREE_EOF_32BIT                    0x7FFFFFFF
+
 struct ext4_super_block {
     uint32      s_inodes_count;             /* Inodes count */
     uint32      s_blocks_count_lo;          /* Blocks count */
@@ -207,8 +228,12 @@ struct ext2_group_desc
     uint16      bg_free_blocks_count_lo;    /* Free blocks count */
     uint16      bg_free_inodes_count_lo;    /* Free inodes count */
     uint16      bg_used_dirs_count_lo;      /* Directories count */
-    uint16      bg_pad;
-    uint32      bg_reserved[3];
+    uint16      bg_flags;                   /* EXT4_BG_flags (INODE_UNINIT, etc) */
+    uint32      bg_exclude_bitmap_lo;       /* Exclude bitmap for snapshots */
+    uint16      bg_block_bitmap_csum_lo;    /* crc32c(s_uuid+grp_num+bbitmap) LE */
+    uint16      bg_inode_bitmap_csum_lo;    /* crc32c(s_uuid+grp_num+ibitmap) LE */
+    uint16      bg_itable_unused_lo;        /* Unused inodes count */
+    uint16      bg_checksum;                /* crc16(sb_uuid+group+desc) */
 };
 
 struct ext4_group_desc
@@ -299,9 +324,9 @@ struct ext4_dir_entry_tail {
 
 struct dx_root {
     ext2_dir_entry_2    dot;
-    char                _pad0[3];
+    char                _pad0[4];
     ext2_dir_entry_2    dotdot;
-    char                _pad1[2];
+    char                _pad1[4];
     uint32              reserved_zero;
     uint8               hash_version;
     uint8               info_length;
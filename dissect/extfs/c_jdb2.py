@@ -74,6 +74,11 @@ struct commit_header {
     uint32  h_commit_nsec;
 };
 
+struct journal_revoke_header {
+    journal_header r_header;
+    uint32  r_count;            /* Count of bytes used in the block */
+};
+
 struct journal_block_tag {
     uint32  t_blocknr;          /* The on-disk block number */
     uint16  t_checksum;         /* truncated crc32c(uuid+seq+block) */
@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from threading import Lock
+from typing import TYPE_CHECKING, NamedTuple
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+
+class BlockCacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    size: int
+    capacity: int
+
+
+class BlockCache:
+    """A thread-safe LRU cache of filesystem blocks, bounded by the total size of the cached blocks in bytes.
+
+    Args:
+        capacity: The maximum amount of bytes to cache. A capacity of 0 disables the cache.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.size = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._blocks: OrderedDict[int, bytes] = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._blocks)
+
+    def __contains__(self, block: int) -> bool:
+        return block in self._blocks
+
+    def get(self, block: int) -> bytes | None:
+        """Return the cached contents of ``block``, or ``None`` if it's not cached."""
+        with self._lock:
+            buf = self._blocks.get(block)
+            if buf is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._blocks.move_to_end(block)
+            return buf
+
+    def put(self, block: int, buf: bytes) -> None:
+        """Add the contents of ``block`` to the cache, evicting the least recently used blocks if necessary."""
+        if len(buf) > self.capacity:
+            return
+
+        with self._lock:
+            if (old := self._blocks.pop(block, None)) is not None:
+                self.size -= len(old)
+
+            self._blocks[block] = buf
+            self.size += len(buf)
+
+            while self.size > self.capacity:
+                _, evicted = self._blocks.popitem(last=False)
+                self.size -= len(evicted)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Remove all blocks from the cache and reset the statistics."""
+        with self._lock:
+            self._blocks.clear()
+            self.size = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def cache_info(self) -> BlockCacheInfo:
+        """Return the statistics of the cache."""
+        with self._lock:
+            return BlockCacheInfo(self.hits, self.misses, self.evictions, self.size, self.capacity)
+
+
+class DentryCacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    size: int
+    capacity: int
+
+
+class DentryCache:
+    """A thread-safe LRU cache of directory entries, bounded by the amount of entries.
+
+    Maps the inode number of a directory and a name to the inode number and file type of the entry with that name.
+    Names that don't exist in a directory are cached as negative entries, with an inode number of 0.
+
+    Args:
+        capacity: The maximum amount of entries to cache. A capacity of 0 disables the cache.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._entries: OrderedDict[tuple[int, str], tuple[int, int | None]] = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: tuple[int, str]) -> bool:
+        return key in self._entries
+
+    def get(self, parent: int, name: str) -> tuple[int, int | None] | None:
+        """Return the cached inode number and file type of ``name`` in directory ``parent``.
+
+        Returns:
+            A tuple of the inode number and file type, where an inode number of 0 means that the name doesn't
+            exist, or ``None`` if it's not cached.
+        """
+        key = (parent, name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, parent: int, name: str, inum: int, file_type: int | None = None) -> None:
+        """Add an entry to the cache. Use an inode number of 0 to add a negative entry."""
+        self.put_many(parent, [(name, inum, file_type)])
+
+    def put_many(self, parent: int, entries: Iterable[tuple[str, int, int | None]]) -> None:
+        """Add multiple entries of directory ``parent`` to the cache at once.
+
+        Args:
+            parent: The inode number of the directory.
+            entries: The name, inode number and file type of every entry.
+        """
+        if not self.capacity:
+            return
+
+        with self._lock:
+            for name, inum, file_type in entries:
+                key = (parent, name)
+                self._entries[key] = (inum, file_type)
+                self._entries.move_to_end(key)
+
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Remove all entries from the cache and reset the statistics."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def cache_info(self) -> DentryCacheInfo:
+        """Return the statistics of the cache."""
+        with self._lock:
+            return DentryCacheInfo(self.hits, self.misses, self.evictions, len(self._entries), self.capacity)
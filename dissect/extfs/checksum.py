@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import logging
+import os
+import struct
+from collections import Counter
+from threading import Lock
+from typing import TYPE_CHECKING, NamedTuple
+
+# Selects the native crc32c implementation of dissect.util when it's available, with a pure Python fallback
+from dissect.util.hash import crc32c as _crc32c
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+log = logging.getLogger(__name__)
+log.setLevel(os.getenv("DISSECT_LOG_EXTFS", "CRITICAL"))
+
+SUPERBLOCK = "superblock"
+GROUP_DESC = "group_desc"
+INODE_BITMAP = "inode_bitmap"
+BLOCK_BITMAP = "block_bitmap"
+INODE = "inode"
+EXTENT_BLOCK = "extent_block"
+DIR_BLOCK = "dir_block"
+JOURNAL_SUPERBLOCK = "journal_superblock"
+JOURNAL_DESCRIPTOR = "journal_descriptor"
+JOURNAL_REVOKE = "journal_revoke"
+JOURNAL_COMMIT = "journal_commit"
+JOURNAL_BLOCK = "journal_block"
+
+_CRC16_TABLE = []
+for _value in range(256):
+    for _ in range(8):
+        _value = (_value >> 1) ^ 0xA001 if _value & 1 else _value >> 1
+    _CRC16_TABLE.append(_value)
+
+_u32le = struct.Struct("<I")
+_u32be = struct.Struct(">I")
+
+
+class ChecksumMismatch(NamedTuple):
+    """A metadata structure of which the stored checksum doesn't match its contents."""
+
+    kind: str
+    identifier: int
+    expected: int
+    calculated: int
+
+
+class ChecksumVerifier:
+    """Keeps track of metadata checksum verifications.
+
+    Mismatches don't raise an exception, but are counted and reported to an optional callback, so that a corrupt
+    structure doesn't prevent the rest of the filesystem from being read.
+
+    Args:
+        callback: Optional callable that is called with a :class:`ChecksumMismatch` for every mismatch.
+    """
+
+    def __init__(self, callback: Callable[[ChecksumMismatch], None] | None = None):
+        self.callback = callback
+        self.checked = Counter()
+        self.errors = Counter()
+        self._lock = Lock()
+
+    def __repr__(self) -> str:
+        return f"<ChecksumVerifier checked={sum(self.checked.values())} errors={sum(self.errors.values())}>"
+
+    def verify(self, kind: str, identifier: int, expected: int, calculated: int) -> bool:
+        """Compare a stored checksum with the calculated one and report a mismatch.
+
+        Args:
+            kind: The kind of structure, e.g. ``inode``.
+            identifier: The number of the structure, e.g. the inode or block number.
+            expected: The checksum stored on disk.
+            calculated: The checksum calculated over the structure.
+
+        Returns:
+            Whether the checksums match.
+        """
+        with self._lock:
+            self.checked[kind] += 1
+            if expected == calculated:
+                return True
+            self.errors[kind] += 1
+
+        log.warning("Checksum mismatch in %s %d: 0x%x != 0x%x", kind, identifier, expected, calculated)
+        if self.callback is not None:
+            self.callback(ChecksumMismatch(kind, identifier, expected, calculated))
+        return False
+
+    def reset(self) -> None:
+        """Reset the counters."""
+        with self._lock:
+            self.checked.clear()
+            self.errors.clear()
+
+
+def crc32c(crc: int, data: bytes) -> int:
+    """Update a raw crc32c checksum, without the pre- and post-inversion, like the ``crc32c()`` of the kernel."""
+    return _crc32c.update(crc ^ 0xFFFFFFFF, data) ^ 0xFFFFFFFF
+
+
+def crc16(crc: int, data: bytes) -> int:
+    """Update a crc16 (ANSI, reflected) checksum, like the ``crc16()`` of the kernel."""
+    for byte in data:
+        crc = (crc >> 8) ^ _CRC16_TABLE[(crc ^ byte) & 0xFF]
+    return crc
+
+
+def inode_seed(fs_seed: int, inum: int, generation: int) -> int:
+    """Return the checksum seed of an inode, which is used for the inode and its extent and directory blocks."""
+    return crc32c(crc32c(fs_seed, _u32le.pack(inum)), _u32le.pack(generation))
+
+
+def group_desc_checksum(fs_seed: int, group_num: int, buf: bytes) -> int:
+    """Calculate the ``bg_checksum`` of a group descriptor with the ``metadata_csum`` feature.
+
+    Args:
+        fs_seed: The checksum seed of the filesystem.
+        group_num: The group number.
+        buf: The group descriptor, of ``s_desc_size`` bytes.
+    """
+    crc = crc32c(fs_seed, _u32le.pack(group_num))
+    crc = crc32c(crc, buf[:0x1E])
+    crc = crc32c(crc, b"\x00\x00")
+    return crc32c(crc, buf[0x20:]) & 0xFFFF
+
+
+def group_desc_crc16(uuid: bytes, group_num: int, buf: bytes) -> int:
+    """Calculate the ``bg_checksum`` of a group descriptor with the ``gdt_csum`` feature.
+
+    Args:
+        uuid: The UUID of the filesystem.
+        group_num: The group number.
+        buf: The group descriptor, of ``s_desc_size`` bytes.
+    """
+    crc = crc16(0xFFFF, uuid)
+    crc = crc16(crc, _u32le.pack(group_num))
+    crc = crc16(crc, buf[:0x1E])
+    return crc16(crc, buf[0x20:])
+
+
+def inode_checksum(seed: int, buf: bytes, has_hi: bool) -> int:
+    """Calculate the checksum of an inode, with the checksum fields treated as zero.
+
+    Args:
+        seed: The checksum seed of the inode.
+        buf: The inode, of ``s_inode_size`` bytes.
+        has_hi: Whether the inode has the ``i_checksum_hi`` field.
+    """
+    crc = crc32c(seed, buf[:0x7C])
+    crc = crc32c(crc, b"\x00\x00")
+    if not has_hi:
+        return crc32c(crc, buf[0x7E:]) & 0xFFFF
+
+    crc = crc32c(crc, buf[0x7E:0x82])
+    crc = crc32c(crc, b"\x00\x00")
+    return crc32c(crc, buf[0x84:])
+
+
+def dx_countlimit_offset(buf: bytes, block_size: int) -> int | None:
+    """Return the offset of the ``limit`` and ``count`` fields of a hash index block, or ``None`` if it's not one.
+
+    Hash index blocks are recognized by their fake directory entries, like ``ext2fs_get_dx_countlimit()`` does.
+    """
+    inum, rec_len = struct.unpack_from("<IH", buf, 0)
+    if rec_len == block_size and inum == 0:
+        # dx_node, a single empty directory entry spanning the block
+        return 8
+
+    if rec_len != 12:
+        return None
+
+    # dx_root, the "." and ".." entries followed by the dx_root_info
+    rec_len, _, _ = struct.unpack_from("<HBB", buf, 16)
+    info_length = buf[24 + 5]
+    if rec_len != block_size - 12 or info_length != 8:
+        return None
+    return 24 + info_length
+
+
+def dir_block_checksum(seed: int, buf: bytes) -> tuple[int, int] | None:
+    """Return the stored and calculated checksum of a directory block, or ``None`` if it has no checksum.
+
+    Both directory leaf blocks, with an ``ext4_dir_entry_tail`` at the end, and hash index blocks, with a
+    ``dx_tail`` after the last possible index entry, are supported.
+
+    Args:
+        seed: The checksum seed of the directory inode.
+        buf: The directory block.
+    """
+    block_size = len(buf)
+    tail = block_size - 12
+
+    inum, rec_len, name_len, file_type = struct.unpack_from("<IHBB", buf, tail)
+    if (inum, rec_len, name_len, file_type) == (0, 12, 0, 0xDE):
+        (expected,) = _u32le.unpack_from(buf, tail + 8)
+        return expected, crc32c(seed, buf[:tail])
+
+    if (offset := dx_countlimit_offset(buf, block_size)) is None:
+        return None
+
+    limit, count = struct.unpack_from("<HH", buf, offset)
+    tail = offset + limit * 8
+    if tail + 8 > block_size or count > limit:
+        return None
+
+    (expected,) = _u32le.unpack_from(buf, tail + 4)
+    crc = crc32c(seed, buf[: offset + count * 8])
+    return expected, crc32c(crc, buf[tail : tail + 4] + b"\x00" * 4)
+
+
+def extent_block_checksum(seed: int, buf: bytes) -> tuple[int, int] | None:
+    """Return the stored and calculated checksum of an extent tree block, or ``None`` if it has no room for one.
+
+    Args:
+        seed: The checksum seed of the inode the extent tree belongs to.
+        buf: The extent tree block.
+    """
+    (eh_max,) = struct.unpack_from("<H", buf, 4)
+    tail = 12 + 12 * eh_max
+    if tail + 4 > len(buf):
+        return None
+
+    (expected,) = _u32le.unpack_from(buf, tail)
+    return expected, crc32c(seed, buf[:tail])
+
+
+def journal_block_checksum(seed: int, sequence: int, buf: bytes) -> int:
+    """Calculate the checksum of a data block in the journal, as stored in its descriptor block tag.
+
+    Args:
+        seed: The checksum seed of the journal.
+        sequence: The sequence of the transaction the block belongs to.
+        buf: The journal block, as stored in the journal.
+    """
+    return crc32c(crc32c(seed, _u32be.pack(sequence)), buf)
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import operator
+import sys
+from array import array
+from itertools import repeat
+from typing import TYPE_CHECKING, NamedTuple
+
+from dissect.extfs.c_ext import c_ext
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+# Offset and size of the fields of ext4_inode, the extra fields are only present in large inodes
+_FIELDS = {field.name: (field.offset, field.type.size) for field in c_ext.ext4_inode.__fields__}
+_EXTRA_END = sum(_FIELDS["i_crtime_extra"])
+_NSEC = 1000000000
+
+
+class InodeColumns(NamedTuple):
+    """Inode fields in column arrays, one element per inode.
+
+    The arrays can be used as they are, or be converted without copying using e.g. ``numpy.frombuffer``. The
+    timestamps are in nanoseconds, with the epoch bits and nanoseconds of the extra timestamp fields combined.
+    ``crtime_ns`` is 0 for filesystems with small inodes, which don't have a creation time.
+    """
+
+    inum: array
+    mode: array
+    uid: array
+    gid: array
+    size: array
+    links: array
+    flags: array
+    atime_ns: array
+    mtime_ns: array
+    ctime_ns: array
+    crtime_ns: array
+    dtime: array
+
+    @classmethod
+    def empty(cls) -> InodeColumns:
+        """Return a new instance with empty columns."""
+        return cls(
+            array("Q"),
+            array("H"),
+            array("I"),
+            array("I"),
+            array("Q"),
+            array("H"),
+            array("I"),
+            array("Q"),
+            array("Q"),
+            array("Q"),
+            array("Q"),
+            array("I"),
+        )
+
+    def extend(self, other: InodeColumns) -> None:
+        """Append the rows of another instance to the columns of this instance."""
+        for column, values in zip(self, other, strict=True):
+            column.extend(values)
+
+
+def decode_inode_table(
+    buf: bytes, inode_size: int, first_inum: int, indices: Sequence[int] | None = None
+) -> InodeColumns:
+    """Decode a buffer of consecutive inodes into columns.
+
+    Instead of decoding the inodes one by one, every field is sliced out of the buffer as a whole, by viewing the
+    buffer as an array of the type of the field and taking every ``inode_size``-th element.
+
+    Args:
+        buf: A buffer of inodes, such as (a part of) an inode table.
+        inode_size: The size of an inode in bytes.
+        first_inum: The inode number of the first inode in the buffer.
+        indices: Optional indices of the inodes in the buffer to decode, defaults to all inodes.
+    """
+    num_inodes = len(buf) // inode_size
+    if indices is None:
+        indices = range(num_inodes)
+        buf = buf[: num_inodes * inode_size]
+    else:
+        buf = b"".join(buf[idx * inode_size : (idx + 1) * inode_size] for idx in indices)
+
+    if not buf:
+        return InodeColumns.empty()
+
+    views = {2: array("H", buf), 4: array("I", buf)}
+    if sys.byteorder == "big":
+        for view in views.values():
+            view.byteswap()
+
+    def column(name: str) -> array:
+        offset, size = _FIELDS[name]
+        return views[size][offset // size :: inode_size // size]
+
+    # The extra timestamps are only present in large inodes
+    has_extra = inode_size >= _EXTRA_END
+
+    def extra(name: str) -> array:
+        return column(name) if has_extra else array("I", bytes(4 * len(indices)))
+
+    return InodeColumns(
+        array("Q", [first_inum + idx for idx in indices]),
+        column("i_mode"),
+        _combine("I", column("i_uid"), column("i_uid_high"), 16),
+        _combine("I", column("i_gid"), column("i_gid_high"), 16),
+        _combine("Q", column("i_size_lo"), column("i_size_high"), 32),
+        column("i_links_count"),
+        column("i_flags"),
+        _ns_column(column("i_atime"), extra("i_atime_extra")),
+        _ns_column(column("i_mtime"), extra("i_mtime_extra")),
+        _ns_column(column("i_ctime"), extra("i_ctime_extra")),
+        _ns_column(extra("i_crtime"), extra("i_crtime_extra")),
+        column("i_dtime"),
+    )
+
+
+def _combine(typecode: str, lo: array, hi: array, shift: int) -> array:
+    if not any(hi):
+        return array(typecode, lo)
+    return array(typecode, [lo | hi << shift for lo, hi in zip(lo, hi, strict=True)])
+
+
+def _ns_column(times: array, extras: array) -> array:
+    # Same as _parse_ns_ts(), the low 2 bits of the extra field extend the time, the remaining 30 bits are nanoseconds
+    if any(map(operator.and_, extras, repeat(0b11))):
+        return array(
+            "Q",
+            [(time | (extra & 0b11) << 32) * _NSEC + (extra >> 2) for time, extra in zip(times, extras, strict=True)],
+        )
+    return array("Q", map(operator.add, map(_NSEC.__mul__, times), map(operator.rshift, extras, repeat(2))))
@@ -3,14 +3,18 @@ from __future__ import annotations
 import io
 import logging
 import os
+import re
 import stat
+import struct
+from bisect import bisect_right
 from functools import cached_property, lru_cache
-from typing import TYPE_CHECKING, BinaryIO
+from typing import TYPE_CHECKING, BinaryIO, NamedTuple
 from uuid import UUID
 
 from dissect.util import ts
-from dissect.util.stream import RangeStream, RunlistStream
+from dissect.util.stream import RunlistStream
 
+from dissect.extfs.blockmap import BlockMap
 from dissect.extfs.c_ext import (
     EXT2,
     EXT3,
@@ -20,28 +24,174 @@ from dissect.extfs.c_ext import (
     XATTR_PREFIX_MAP,
     c_ext,
 )
+from dissect.extfs.cache import BlockCache, DentryCache
+from dissect.extfs.checksum import (
+    BLOCK_BITMAP,
+    DIR_BLOCK,
+    EXTENT_BLOCK,
+    GROUP_DESC,
+    INODE,
+    INODE_BITMAP,
+    SUPERBLOCK,
+    ChecksumVerifier,
+    crc32c,
+    dir_block_checksum,
+    dx_countlimit_offset,
+    extent_block_checksum,
+    group_desc_checksum,
+    group_desc_crc16,
+    inode_checksum,
+    inode_seed,
+)
+from dissect.extfs.columns import InodeColumns, decode_inode_table
 from dissect.extfs.exceptions import (
     Error,
     FileNotFoundError,
     NotADirectoryError,
     NotASymlinkError,
 )
-from dissect.extfs.journal import JDB2
+from dissect.extfs.htree import dx_hash
+from dissect.extfs.inode import RawInode
+from dissect.extfs.journal import JDB2, JournalOverlay
+from dissect.extfs.sidecar import Sidecar
+from dissect.extfs.stream import EXT_INIT_MAX_LEN, ExtentStream, MappedRunlistStream, Runlist
+from dissect.extfs.util import PositionalFile, PositionalReader
 
 if TYPE_CHECKING:
-    from collections.abc import Iterator
+    from collections.abc import Callable, Iterable, Iterator
     from datetime import datetime
+    from pathlib import Path
+
+    from typing_extensions import Self
+
+    from dissect.extfs.checksum import ChecksumMismatch
+    from dissect.extfs.journal import CommitBlock
 
 log = logging.getLogger(__name__)
 log.setLevel(os.getenv("DISSECT_LOG_EXTFS", "CRITICAL"))
 
+# Minimum i_extra_isize for the inode to contain i_checksum_hi
+INODE_CHECKSUM_HI_END = 0x84 - c_ext.EXT2_GOOD_OLD_INODE_SIZE
+
+DEFAULT_BLOCK_CACHE_SIZE = 16 * 1024 * 1024
+DEFAULT_INODE_CACHE_SIZE = 1024
+DEFAULT_GROUP_DESC_CACHE_SIZE = 356
+DEFAULT_DENTRY_CACHE_SIZE = 64 * 1024
+
+# Amount of bytes of a directory to read and parse at once, a multiple of every possible block size
+DIR_READ_SIZE = 256 * 1024
+
+# Stretches of a bitmap that contain at least one clear bit
+_not_full = re.compile(rb"[^\xff]+")
+
+# The directory entry header, with the high byte of the name length doubling as the file type in ext2_dir_entry_2
+_dir_entry = struct.Struct("<IHBB")
+
+
+class InodeVersion(NamedTuple):
+    """A version of an inode found in the journal."""
+
+    sequence: int
+    ts: datetime | None
+    journal_block: int
+    revoked: bool
+    inode: INode
+
+
+class DirVersion(NamedTuple):
+    """A version of a directory block found in the journal."""
+
+    sequence: int
+    ts: datetime | None
+    journal_block: int
+    revoked: bool
+    block: int
+    entries: list[INode]
+
+
+class BlockOwner(NamedTuple):
+    """The inode that owns a physical block, as found by :meth:`ExtFS.owner_of_block`."""
+
+    inode: INode
+    file_block: int
+
+
+class DeletedFile(NamedTuple):
+    """A deleted file found by :meth:`ExtFS.recover_deleted`."""
+
+    inode: INode
+    name: str | None
+    parent: int | None
+    runs: Runlist
+    overwritten: int
+
+    def open(self) -> BinaryIO:
+        """Return a stream of the recovered runs, which are read as they are now on disk.
+
+        The size of the stream is the size of the inode, limited to the size of the recovered runs.
+        """
+        extfs = self.inode.extfs
+        size = sum(count for _, count in self.runs) * extfs.block_size
+        if self.inode.size:
+            size = min(size, self.inode.size)
+        return RunlistStream(PositionalFile(extfs.read_at), self.runs, size, extfs.block_size)
+
 
 class ExtFS:
-    def __init__(self, fh: BinaryIO):
-        self.fh = fh
+    """ExtFS filesystem implementation.
+
+    Args:
+        fh: The file-like object of the filesystem.
+        mmap: Memory map the filesystem if ``fh`` is a regular file, so that metadata and file contents are read
+              directly from the memory map instead of through ``seek`` and ``read`` calls.
+        block_cache_size: The maximum amount of bytes of metadata blocks (directory, extent tree, indirect, xattr
+                          and inode table blocks) to keep in the shared block cache. Use 0 to disable the cache.
+        inode_cache_size: The maximum amount of inodes to cache. Use ``None`` for an unbounded cache.
+        group_desc_cache_size: The maximum amount of parsed group descriptors to cache. Use ``None`` for an
+                               unbounded cache.
+        dentry_cache_size: The maximum amount of directory entries to keep in the dentry cache, which maps names in
+                           directories to inode numbers and remembers names that don't exist. Use 0 to disable the
+                           cache.
+        load_group_descs: Read the entire group descriptor table in a single read when opening the filesystem,
+                          instead of reading every group descriptor on first use.
+        replay_journal: If the filesystem needs recovery, open it with the committed transactions of the journal
+                        applied on top of it, like the kernel would do when mounting it. The filesystem itself is not
+                        modified.
+        verify_checksums: Verify the metadata checksums of the superblock, group descriptors, bitmaps, inodes, extent
+                          tree blocks, directory blocks and journal when they are read. Mismatches are counted in
+                          :attr:`checksums` and reported to ``checksum_callback``, instead of raising an exception.
+        checksum_callback: Optional callable that is called with a
+                           :class:`~dissect.extfs.checksum.ChecksumMismatch` for every checksum mismatch.
+        sidecar: Optional path of a :class:`~dissect.extfs.sidecar.Sidecar` index, in which the group descriptor
+                 table, directory entries and runlists are stored when they're first read, and from which they're
+                 used when the same filesystem is opened again. The index is emptied if it was built for a
+                 different filesystem or filesystem state. Metadata served from the index isn't verified again.
+    """
 
-        fh.seek(c_ext.EXT2_SBOFF)
-        sb = c_ext.ext4_super_block(fh)
+    def __init__(
+        self,
+        fh: BinaryIO,
+        mmap: bool = False,
+        block_cache_size: int = DEFAULT_BLOCK_CACHE_SIZE,
+        inode_cache_size: int | None = DEFAULT_INODE_CACHE_SIZE,
+        group_desc_cache_size: int | None = DEFAULT_GROUP_DESC_CACHE_SIZE,
+        dentry_cache_size: int = DEFAULT_DENTRY_CACHE_SIZE,
+        load_group_descs: bool = False,
+        replay_journal: bool = False,
+        verify_checksums: bool = False,
+        checksum_callback: Callable[[ChecksumMismatch], None] | None = None,
+        sidecar: str | Path | None = None,
+    ):
+        self.fh = fh
+        self._reader = PositionalReader(fh, use_mmap=mmap)
+        if replay_journal:
+            self._reader = _replay_journal(fh, self._reader)
+        self.block_cache = BlockCache(block_cache_size)
+        self.dentry_cache = DentryCache(dentry_cache_size)
+        self.checksums = ChecksumVerifier(checksum_callback) if verify_checksums else None
+
+        sb_buf = self.read_at(c_ext.EXT2_SBOFF, len(c_ext.ext4_super_block))
+        sb = c_ext.ext4_super_block(sb_buf)
         self.sb = sb
 
         if sb.s_magic != c_ext.EXT2_FS_MAGIC:
@@ -92,11 +242,53 @@ class ExtFS:
         self.uuid = UUID(bytes=sb.s_uuid)
         self.volume_name = sb.s_volume_name.split(b"\x00")[0].decode(errors="surrogateescape")
         self.last_mount = sb.s_last_mounted.split(b"\x00")[0].decode(errors="surrogateescape")
+        self.hash_seed = tuple(c_ext.uint32[4](sb.s_hash_seed))
+
+        self._csum_seed = None
+        if sb.s_feature_ro_compat & c_ext.EXT4_FEATURE_RO_COMPAT_METADATA_CSUM:
+            if sb.s_feature_incompat & c_ext.EXT4_FEATURE_INCOMPAT_CSUM_SEED:
+                self._csum_seed = sb.s_checksum_seed
+            else:
+                self._csum_seed = crc32c(0xFFFFFFFF, sb.s_uuid)
+
+        # Only verify the checksums of structures if the filesystem maintains them
+        self._verify_csum = self.checksums is not None and self._csum_seed is not None
+        if self._verify_csum:
+            self.checksums.verify(SUPERBLOCK, 0, sb.s_checksum, crc32c(0xFFFFFFFF, sb_buf[:-4]))
+
+        self.sidecar = Sidecar(sidecar, self._index_key) if sidecar is not None else None
+
+        self._group_desc_table = None
+        if self.sidecar is not None:
+            self._group_desc_table = self.sidecar.get_group_descs()
+
+        if self._group_desc_table is None and (load_group_descs or self.sidecar is not None):
+            size = self.groups_count * self._group_desc_size
+            self._group_desc_table = self.read_at(self.groups_offset, size)
+            if len(self._group_desc_table) != size:
+                raise Error("Group descriptor table lies beyond the end of the filesystem")
+
+            if self.sidecar is not None:
+                self.sidecar.put_group_descs(self._group_desc_table)
+
+        self.get_inode = lru_cache(inode_cache_size)(self.get_inode)
+        self._read_group_desc = lru_cache(group_desc_cache_size)(self._read_group_desc)
+        self._read_inode_bitmap = lru_cache(1024)(self._read_inode_bitmap)
+        self._read_block_bitmap = lru_cache(1024)(self._read_block_bitmap)
 
         self.root = self.get_inode(c_ext.EXT2_ROOT_INO, "/")
 
-        self.get_inode = lru_cache(1024)(self.get_inode)
-        self._read_group_desc = lru_cache(356)(self._read_group_desc)
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Release the memory map and close the sidecar index, if any. The file-like object itself is left open."""
+        self._reader.close()
+        if self.sidecar is not None:
+            self.sidecar.close()
 
     @cached_property
     def journal(self) -> JDB2:
@@ -108,7 +300,64 @@ class ExtFS:
             raise Error(f"Journal inum is 0, could be on external device (s_journal_uuid = {self.sb.s_journal_uuid})")
 
         inode = self.get_inode(inum)
-        return JDB2(inode.open())
+        return JDB2(inode.open(), verifier=self.checksums)
+
+    def read_at(self, offset: int, size: int) -> bytes:
+        """Read ``size`` bytes from ``offset`` of the filesystem.
+
+        This does not depend on the position of the file-like object of the filesystem, so it's safe to use
+        from multiple threads at the same time.
+
+        Args:
+            offset: The offset in bytes to read from.
+            size: The amount of bytes to read.
+        """
+        return self._reader.read_at(offset, size)
+
+    def read_block(self, block: int) -> bytes:
+        """Read a single block through the block cache.
+
+        Args:
+            block: The block number to read.
+        """
+        if (buf := self.block_cache.get(block)) is None:
+            buf = self.read_at(block * self.block_size, self.block_size)
+            self.block_cache.put(block, buf)
+        return buf
+
+    def read_cached(self, offset: int, size: int) -> bytes:
+        """Read ``size`` bytes from ``offset`` of the filesystem through the block cache.
+
+        Args:
+            offset: The offset in bytes to read from.
+            size: The amount of bytes to read.
+        """
+        block, block_offset = divmod(offset, self.block_size)
+        end_block = (offset + size + self.block_size - 1) // self.block_size
+
+        if end_block - block == 1:
+            return self.read_block(block)[block_offset : block_offset + size]
+
+        buf = b"".join(self.read_block(num) for num in range(block, end_block))
+        return buf[block_offset : block_offset + size]
+
+    def cache_info(self) -> dict[str, NamedTuple]:
+        """Return the statistics of the caches of this filesystem.
+
+        Returns:
+            A dictionary with the statistics of the ``inode``, ``group_desc``, ``inode_bitmap`` and ``block_bitmap``
+            caches as returned by ``functools.lru_cache``, the ``block`` cache as
+            :class:`~dissect.extfs.cache.BlockCacheInfo` and the ``dentry`` cache as
+            :class:`~dissect.extfs.cache.DentryCacheInfo`.
+        """
+        return {
+            "inode": self.get_inode.cache_info(),
+            "group_desc": self._read_group_desc.cache_info(),
+            "inode_bitmap": self._read_inode_bitmap.cache_info(),
+            "block_bitmap": self._read_block_bitmap.cache_info(),
+            "block": self.block_cache.cache_info(),
+            "dentry": self.dentry_cache.cache_info(),
+        }
 
     def get(self, path_or_inum: str | int, node: INode | None = None) -> INode:
         if isinstance(path_or_inum, int):
@@ -120,15 +369,53 @@ class ExtFS:
             if not part:
                 continue
 
-            for entry in node.iterdir():
-                if entry.filename == part:
-                    node = entry
-                    break
-            else:
+            if (entry := node._lookup(part)) is None:
                 raise FileNotFoundError(f"File not found: {path_or_inum}")
+            node = entry
 
         return node
 
+    def walk(self, path: str = "/", inode: INode | None = None) -> Iterator[tuple[str, list[INode], list[INode]]]:
+        """Walk the directory tree top-down, similar to ``os.walk``.
+
+        Yields a tuple of the directory path, the subdirectory inodes and the other inodes of each directory.
+        Removing inodes from the list of subdirectories prevents them from being walked.
+
+        Args:
+            path: The path of the directory to start walking from.
+            inode: Optional inode of ``path``, if it has already been resolved.
+        """
+        top = inode if inode is not None else self.get(path)
+        top_path = "/" + path.strip("/")
+
+        seen = set()
+        stack = [(top_path, top)]
+
+        while stack:
+            path, node = stack.pop()
+
+            # Protect against directory loops in corrupt filesystems
+            if node.inum in seen:
+                log.warning("Directory loop detected at %s (%s)", path, node)
+                continue
+            seen.add(node.inum)
+
+            dirs = []
+            files = []
+            for entry in node.scandir():
+                if entry.name in (".", ".."):
+                    continue
+
+                if entry.is_dir():
+                    dirs.append(entry.inode)
+                else:
+                    files.append(entry.inode)
+
+            yield path, dirs, files
+
+            prefix = path.rstrip("/")
+            stack.extend((f"{prefix}/{entry.filename}", entry) for entry in reversed(dirs))
+
     def get_inode(
         self,
         inum: int,
@@ -140,28 +427,738 @@ class ExtFS:
 
         return INode(self, inum, filename, filetype)
 
+    def iter_inodes(self, groups: Iterable[int] | None = None, allocated: bool | None = None) -> Iterator[INode]:
+        """Iterate over the inodes in the inode tables of the given groups.
+
+        The inode table of each group is read in a single read, instead of reading every inode separately.
+        Groups with an uninitialized inode table and the unused tail of an inode table are skipped.
+
+        Args:
+            groups: The group numbers to iterate the inodes of, defaults to all groups.
+            allocated: Only yield allocated inodes if ``True``, or only unallocated inodes if ``False``.
+                       Unallocated inodes that are completely zeroed are skipped, as they were never in use.
+        """
+        inode_size = self.sb.s_inode_size
+
+        for group_num, inum, buf in self._iter_inode_tables(groups):
+            if allocated is None:
+                indices = range(len(buf) // inode_size)
+            else:
+                indices = self._select_inodes(group_num, buf, allocated)
+
+            for index in indices:
+                inode_buf = buf[index * inode_size : (index + 1) * inode_size]
+                if self._verify_csum:
+                    self._verify_inode(inum + index, inode_buf)
+
+                yield INode(self, inum + index, inode=_parse_inode(inode_buf))
+
+    def iter_inode_columns(
+        self, groups: Iterable[int] | None = None, allocated: bool | None = None
+    ) -> Iterator[InodeColumns]:
+        """Iterate over the inodes in the inode tables of the given groups as columns, one group at a time.
+
+        This is a lot faster than :meth:`iter_inodes` for bulk analysis of inode metadata, since no objects are
+        created for the individual inodes. See :class:`~dissect.extfs.columns.InodeColumns` for the exported fields.
+
+        Args:
+            groups: The group numbers to iterate the inodes of, defaults to all groups.
+            allocated: Only include allocated inodes if ``True``, or only unallocated inodes if ``False``.
+        """
+        inode_size = self.sb.s_inode_size
+
+        for group_num, inum, buf in self._iter_inode_tables(groups):
+            indices = None if allocated is None else self._select_inodes(group_num, buf, allocated)
+
+            if self._verify_csum:
+                for index in range(len(buf) // inode_size) if indices is None else indices:
+                    self._verify_inode(inum + index, buf[index * inode_size : (index + 1) * inode_size])
+
+            yield decode_inode_table(buf, inode_size, inum, indices)
+
+    def inode_columns(self, groups: Iterable[int] | None = None, allocated: bool | None = None) -> InodeColumns:
+        """Return the inodes in the inode tables of the given groups as columns.
+
+        See :meth:`iter_inode_columns` for the arguments.
+        """
+        columns = InodeColumns.empty()
+        for group_columns in self.iter_inode_columns(groups, allocated):
+            columns.extend(group_columns)
+        return columns
+
+    def _iter_inode_tables(self, groups: Iterable[int] | None) -> Iterator[tuple[int, int, bytes]]:
+        """Read the used part of the inode table of the given groups.
+
+        Yields tuples of the group number, the inode number of the first inode and the inode table.
+        """
+        inode_size = self.sb.s_inode_size
+        inodes_per_group = self.sb.s_inodes_per_group
+
+        for group_num in range(self.groups_count) if groups is None else groups:
+            group_desc = self._read_group_desc(group_num)
+
+            count = inodes_per_group
+            if self._has_group_desc_csum:
+                if group_desc.bg_flags & c_ext.EXT4_BG_INODE_UNINIT:
+                    continue
+                count -= self._itable_unused(group_desc)
+
+            if count <= 0:
+                continue
+
+            buf = self.read_at(self._inode_table(group_desc) * self.block_size, count * inode_size)
+            yield group_num, group_num * inodes_per_group + 1, buf
+
+    def _select_inodes(self, group_num: int, buf: bytes, allocated: bool) -> list[int]:
+        """Return the indices of the (un)allocated inodes in an inode table, according to the inode bitmap.
+
+        Unallocated inodes that are completely zeroed are skipped, as they were never in use.
+        """
+        inode_size = self.sb.s_inode_size
+        empty = b"\x00" * inode_size
+        bitmap = self._read_inode_bitmap(group_num)
+
+        indices = []
+        for index, offset in enumerate(range(0, len(buf) - inode_size + 1, inode_size)):
+            if _test_bit(bitmap, index) != allocated:
+                continue
+
+            if not allocated and buf[offset : offset + inode_size] == empty:
+                continue
+
+            indices.append(index)
+        return indices
+
+    def is_inode_allocated(self, inum: int) -> bool:
+        """Return whether the given inode number is allocated according to the inode bitmap."""
+        if inum < c_ext.EXT2_BAD_INO or inum > self.sb.s_inodes_count:
+            raise Error(f"inum out of range {c_ext.EXT2_BAD_INO}-{self.sb.s_inodes_count}: {inum}")
+
+        group_num, index = divmod(inum - 1, self.sb.s_inodes_per_group)
+        return _test_bit(self._read_inode_bitmap(group_num), index)
+
+    def is_block_allocated(self, block: int) -> bool:
+        """Return whether the given block number is allocated according to the block bitmap."""
+        if block < 0 or block > self.last_block:
+            raise Error(f"Block out of range 0-{self.last_block}: {block}")
+
+        if block < self.sb.s_first_data_block:
+            return True
+
+        group_num, index = divmod(block - self.sb.s_first_data_block, self.sb.s_blocks_per_group)
+        return _test_bit(self._read_block_bitmap(group_num), index)
+
+    def unallocated_runs(self) -> Iterator[tuple[int, int]]:
+        """Iterate over the runs of unallocated blocks according to the block bitmaps.
+
+        The block bitmaps are decoded group by group, where uninitialized block bitmaps are reconstructed from the
+        locations of the metadata of the group. Adjacent free blocks, also across groups, are coalesced into a
+        single run. Blocks before ``s_first_data_block`` are never free.
+
+        Returns:
+            An iterator of ``(block, count)`` tuples.
+        """
+        first_data_block = self.sb.s_first_data_block
+        blocks_per_group = self.sb.s_blocks_per_group
+        run_block, run_count = 0, 0
+
+        for group_num in range(self.groups_count):
+            first_block = first_data_block + group_num * blocks_per_group
+            num_blocks = min(blocks_per_group, self.block_count - first_block)
+
+            for index, count in _iter_clear_bits(self._read_block_bitmap(group_num), num_blocks):
+                block = first_block + index
+                if run_count and run_block + run_count == block:
+                    run_count += count
+                    continue
+
+                if run_count:
+                    yield run_block, run_count
+                run_block, run_count = block, count
+
+        if run_count:
+            yield run_block, run_count
+
+    def open_unallocated(self) -> BinaryIO:
+        """Return a stream of the unallocated blocks of the filesystem, concatenated.
+
+        The runs of the stream are available as its ``runlist`` attribute, to map an offset in the stream back to
+        a block of the filesystem.
+        """
+        runlist = Runlist(self.unallocated_runs())
+        size = sum(count for _, count in runlist) * self.block_size
+
+        if (view := self._reader.view) is not None:
+            return MappedRunlistStream(view, runlist, size, self.block_size)
+        return RunlistStream(PositionalFile(self.read_at), runlist, size, self.block_size)
+
+    @cached_property
+    def block_map(self) -> BlockMap:
+        """The reverse map of physical blocks to inodes, which is built on first use.
+
+        See :meth:`build_block_map` and :meth:`load_block_map`.
+        """
+        return self.build_block_map()
+
+    def build_block_map(self) -> BlockMap:
+        """Build a reverse map of physical blocks to inodes, from the data runs of every allocated inode.
+
+        This reads the inode tables and the extent trees or block maps of all files once. Metadata blocks that don't
+        belong to a single inode, such as bitmaps and extended attribute blocks, are not included.
+        """
+
+        def iter_runs() -> Iterator[tuple[int, int, int, int]]:
+            for inode in self.iter_inodes(allocated=True):
+                if inode.inum == c_ext.EXT2_RESIZE_INO or inode.inode.i_flags & c_ext.EXT4_INLINE_DATA_FL:
+                    continue
+
+                if inode.filetype == stat.S_IFLNK and inode.size < 60:
+                    continue
+
+                try:
+                    runs = inode.dataruns()
+                except (Error, EOFError) as e:
+                    log.warning("Unable to determine the blocks of %s: %s", inode, e)
+                    continue
+
+                file_block = 0
+                for run_block, run_count in runs:
+                    if run_block is not None:
+                        yield run_block, run_count, inode.inum, file_block
+                    file_block += run_count
+
+        return BlockMap(self._index_key, iter_runs())
+
+    def load_block_map(self, fh: BinaryIO) -> None:
+        """Load a block map that was saved with :meth:`BlockMap.save`, to use instead of building it.
+
+        Raises:
+            Error: If the block map is invalid or was built from a different filesystem or filesystem state.
+        """
+        self.block_map = BlockMap.load(fh, self._index_key)
+
+    def owner_of_block(self, block: int) -> BlockOwner | None:
+        """Return the inode that owns a physical block, using the :attr:`block_map`.
+
+        Args:
+            block: The physical block number, e.g. ``offset // block_size`` of an offset in the filesystem.
+
+        Returns:
+            A :class:`BlockOwner` with the inode and the logical block in the file, or ``None`` if the block isn't
+            part of the data of any inode.
+        """
+        if (result := self.block_map.lookup(block)) is None:
+            return None
+        return BlockOwner(self.get_inode(result[0]), result[1])
+
+    def owners_of_blocks(self, blocks: Iterable[int]) -> list[BlockOwner | None]:
+        """Return the inodes that own many physical blocks at once, see :meth:`owner_of_block`."""
+        return [
+            None if result is None else BlockOwner(self.get_inode(result[0]), result[1])
+            for result in self.block_map.lookup_many(blocks)
+        ]
+
+    def inode_history(self, inum: int) -> list[InodeVersion]:
+        """Return the versions of an inode found in the journal.
+
+        Only the journal copies of the inode table block that contains the inode are read, which are looked up in
+        the block index of the journal.
+
+        Args:
+            inum: The inode number.
+
+        Returns:
+            A list of :class:`InodeVersion`, ordered by transaction sequence.
+        """
+        if inum < c_ext.EXT2_BAD_INO or inum > self.sb.s_inodes_count:
+            raise Error(f"inum out of range {c_ext.EXT2_BAD_INO}-{self.sb.s_inodes_count}: {inum}")
+
+        group_num, index = divmod(inum - 1, self.sb.s_inodes_per_group)
+        offset = self._inode_table(self._read_group_desc(group_num)) * self.block_size
+        block, block_offset = divmod(offset + index * self.sb.s_inode_size, self.block_size)
+
+        versions = []
+        for entry in self.journal.block_versions(block):
+            buf = entry.tag.read()[block_offset : block_offset + self.sb.s_inode_size]
+            inode = INode(self, inum, inode=_parse_inode(buf))
+            versions.append(
+                InodeVersion(entry.sequence, _commit_ts(entry.commit), entry.journal_block, entry.revoked, inode)
+            )
+
+        return versions
+
+    def dir_history(self, inum: int) -> list[DirVersion]:
+        """Return the versions of the blocks of a directory found in the journal.
+
+        The blocks of the directory are taken from the current inode and from every version of the inode in the
+        journal, so that the blocks of deleted directories are found as well. Only the journal copies of those
+        blocks are read, which are looked up in the block index of the journal.
+
+        Args:
+            inum: The inode number of the directory.
+
+        Returns:
+            A list of :class:`DirVersion`, ordered by transaction sequence and block number.
+        """
+        blocks = set()
+        for inode in [self.get_inode(inum), *(version.inode for version in self.inode_history(inum))]:
+            if inode.filetype != stat.S_IFDIR or inode.inode.i_flags & c_ext.EXT4_INLINE_DATA_FL:
+                continue
+
+            try:
+                for run_block, run_count in inode.dataruns():
+                    if run_block is not None:
+                        blocks.update(range(run_block, run_block + run_count))
+            except (Error, EOFError) as e:
+                log.warning("Unable to determine the blocks of a version of %s: %s", inode, e)
+
+        versions = []
+        for block in blocks:
+            for entry in self.journal.block_versions(block):
+                entries = [
+                    self.get_inode(entry_inum, name, ftype)
+                    for entry_inum, name, ftype in _iter_dir_block(self, entry.tag.read())
+                ]
+                versions.append(
+                    DirVersion(
+                        entry.sequence, _commit_ts(entry.commit), entry.journal_block, entry.revoked, block, entries
+                    )
+                )
+
+        versions.sort(key=lambda version: (version.sequence, version.block))
+        return versions
+
+    def recover_deleted(self) -> Iterator[DeletedFile]:
+        """Recover deleted files from directory slack and unallocated inodes.
+
+        When a directory entry is deleted, its record length is merged into that of the preceding entry, but the
+        entry itself remains in the slack of the preceding entry until it's overwritten. The blocks of every
+        directory, including deleted directories of which the blocks are still free, are scanned for plausible
+        entries in slack space. Entries that refer to an unallocated inode are paired with that inode. Afterwards,
+        the unallocated inodes that weren't named by any entry are yielded without a name.
+
+        The data runs of a deleted inode are recovered from what remains of its extent tree or block map. Extent
+        leaf blocks that are referenced by the inode are only used if they're free in the block bitmap (and have a
+        valid checksum with the ``metadata_csum`` feature). The recovered runs are not validated, but the amount
+        of blocks that has been allocated again since is available as :attr:`DeletedFile.overwritten`.
+
+        The inode tables are read in group order and the directory blocks of the directories in each group are
+        read in block order, so the filesystem is read front to back. Only the names that were found are kept
+        in memory.
+        """
+        inode_size = self.sb.s_inode_size
+        named = set()
+
+        for group_num, inum, buf in self._iter_inode_tables(None):
+            bitmap = self._read_inode_bitmap(group_num)
+
+            blocks = []
+            for index, offset in enumerate(range(0, len(buf) - inode_size + 1, inode_size)):
+                # Cheap check of i_mode before parsing the inode
+                if buf[offset + 1] & 0xF0 != stat.S_IFDIR >> 8:
+                    continue
+
+                inode = INode(self, inum + index, inode=_parse_inode(buf[offset : offset + inode_size]))
+                if inode.inode.i_flags & c_ext.EXT4_INLINE_DATA_FL:
+                    continue
+
+                allocated = _test_bit(bitmap, index)
+                try:
+                    runs = inode.dataruns() if allocated else self._recover_runs(inode)
+                except (Error, EOFError) as e:
+                    log.warning("Unable to determine the blocks of directory %s: %s", inode, e)
+                    continue
+
+                indexed = bool(inode.inode.i_flags & c_ext.EXT4_INDEX_FL)
+                for run_block, run_count in runs:
+                    if run_block is None:
+                        continue
+
+                    # The blocks of a deleted directory are only of interest if they haven't been reused
+                    blocks.extend(
+                        (block, inode.inum, allocated, indexed)
+                        for block in range(run_block, min(run_block + run_count, self.block_count))
+                        if allocated or not self.is_block_allocated(block)
+                    )
+
+            for block, parent, allocated, indexed in sorted(blocks):
+                block_buf = self.read_block(block)
+                if indexed and dx_countlimit_offset(block_buf, self.block_size) is not None:
+                    # Hash index blocks don't contain any (deleted) entries, only index data
+                    continue
+
+                for entry_inum, name, ftype in self._iter_dir_slack(block_buf, include_live=not allocated):
+                    if (entry_inum, parent, name) in named or self.is_inode_allocated(entry_inum):
+                        continue
+
+                    named.add((entry_inum, parent, name))
+                    inode = INode(self, entry_inum, name, ftype)
+                    yield DeletedFile(inode, name, parent, *self._recover_data(inode))
+
+        named = {entry_inum for entry_inum, _, _ in named}
+        for group_num, inum, buf in self._iter_inode_tables(None):
+            for index in self._select_inodes(group_num, buf, False):
+                if inum + index in named:
+                    continue
+
+                offset = index * inode_size
+                inode = INode(self, inum + index, inode=_parse_inode(buf[offset : offset + inode_size]))
+                yield DeletedFile(inode, None, None, *self._recover_data(inode))
+
+    def _iter_dir_slack(self, buf: bytes, include_live: bool = False) -> Iterator[tuple[int, str, int | None]]:
+        """Iterate over the plausible directory entries in the slack space of a directory block.
+
+        Args:
+            buf: The directory block.
+            include_live: Also yield the live entries of the block, except for ``.`` and ``..``.
+        """
+        block_size = len(buf)
+        has_filetype = self._dirtype == c_ext.ext2_dir_entry_2
+        max_rec_len = 65536 if block_size >= 65536 else 0
+
+        offset = 0
+        while offset <= block_size - 12:
+            _, rec_len, name_len, ftype = _dir_entry.unpack_from(buf, offset)
+            if max_rec_len and rec_len in (0, 65535):
+                rec_len = max_rec_len
+
+            if rec_len < 12 or rec_len % 4 or offset + rec_len > block_size:
+                break
+
+            if not has_filetype:
+                name_len |= ftype << 8
+
+            if (
+                include_live
+                and (entry := self._parse_dir_slack_entry(buf, offset, offset + rec_len)) is not None
+                and entry[1] not in (".", "..")
+            ):
+                yield entry
+
+            # Everything after the name of the entry up to the next entry is slack space
+            end = offset + rec_len
+            pos = offset + _dir_rec_len(name_len)
+            while pos <= end - 12:
+                if buf[pos : pos + 4] == b"\x00\x00\x00\x00":
+                    # Skip zeroed space at once, an entry starts with a non-zero inode number
+                    pos = end - (len(buf[pos:end].lstrip(b"\x00")) + 3) // 4 * 4
+                    continue
+
+                if (entry := self._parse_dir_slack_entry(buf, pos, end)) is None:
+                    pos += 4
+                    continue
+
+                yield entry
+                pos += _dir_rec_len(len(entry[1].encode(errors="surrogateescape")))
+
+            offset = end
+
+    def _parse_dir_slack_entry(self, buf: bytes, offset: int, end: int) -> tuple[int, str, int | None] | None:
+        inum, rec_len, name_len, ftype = _dir_entry.unpack_from(buf, offset)
+        if self._dirtype != c_ext.ext2_dir_entry_2:
+            name_len |= ftype << 8
+            ftype = 0
+        elif ftype not in FILETYPES or not ftype:
+            return None
+
+        if (
+            inum < (self.sb.s_first_ino or c_ext.EXT2_GOOD_OLD_FIRST_INO)
+            or inum > self.sb.s_inodes_count
+            or name_len == 0
+            or offset + 8 + name_len > end
+            or rec_len % 4
+            or rec_len < _dir_rec_len(name_len)
+            or offset + rec_len > len(buf)
+        ):
+            return None
+
+        name = buf[offset + 8 : offset + 8 + name_len]
+        if b"\x00" in name or b"/" in name:
+            return None
+
+        return inum, name.decode(errors="surrogateescape"), FILETYPES.get(ftype) if ftype else None
+
+    def _recover_data(self, inode: INode) -> tuple[Runlist, int]:
+        """Recover the runs of a deleted inode and count how many of its blocks are allocated again."""
+        try:
+            runs = self._recover_runs(inode)
+        except (Error, EOFError) as e:
+            log.warning("Unable to recover the runs of %s: %s", inode, e)
+            runs = Runlist()
+
+        overwritten = sum(self._count_allocated_blocks(block, count) for block, count in runs if block is not None)
+        return runs, overwritten
+
+    def _recover_runs(self, inode: INode) -> Runlist:
+        """Recover the runs of a deleted inode from what remains of its extent tree or block map.
+
+        The extent count in the headers of an extent tree is reduced when extents are removed, so every extent slot
+        up to the maximum amount of extents is considered instead.
+        """
+        i_flags = inode.inode.i_flags
+        if i_flags & c_ext.EXT4_INLINE_DATA_FL or (inode.filetype == stat.S_IFLNK and inode.size < 60):
+            return Runlist()
+
+        if not i_flags & c_ext.EXT4_EXTENTS_FL:
+            num_blocks = (inode.size + self.block_size - 1) // self.block_size
+            return _parse_indirect_runs(self, inode.inode.i_block, num_blocks)
+
+        extents = sorted(self._recover_extents(inode, inode.inode.i_block, None, set()))
+
+        runs = Runlist()
+        offset = 0
+        for ee_block, ee_start, ee_len, initialized in extents:
+            if ee_block < offset:
+                # Overlaps an earlier extent, probably a stale one
+                continue
+
+            runs.append(None, ee_block - offset)
+            runs.append(ee_start if initialized else None, ee_len)
+            offset = ee_block + ee_len
+
+        return runs
+
+    def _recover_extents(
+        self, inode: INode, buf: bytes, depth: int | None, seen: set[int]
+    ) -> list[tuple[int, int, int, bool]]:
+        magic, _, eh_max, eh_depth = struct.unpack_from("<4H", buf, 0)
+        if magic != 0xF30A or (depth is not None and eh_depth != depth) or eh_depth > 5:
+            return []
+
+        extents = []
+        for offset in range(12, 12 + 12 * min(eh_max, (len(buf) - 12) // 12), 12):
+            if eh_depth == 0:
+                ee_block, ee_len, ee_start_hi, ee_start_lo = struct.unpack_from("<IHHI", buf, offset)
+                initialized = ee_len <= EXT_INIT_MAX_LEN
+                ee_len = ee_len if initialized else ee_len - EXT_INIT_MAX_LEN
+                ee_start = (ee_start_hi << 32) | ee_start_lo
+
+                if ee_len and ee_start and ee_start + ee_len <= self.block_count:
+                    extents.append((ee_block, ee_start, ee_len, initialized))
+                continue
+
+            _, ei_leaf_lo, ei_leaf_hi = struct.unpack_from("<IIH", buf, offset)
+            leaf = (ei_leaf_hi << 32) | ei_leaf_lo
+            if not leaf or leaf > self.last_block or leaf in seen or self.is_block_allocated(leaf):
+                continue
+
+            seen.add(leaf)
+            leaf_buf = self.read_block(leaf)
+            if self._csum_seed is not None and (result := extent_block_checksum(inode._csum_seed, leaf_buf)):
+                expected, calculated = result
+                if expected != calculated:
+                    # The block belongs to a different inode or has been overwritten
+                    continue
+
+            extents.extend(self._recover_extents(inode, leaf_buf, eh_depth - 1, seen))
+
+        return extents
+
+    def _count_allocated_blocks(self, block: int, count: int) -> int:
+        """Return the amount of allocated blocks in a range of blocks, blocks beyond the filesystem count as well."""
+        end = block + count
+        first_data_block = self.sb.s_first_data_block
+        blocks_per_group = self.sb.s_blocks_per_group
+
+        total = max(0, end - self.block_count)
+        end = min(end, self.block_count)
+
+        if block < first_data_block:
+            total += min(end, first_data_block) - block
+            block = first_data_block
+
+        while block < end:
+            group_num, index = divmod(block - first_data_block, blocks_per_group)
+            num = min(end - block, blocks_per_group - index)
+            bitmap = int.from_bytes(self._read_block_bitmap(group_num), "little")
+            total += ((bitmap >> index) & ((1 << num) - 1)).bit_count()
+            block += num
+
+        return total
+
+    @cached_property
+    def _index_key(self) -> bytes:
+        # Identifies the filesystem and its state, for indexes that are persisted outside of the filesystem
+        return self.sb.s_uuid + struct.pack(
+            "<IIB", self.sb.s_wtime, self.sb.s_mtime, isinstance(self._reader, JournalOverlay)
+        )
+
+    @cached_property
+    def _has_group_desc_csum(self) -> bool:
+        # The group descriptor flags and unused inode counts are only maintained with group descriptor checksums
+        return bool(
+            self.sb.s_feature_ro_compat
+            & (c_ext.EXT4_FEATURE_RO_COMPAT_GDT_CSUM | c_ext.EXT4_FEATURE_RO_COMPAT_METADATA_CSUM)
+        )
+
+    def _block_bitmap(self, group_desc: c_ext.ext2_group_desc | c_ext.ext4_group_desc) -> int:
+        if self._group_desc_struct == c_ext.ext4_group_desc:
+            return (group_desc.bg_block_bitmap_hi << 32) | group_desc.bg_block_bitmap_lo
+        return group_desc.bg_block_bitmap_lo
+
+    def _inode_bitmap(self, group_desc: c_ext.ext2_group_desc | c_ext.ext4_group_desc) -> int:
+        if self._group_desc_struct == c_ext.ext4_group_desc:
+            return (group_desc.bg_inode_bitmap_hi << 32) | group_desc.bg_inode_bitmap_lo
+        return group_desc.bg_inode_bitmap_lo
+
+    def _inode_table(self, group_desc: c_ext.ext2_group_desc | c_ext.ext4_group_desc) -> int:
+        if self._group_desc_struct == c_ext.ext4_group_desc:
+            return (group_desc.bg_inode_table_hi << 32) | group_desc.bg_inode_table_lo
+        return group_desc.bg_inode_table_lo
+
+    def _itable_unused(self, group_desc: c_ext.ext2_group_desc | c_ext.ext4_group_desc) -> int:
+        if self._group_desc_struct == c_ext.ext4_group_desc:
+            return (group_desc.bg_itable_unused_hi << 16) | group_desc.bg_itable_unused_lo
+        return group_desc.bg_itable_unused_lo
+
     def _read_group_desc(self, group_num: int) -> c_ext.ext2_group_desc | c_ext.ext4_group_desc:
         if group_num >= self.groups_count:
             raise Error("Group number exceeds amount of groups")
 
-        offset = self.groups_offset + group_num * self._group_desc_size
-        self.fh.seek(offset)
-        group_desc = self._group_desc_struct(self.fh)
-
-        if self._group_desc_struct == c_ext.ext4_group_desc:
-            block_bitmap = (group_desc.bg_block_bitmap_hi << 32) | group_desc.bg_block_bitmap_lo
-            inode_bitmap = (group_desc.bg_inode_bitmap_hi << 32) | group_desc.bg_inode_bitmap_lo
-            table_block = (group_desc.bg_inode_table_hi << 32) | group_desc.bg_inode_table_lo
+        size = max(self._group_desc_size, len(self._group_desc_struct))
+        if self._group_desc_table is not None:
+            offset = group_num * self._group_desc_size
+            buf = self._group_desc_table[offset : offset + size]
         else:
-            block_bitmap = group_desc.bg_block_bitmap_lo
-            inode_bitmap = group_desc.bg_inode_bitmap_lo
-            table_block = group_desc.bg_inode_table_lo
+            offset = self.groups_offset + group_num * self._group_desc_size
+            buf = self.read_at(offset, size)
+        group_desc = self._group_desc_struct(buf)
+
+        if self.checksums is not None and self._has_group_desc_csum:
+            desc = buf[: self._group_desc_size]
+            if self._csum_seed is not None:
+                calculated = group_desc_checksum(self._csum_seed, group_num, desc)
+            else:
+                calculated = group_desc_crc16(self.sb.s_uuid, group_num, desc)
+            self.checksums.verify(GROUP_DESC, group_num, group_desc.bg_checksum, calculated)
 
+        block_bitmap = self._block_bitmap(group_desc)
+        inode_bitmap = self._inode_bitmap(group_desc)
+        table_block = self._inode_table(group_desc)
         if block_bitmap > self.last_block or inode_bitmap > self.last_block or table_block > self.last_block:
             raise Error("Group descriptor block locations exceed last block")
 
         return group_desc
 
+    def _read_inode_bitmap(self, group_num: int) -> bytes:
+        group_desc = self._read_group_desc(group_num)
+        size = (self.sb.s_inodes_per_group + 7) // 8
+
+        if self._has_group_desc_csum and group_desc.bg_flags & c_ext.EXT4_BG_INODE_UNINIT:
+            return b"\x00" * size
+
+        bitmap = self.read_at(self._inode_bitmap(group_desc) * self.block_size, size)
+        if self._verify_csum:
+            self._verify_bitmap(INODE_BITMAP, group_num, bitmap, group_desc, "bg_inode_bitmap_csum")
+        return bitmap
+
+    def _read_block_bitmap(self, group_num: int) -> bytes:
+        group_desc = self._read_group_desc(group_num)
+
+        if self._has_group_desc_csum and group_desc.bg_flags & c_ext.EXT4_BG_BLOCK_UNINIT:
+            return self._init_block_bitmap(group_num)
+
+        bitmap = self.read_at(self._block_bitmap(group_desc) * self.block_size, (self.sb.s_blocks_per_group + 7) // 8)
+        if self._verify_csum:
+            self._verify_bitmap(BLOCK_BITMAP, group_num, bitmap, group_desc, "bg_block_bitmap_csum")
+        return bitmap
+
+    def _verify_bitmap(
+        self,
+        kind: str,
+        group_num: int,
+        bitmap: bytes,
+        group_desc: c_ext.ext2_group_desc | c_ext.ext4_group_desc,
+        field: str,
+    ) -> None:
+        expected = getattr(group_desc, f"{field}_lo")
+        calculated = crc32c(self._csum_seed, bitmap)
+
+        # The high 16 bits of the checksum are only stored in large group descriptors
+        if self._group_desc_struct == c_ext.ext4_group_desc:
+            expected |= getattr(group_desc, f"{field}_hi") << 16
+        else:
+            calculated &= 0xFFFF
+
+        self.checksums.verify(kind, group_num, expected, calculated)
+
+    def _verify_inode(self, inum: int, buf: bytes) -> None:
+        generation, checksum_lo = struct.unpack_from("<I20xH", buf, 0x64)
+        expected = checksum_lo
+
+        has_hi = False
+        if len(buf) > c_ext.EXT2_GOOD_OLD_INODE_SIZE:
+            extra_isize, checksum_hi = struct.unpack_from("<HH", buf, c_ext.EXT2_GOOD_OLD_INODE_SIZE)
+            if extra_isize >= INODE_CHECKSUM_HI_END:
+                has_hi = True
+                expected |= checksum_hi << 16
+
+        calculated = inode_checksum(inode_seed(self._csum_seed, inum, generation), buf, has_hi)
+        if expected != calculated and buf.count(0) == len(buf):
+            # Inodes that were never used are all zeroes, including their checksum
+            calculated = expected
+
+        self.checksums.verify(INODE, inum, expected, calculated)
+
+    def _init_block_bitmap(self, group_num: int) -> bytes:
+        # Uninitialized block bitmaps only have the group metadata in use, reconstruct it like the kernel does
+        group_desc = self._read_group_desc(group_num)
+        blocks_per_group = self.sb.s_blocks_per_group
+        first_block = self.sb.s_first_data_block + group_num * blocks_per_group
+        num_blocks = min(blocks_per_group, self.block_count - first_block)
+
+        bitmap = bytearray((blocks_per_group + 7) // 8)
+
+        used = list(range(self._num_base_meta_blocks(group_num)))
+        used.append(self._block_bitmap(group_desc) - first_block)
+        used.append(self._inode_bitmap(group_desc) - first_block)
+
+        table_block = self._inode_table(group_desc) - first_block
+        table_blocks = (self.sb.s_inodes_per_group * self.sb.s_inode_size + self.block_size - 1) // self.block_size
+        used.extend(range(table_block, table_block + table_blocks))
+
+        # Blocks past the end of the last group are marked as in use
+        used.extend(range(num_blocks, blocks_per_group))
+
+        for index in used:
+            if 0 <= index < blocks_per_group:
+                bitmap[index >> 3] |= 1 << (index & 7)
+
+        return bytes(bitmap)
+
+    def _num_base_meta_blocks(self, group_num: int) -> int:
+        # The superblock and group descriptor (backup) blocks at the start of a group
+        num = int(self._group_has_super(group_num))
+        desc_per_block = self.block_size // self._group_desc_size
+
+        if (
+            not self.sb.s_feature_incompat & c_ext.EXT2_FEATURE_INCOMPAT_META_BG
+            or group_num < self.sb.s_first_meta_bg * desc_per_block
+        ):
+            if num:
+                num += (self.groups_count + desc_per_block - 1) // desc_per_block
+                num += self.sb.s_reserved_gdt_blocks
+        else:
+            first = group_num - group_num % desc_per_block
+            num += int(group_num in (first, first + 1, first + desc_per_block - 1))
+
+        return num
+
+    def _group_has_super(self, group_num: int) -> bool:
+        if group_num == 0:
+            return True
+
+        if self.sb.s_feature_compat & c_ext.EXT4_FEATURE_COMPAT_SPARSE_SUPER2:
+            return group_num in self.sb.s_backup_bgs
+
+        if group_num <= 1 or not self.sb.s_feature_ro_compat & c_ext.EXT2_FEATURE_RO_COMPAT_SPARSE_SUPER:
+            return True
+
+        if not group_num & 1:
+            return False
+
+        return any(_is_power_of(group_num, base) for base in (3, 5, 7))
+
 
 class INode:
     def __init__(
@@ -170,34 +1167,48 @@ class INode:
         inum: int,
         filename: str | None = None,
         filetype: int | None = None,
+        inode: RawInode | c_ext.ext4_inode | None = None,
     ):
         self.extfs = extfs
         self.inum = inum
         self.filename = filename
         self._filetype = filetype
         self._runlist = None
+        # Only the inode as it's read from the inode table is used with the dentry cache and sidecar index, a given
+        # inode can be an older version, e.g. from the journal
+        self._live = inode is None
+
+        if inode is not None:
+            self.inode = inode
 
     def __repr__(self) -> str:
         return f"<inode {self.inum}>"
 
     @cached_property
-    def inode(self) -> c_ext.ext4_inode:
+    def inode(self) -> RawInode | c_ext.ext4_inode:
         block_group_num, index = divmod(self.inum - 1, self.extfs.sb.s_inodes_per_group)
-        block_group = self.extfs._read_group_desc(block_group_num)
-
-        if self.extfs._group_desc_struct == c_ext.ext4_group_desc:
-            table_block = (block_group.bg_inode_table_hi << 32) | block_group.bg_inode_table_lo
-        else:
-            table_block = block_group.bg_inode_table_lo
+        table_block = self.extfs._inode_table(self.extfs._read_group_desc(block_group_num))
 
         offset = table_block * self.extfs.block_size + index * self.extfs.sb.s_inode_size
-        self.extfs.fh.seek(offset)
-        return c_ext.ext4_inode(self.extfs.fh)
+        buf = self.extfs.read_cached(offset, self.extfs.sb.s_inode_size)
+        if self.extfs._verify_csum:
+            self.extfs._verify_inode(self.inum, buf)
+        return _parse_inode(buf)
 
     @cached_property
     def size(self) -> int:
         return (self.inode.i_size_high << 32) + self.inode.i_size_lo
 
+    @cached_property
+    def _sidecar_tag(self) -> bytes:
+        # Stored runlists are only valid for the same block map, e.g. not for older versions from the journal
+        return self.inode.i_block + struct.pack("<Q", self.size)
+
+    @cached_property
+    def _csum_seed(self) -> int:
+        # Seed of the checksums of the inode and its extent tree and directory blocks
+        return inode_seed(self.extfs._csum_seed, self.inum, self.inode.i_generation)
+
     @property
     def filetype(self) -> int:
         if not self._filetype:
@@ -225,14 +1236,13 @@ class INode:
 
         if self.inode.i_file_acl_lo:
             block = (self.inode.i_file_acl_high << 32) | self.inode.i_file_acl_lo
-            block_offset = block * self.extfs.block_size
 
-            buf = RangeStream(self.extfs.fh, block_offset, self.extfs.block_size)
+            buf = io.BytesIO(self.extfs.read_block(block))
             hdr = c_ext.ext4_xattr_header(buf)
             if hdr.h_magic != c_ext.EXT4_XATTR_MAGIC:
                 raise Error("Invalid xattr magic value")
 
-            xattr.extend(_iter_xattr(self, buf, buf.size))
+            xattr.extend(_iter_xattr(self, buf, self.extfs.block_size))
 
         return xattr
 
@@ -291,39 +1301,224 @@ class INode:
         return _parse_ns_ts(time, time_extra)
 
     def listdir(self) -> dict[str, INode]:
-        return {node.filename: node for node in self.iterdir()}
+        return {entry.name: entry.inode for entry in self.scandir()}
 
     dirlist = listdir
 
     def iterdir(self) -> Iterator[INode]:
+        for inum, name, ftype in self._iter_entries():
+            yield self.extfs.get_inode(inum, name, ftype)
+
+    def scandir(self) -> Iterator[DirEntry]:
+        """Iterate over the entries of this directory, similar to ``os.scandir``.
+
+        Unlike :meth:`iterdir`, the entries don't go through the inode cache of the filesystem and their inode is
+        only resolved when it's used, so listing a directory only reads the directory blocks.
+        """
+        extfs = self.extfs
+        for inum, name, ftype in self._iter_entries():
+            yield DirEntry(extfs, inum, name, ftype)
+
+    def _iter_entries(self) -> Iterator[tuple[int, str, int | None]]:
+        """Iterate over the raw directory entries of this directory.
+
+        The directory is read in large chunks of whole blocks, which are parsed in bulk by :func:`_parse_dir_entries`.
+        The entries of the inode as it's read from the inode table are added to the dentry cache of the filesystem,
+        up to an eighth of its capacity, so that a scan of a huge directory doesn't evict all other entries.
+
+        Returns:
+            An iterator of tuples with the inode number, name and file type of every entry.
+        """
         if self.filetype != stat.S_IFDIR:
             raise NotADirectoryError(f"{self!r} is not a directory")
 
-        buf = self.open()
+        extfs = self.extfs
+        # Like the dentry cache, the sidecar index only contains the entries of the inode from the inode table
+        sidecar = extfs.sidecar if self._live else None
+        if sidecar is not None and (stored := sidecar.get_dir(self.inum)) is not None:
+            yield from stored
+            return
+
+        if extfs._verify_csum and not self.inode.i_flags & c_ext.EXT4_INLINE_DATA_FL:
+            self._verify_dir_blocks()
+
+        fh = self.open()
+        block_size = extfs.block_size
+        read_size = max(block_size, DIR_READ_SIZE - DIR_READ_SIZE % block_size)
+        has_filetype = extfs._dirtype == c_ext.ext2_dir_entry_2
         offset = 0
 
-        while offset < self.size - 12:
-            direntry = self.extfs._dirtype(buf)
+        cache_limit = extfs.dentry_cache.capacity // 8
+        num_cached = 0
+        # All entries are stored in the sidecar index once the directory has been read completely
+        stored = [] if sidecar is not None else None
 
-            if direntry.rec_len == 0:
-                log.critical("Zero-length directory entry in %s (offset 0x%x)", self, offset)
+        while offset < self.size and (buf := fh.read(min(read_size, self.size - offset))):
+            entries, end = _parse_dir_entries(buf, block_size, extfs.sb.s_inodes_count, has_filetype)
+            if self._live and entries and num_cached < cache_limit:
+                batch = entries[: cache_limit - num_cached]
+                extfs.dentry_cache.put_many(self.inum, [(name, inum, ftype) for inum, name, ftype in batch])
+                num_cached += len(batch)
+
+            if stored is not None:
+                stored.extend(entries)
+
+            yield from entries
+
+            if end != len(buf):
+                log.critical("Zero-length directory entry in %s (offset 0x%x)", self, offset + end)
                 return
 
-            # Sanity check if the direntry is valid
-            if 0 < direntry.inode < self.extfs.sb.s_inodes_count:
-                fname = buf.read(direntry.name_len).decode(errors="surrogateescape")
-                ftype = direntry.file_type if self.extfs._dirtype == c_ext.ext2_dir_entry_2 else None
+            offset += len(buf)
 
-                if ftype:
-                    ftype = FILETYPES[ftype]
+        if stored is not None:
+            sidecar.put_dir(self.inum, stored)
 
-                yield self.extfs.get_inode(direntry.inode, fname, ftype)
+    def _verify_dir_blocks(self) -> None:
+        # Directory blocks are read through the block cache, so reading them again after this is cheap
+        for run_block, run_count in self.dataruns():
+            if run_block is not None:
+                for block in range(run_block, run_block + run_count):
+                    self._verify_dir_block(block, self.extfs.read_block(block))
 
-            offset += direntry.rec_len
-            buf.seek(offset)
+    def _verify_dir_block(self, block: int, buf: bytes) -> None:
+        if len(buf) == self.extfs.block_size and (result := dir_block_checksum(self._csum_seed, buf)) is not None:
+            self.extfs.checksums.verify(DIR_BLOCK, block, *result)
+
+    def _physical_block(self, block: int) -> int | None:
+        offset = 0
+        for run_block, run_count in self.dataruns():
+            if block < offset + run_count:
+                return None if run_block is None else run_block + block - offset
+            offset += run_count
+        return None
+
+    def _read_extent_block(self, block: int) -> bytes:
+        buf = self.extfs.read_block(block)
+        if self.extfs._verify_csum and (result := extent_block_checksum(self._csum_seed, buf)) is not None:
+            self.extfs.checksums.verify(EXTENT_BLOCK, block, *result)
+        return buf
+
+    def _lookup(self, name: str) -> INode | None:
+        if self.filetype != stat.S_IFDIR:
+            raise NotADirectoryError(f"{self!r} is not a directory")
+
+        if not self._live:
+            return self._lookup_uncached(name)
+
+        if (cached := self.extfs.dentry_cache.get(self.inum, name)) is not None:
+            inum, ftype = cached
+            return self.extfs.get_inode(inum, name, ftype) if inum else None
+
+        entry = self._lookup_uncached(name)
+        if entry is None:
+            self.extfs.dentry_cache.put(self.inum, name, 0)
+        else:
+            self.extfs.dentry_cache.put(self.inum, name, entry.inum, entry._filetype)
+        return entry
+
+    def _lookup_uncached(self, name: str) -> INode | None:
+        if (
+            self._live
+            and self.extfs.sidecar is not None
+            and (stored := self.extfs.sidecar.lookup(self.inum, name)) is not None
+        ):
+            inum, ftype = stored
+            return self.extfs.get_inode(inum, name, ftype) if inum else None
+
+        if (
+            self.extfs.sb.s_feature_compat & c_ext.EXT2_FEATURE_COMPAT_DIR_INDEX
+            and self.inode.i_flags & c_ext.EXT4_INDEX_FL
+            and not self.inode.i_flags & c_ext.EXT4_INLINE_DATA_FL
+        ):
+            try:
+                return self._dx_lookup(name)
+            except (Error, EOFError) as e:
+                log.warning("Unable to use hash index of %s, falling back to linear scan: %s", self, e)
+
+        for entry in self.scandir():
+            if entry.name == name:
+                return entry.inode
+
+        return None
+
+    def _dx_lookup(self, name: str) -> INode | None:
+        """Look up a filename using the HTree hash index of this directory.
+
+        Only the index blocks on the path to the leaf block that can contain the name are read.
+
+        Raises:
+            Error: If the hash index is corrupt or cannot be used.
+        """
+        block_size = self.extfs.block_size
+        num_blocks = self.size // block_size
+        fh = self.open()
+
+        def read_block(block: int) -> bytes:
+            if block >= num_blocks:
+                raise Error(f"Hash index block out of range: {block}")
+            fh.seek(block * block_size)
+            buf = fh.read(block_size)
+            if self.extfs._verify_csum and (physical := self._physical_block(block)) is not None:
+                self._verify_dir_block(physical, buf)
+            return buf
+
+        buf = read_block(0)
+        root = c_ext.dx_root(buf)
+
+        if root.reserved_zero != 0 or root.info_length != 8:
+            raise Error("Invalid dx_root info")
+
+        hash_version = root.hash_version
+        if hash_version not in (c_ext.DX_HASH_LEGACY, c_ext.DX_HASH_HALF_MD4, c_ext.DX_HASH_TEA):
+            raise Error(f"Unsupported hash version in dx_root: {hash_version}")
+
+        if self.extfs.sb.s_flags & c_ext.EXT2_FLAGS_UNSIGNED_HASH:
+            hash_version += c_ext.DX_HASH_LEGACY_UNSIGNED
+
+        max_levels = 3 if self.extfs.sb.s_feature_incompat & c_ext.EXT4_FEATURE_INCOMPAT_LARGEDIR else 2
+        if root.indirect_levels >= max_levels:
+            raise Error(f"Too many hash index levels: {root.indirect_levels}")
+
+        name_hash, _ = dx_hash(name.encode(errors="surrogateescape"), hash_version, self.extfs.hash_seed)
+
+        # The count and limit fields overlap the (implicitly zero) hash of the first entry
+        offset = len(c_ext.dx_root) - len(c_ext.dx_entry)
+        for level in range(root.indirect_levels + 1):
+            limit, count = c_ext.uint16[2](buf[offset : offset + 4])
+            if count == 0 or count > limit or offset + count * len(c_ext.dx_entry) > block_size:
+                raise Error(f"Invalid dx_entry count at level {level}: {count} (limit {limit})")
+
+            entries = c_ext.dx_entry[count](buf[offset : offset + count * len(c_ext.dx_entry)])
+            idx = bisect_right([entry.hash for entry in entries[1:]], name_hash)
+
+            if level < root.indirect_levels:
+                buf = read_block(entries[idx].block & 0x0FFFFFFF)
+                offset = len(c_ext.dx_node) - len(c_ext.dx_entry)
+                continue
+
+            while True:
+                for inum, entry_name, ftype in _iter_dir_block(self.extfs, read_block(entries[idx].block & 0x0FFFFFFF)):
+                    if entry_name == name:
+                        return self.extfs.get_inode(inum, name, ftype)
+
+                # Entries with colliding hashes may continue in the next leaf block, signalled by the low bit
+                idx += 1
+                if idx >= count:
+                    if level:
+                        raise Error("Hash collision chain continues in next index block")
+                    break
+
+                if entries[idx].hash & ~1 != name_hash:
+                    break
+
+        return None
 
     def dataruns(self) -> list[tuple[int | None, int]]:
-        if not self._runlist:
+        if self._runlist is None and self.extfs.sidecar is not None:
+            self._stored_runs()
+
+        if self._runlist is None:
             expected_runs = (self.size + self.extfs.block_size - 1) // self.extfs.block_size
 
             if self.inode.i_flags & c_ext.EXT4_EXTENTS_FL:
@@ -354,47 +1549,17 @@ class INode:
 
                 self._runlist = runs
             else:
-                i_blocks = c_ext.uint32[15](self.inode.i_block)
-                num_blocks = (self.size + self.extfs.block_size - 1) // self.extfs.block_size
-                num_direct_blocks = min(num_blocks, c_ext.EXT2_NDIR_BLOCKS)
-
-                blocks = i_blocks[:num_direct_blocks]
-                num_blocks -= num_direct_blocks
+                self._runlist = _parse_indirect_runs(self.extfs, self.inode.i_block, expected_runs)
 
-                if num_blocks > 0:
-                    for level in range(c_ext.EXT2_NIND_BLOCKS):
-                        indirect_offset = i_blocks[num_direct_blocks + level]
-                        parsed_blocks = _parse_indirect(self, indirect_offset, num_blocks, level + 1)
-                        num_blocks -= len(parsed_blocks)
-                        blocks.extend(parsed_blocks)
+            if self.extfs.sidecar is not None:
+                self.extfs.sidecar.put_runs(self.inum, self._sidecar_tag, self._runlist)
 
-                        if num_blocks == 0:
-                            break
-
-                runs = []
-                if blocks:
-                    run_offset = None
-                    run_size = 1
-
-                    for block in blocks:
-                        if run_offset is None:
-                            run_offset = block
-                            continue
-
-                        if block == run_offset + run_size:
-                            run_size += 1
-                        else:
-                            if run_offset == 0:
-                                runs.append((None, run_size))
-                            else:
-                                runs.append((run_offset, run_size))
-                            run_offset = block
-                            run_size = 1
-
-                    runs.append((run_offset, run_size))
-
-                self._runlist = runs
+        return self._runlist
 
+    def _stored_runs(self) -> list[tuple[int | None, int]] | None:
+        """Return the runlist of this inode if it's known, either in memory or in the sidecar index."""
+        if self._runlist is None:
+            self._runlist = self.extfs.sidecar.get_runs(self.inum, self._sidecar_tag)
         return self._runlist
 
     def open(self) -> BinaryIO:
@@ -403,7 +1568,61 @@ class INode:
             # Need to add a size attribute to maintain compatibility with dissect streams
             buf.size = self.size
             return buf
-        return RunlistStream(self.extfs.fh, self.dataruns(), self.size, self.extfs.block_size)
+
+        if (view := self.extfs._reader.view) is not None:
+            return MappedRunlistStream(view, self.dataruns(), self.size, self.extfs.block_size)
+
+        # Directory contents are metadata, so read those through the block cache
+        read_at = self.extfs.read_cached if self.filetype == stat.S_IFDIR else self.extfs.read_at
+
+        # A runlist from the sidecar index is used as is, otherwise the extent tree is only read as far as needed
+        if self.inode.i_flags & c_ext.EXT4_EXTENTS_FL and (self.extfs.sidecar is None or self._stored_runs() is None):
+            return ExtentStream(
+                read_at, self.inode.i_block, self.size, self.extfs.block_size, read_block=self._read_extent_block
+            )
+
+        return RunlistStream(PositionalFile(read_at), self.dataruns(), self.size, self.extfs.block_size)
+
+
+class DirEntry:
+    """An entry of a directory, as returned by :meth:`INode.scandir`.
+
+    The name, inode number and file type come from the directory entry itself. The inode is resolved on first use.
+
+    Args:
+        extfs: The filesystem the entry belongs to.
+        inum: The inode number of the entry.
+        name: The name of the entry.
+        file_type: The file type of the entry as one of the ``stat.S_IF*`` constants, or ``None`` if the directory
+                   entry doesn't store the file type.
+    """
+
+    __slots__ = ("_inode", "extfs", "file_type", "inum", "name")
+
+    def __init__(self, extfs: ExtFS, inum: int, name: str, file_type: int | None):
+        self.extfs = extfs
+        self.inum = inum
+        self.name = name
+        self.file_type = file_type
+        self._inode = None
+
+    def __repr__(self) -> str:
+        return f"<DirEntry name={self.name!r} inum={self.inum}>"
+
+    @property
+    def inode(self) -> INode:
+        if self._inode is None:
+            self._inode = INode(self.extfs, self.inum, self.name, self.file_type)
+        return self._inode
+
+    def is_dir(self) -> bool:
+        return (self.file_type or self.inode.filetype) == stat.S_IFDIR
+
+    def is_file(self) -> bool:
+        return (self.file_type or self.inode.filetype) == stat.S_IFREG
+
+    def is_symlink(self) -> bool:
+        return (self.file_type or self.inode.filetype) == stat.S_IFLNK
 
 
 class XAttr:
@@ -421,30 +1640,183 @@ class XAttr:
         return f"<xattr name={self.name} value={self.value} inode={self.inode}>"
 
 
-def _parse_indirect(inode: INode, offset: int, num_blocks: int, level: int) -> list[int]:
-    offsets_per_block = inode.extfs.block_size // 4
+def _replay_journal(fh: BinaryIO, reader: PositionalReader) -> PositionalReader | JournalOverlay:
+    base = ExtFS(fh, block_cache_size=0)
+    if not base.sb.s_feature_incompat & c_ext.EXT3_FEATURE_INCOMPAT_RECOVER:
+        return reader
 
-    if level == 1:
-        read_blocks = min(num_blocks, offsets_per_block)
-        if offset == 0:
-            return [0] * read_blocks
-        inode.extfs.fh.seek(offset * inode.extfs.block_size)
-        return c_ext.uint32[read_blocks](inode.extfs.fh)
+    try:
+        journal = base.journal
+    except Error as e:
+        log.warning("Unable to replay the journal of %s: %s", fh, e)
+        return reader
+
+    if journal.block_size != base.block_size:
+        log.warning("Unable to replay the journal of %s: journal block size differs from filesystem", fh)
+        return reader
 
-    blocks = []
+    overlay = JournalOverlay(reader, journal)
+    return overlay if overlay.blocks else reader
 
-    max_level_blocks = offsets_per_block**level
-    blocks_per_nest = max_level_blocks // offsets_per_block
-    read_blocks = (num_blocks + blocks_per_nest - 1) // blocks_per_nest
-    read_blocks = min(read_blocks, offsets_per_block)
 
-    inode.extfs.fh.seek(offset * inode.extfs.block_size)
-    for addr in c_ext.uint32[read_blocks](inode.extfs.fh):
-        parsed_blocks = _parse_indirect(inode, addr, num_blocks, level - 1)
-        num_blocks -= len(parsed_blocks)
-        blocks.extend(parsed_blocks)
+def _commit_ts(commit: CommitBlock) -> datetime | None:
+    try:
+        return commit.ts
+    except (OverflowError, OSError, ValueError):
+        return None
+
+
+def _test_bit(bitmap: bytes, index: int) -> bool:
+    return bool(bitmap[index >> 3] & (1 << (index & 7)))
+
+
+def _iter_clear_bits(bitmap: bytes, num_bits: int) -> Iterator[tuple[int, int]]:
+    """Iterate over the runs of clear bits in the first ``num_bits`` bits of a bitmap.
+
+    Bytes with all bits set are skipped using a regular expression, the remaining stretches of bytes are converted
+    to a single integer of which the runs are found with bit operations.
+
+    Returns:
+        An iterator of tuples with the index and length of every run.
+    """
+    for match in _not_full.finditer(bitmap):
+        start = match.start() * 8
+        if start >= num_bits:
+            break
+
+        chunk = match.group()
+        bits = ~int.from_bytes(chunk, "little") & ((1 << (len(chunk) * 8)) - 1)
+        index = start
+        while bits:
+            # The clear bits of the bitmap are set in bits, skip to the next run and measure its length
+            skip = (bits & -bits).bit_length() - 1
+            bits >>= skip
+            length = (bits ^ (bits + 1)).bit_length() - 1
+            bits >>= length
+
+            index += skip
+            if index >= num_bits:
+                return
+            yield index, min(length, num_bits - index)
+            index += length
+
+
+def _dir_rec_len(name_len: int) -> int:
+    # The minimal record length of a directory entry, the name is padded to a multiple of 4 bytes
+    return (8 + name_len + 3) & ~3
+
+
+def _is_power_of(value: int, base: int) -> bool:
+    num = base
+    while num < value:
+        num *= base
+    return num == value
+
+
+def _parse_inode(buf: bytes) -> RawInode:
+    # Fields are decoded on access, which is a lot cheaper than parsing the entire structure for every inode
+    return RawInode(buf)
+
+
+def _iter_dir_block(extfs: ExtFS, buf: bytes) -> Iterator[tuple[int, str, int | None]]:
+    entries, _ = _parse_dir_entries(
+        buf, extfs.block_size, extfs.sb.s_inodes_count, extfs._dirtype == c_ext.ext2_dir_entry_2
+    )
+    return iter(entries)
+
+
+def _parse_dir_entries(
+    buf: bytes, block_size: int, inodes_count: int, has_filetype: bool
+) -> tuple[list[tuple[int, str, int | None]], int]:
+    """Parse the directory entries in a buffer of one or more directory blocks.
+
+    Unused entries, such as deleted entries, the checksum tail and the fake entries that hide the hash index from
+    a linear scan, have an inode number of 0 and are skipped. An entry that crosses the end of its block is
+    considered corrupt, and parsing continues at the next block.
+
+    Args:
+        buf: The directory blocks.
+        block_size: The block size in bytes.
+        inodes_count: The amount of inodes of the filesystem, used to skip entries with an invalid inode number.
+        has_filetype: Whether the entries are ``ext2_dir_entry_2`` entries, which include the file type.
+
+    Returns:
+        A tuple of a list of tuples with the inode number, name and file type of every entry, and the offset at
+        which parsing stopped. The latter is less than the size of the buffer if a zero-length entry was found.
+    """
+    entries = []
+    append = entries.append
+    unpack = _dir_entry.unpack_from
+    filetypes = FILETYPES
+    length = len(buf)
+    # A record length of 0 (or 65535) means the entire block on filesystems with 64 KiB blocks
+    max_rec_len = 65536 if block_size >= 65536 else 0
+
+    for block_offset in range(0, length, block_size):
+        offset = block_offset
+        end = min(block_offset + block_size, length)
+
+        while offset <= end - 12:
+            inum, rec_len, name_len, ftype = unpack(buf, offset)
+
+            if max_rec_len and rec_len in (0, 65535):
+                rec_len = max_rec_len
+            elif rec_len == 0:
+                return entries, offset
+
+            if 0 < inum < inodes_count:
+                if not has_filetype:
+                    name_len |= ftype << 8
+                    ftype = 0
+                name = buf[offset + 8 : offset + 8 + name_len].decode(errors="surrogateescape")
+                append((inum, name, filetypes.get(ftype) if ftype else None))
+
+            offset += rec_len
+
+    return entries, length
+
+
+def _parse_indirect_runs(extfs: ExtFS, i_block: bytes, num_blocks: int) -> Runlist:
+    runlist = Runlist()
+
+    i_blocks = c_ext.uint32[c_ext.EXT2_N_BLOCKS](i_block)
+    num_direct_blocks = min(num_blocks, c_ext.EXT2_NDIR_BLOCKS)
+
+    for block in i_blocks[:num_direct_blocks]:
+        runlist.append(block, 1)
+    num_blocks -= num_direct_blocks
+
+    for level in range(c_ext.EXT2_NIND_BLOCKS):
+        if num_blocks <= 0:
+            break
+        num_blocks -= _parse_indirect(extfs, runlist, i_blocks[c_ext.EXT2_NDIR_BLOCKS + level], num_blocks, level + 1)
+
+    return runlist
+
+
+def _parse_indirect(extfs: ExtFS, runlist: Runlist, block: int, num_blocks: int, level: int) -> int:
+    offsets_per_block = extfs.block_size // 4
+    blocks_per_entry = offsets_per_block ** (level - 1)
+    num_blocks = min(num_blocks, blocks_per_entry * offsets_per_block)
+
+    if block == 0:
+        # The entire (sub)tree is sparse
+        runlist.append(None, num_blocks)
+        return num_blocks
+
+    num_entries = (num_blocks + blocks_per_entry - 1) // blocks_per_entry
+    buf = extfs.read_block(block)[: num_entries * 4]
+    if len(buf) != num_entries * 4:
+        raise Error(f"Indirect block {block} lies beyond the end of the filesystem")
+
+    if level == 1:
+        return runlist.extend_blocks(buf)
+
+    parsed_blocks = 0
+    for addr in c_ext.uint32[num_entries](buf):
+        parsed_blocks += _parse_indirect(extfs, runlist, addr, num_blocks - parsed_blocks, level - 1)
 
-    return blocks
+    return parsed_blocks
 
 
 def _parse_extents(inode: INode, buf: bytes) -> Iterator[c_ext.ext4_extent]:
@@ -462,9 +1834,7 @@ def _parse_extents(inode: INode, buf: bytes) -> Iterator[c_ext.ext4_extent]:
             idx = c_ext.ext4_extent_idx(buf)
             child = (idx.ei_leaf_hi << 32) | idx.ei_leaf_lo
 
-            fh = inode.extfs.fh
-            fh.seek(child * inode.extfs.block_size)
-            blockbuf = io.BytesIO(fh.read(inode.extfs.block_size))
+            blockbuf = io.BytesIO(inode._read_extent_block(child))
             yield from _parse_extents(inode, blockbuf)
 
 
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+from dissect.extfs.c_ext import c_ext
+from dissect.extfs.exceptions import Error
+
+# Default seed used when the superblock hash seed is all zeroes
+DEFAULT_SEED = (0x67452301, 0xEFCDAB89, 0x98BADCFE, 0x10325476)
+
+TEA_DELTA = 0x9E3779B9
+HALF_MD4_K2 = 0o13240474631
+HALF_MD4_K3 = 0o15666365641
+
+
+def dx_hash(name: bytes, hash_version: int, seed: tuple[int, int, int, int] | None = None) -> tuple[int, int]:
+    """Calculate the HTree directory hash of a filename.
+
+    Args:
+        name: The filename to hash.
+        hash_version: One of the ``DX_HASH_*`` hash versions.
+        seed: The hash seed from the superblock (``s_hash_seed``), as four 32-bit integers.
+
+    Returns:
+        A tuple of the major and minor hash.
+    """
+    buf = list(seed) if seed and any(seed) else list(DEFAULT_SEED)
+    minor_hash = 0
+
+    if hash_version == c_ext.DX_HASH_LEGACY:
+        major_hash = _dx_hack_hash(name, True)
+    elif hash_version == c_ext.DX_HASH_LEGACY_UNSIGNED:
+        major_hash = _dx_hack_hash(name, False)
+    elif hash_version in (c_ext.DX_HASH_HALF_MD4, c_ext.DX_HASH_HALF_MD4_UNSIGNED):
+        signed = hash_version == c_ext.DX_HASH_HALF_MD4
+        for offset in range(0, len(name), 32):
+            _half_md4_transform(buf, _str2hashbuf(name[offset:], 8, signed))
+        major_hash, minor_hash = buf[1], buf[2]
+    elif hash_version in (c_ext.DX_HASH_TEA, c_ext.DX_HASH_TEA_UNSIGNED):
+        signed = hash_version == c_ext.DX_HASH_TEA
+        for offset in range(0, len(name), 16):
+            _tea_transform(buf, _str2hashbuf(name[offset:], 4, signed))
+        major_hash, minor_hash = buf[0], buf[1]
+    else:
+        raise Error(f"Unsupported directory hash version: {hash_version}")
+
+    major_hash &= ~1 & 0xFFFFFFFF
+    if major_hash == (c_ext.EXT4_HTREE_EOF_32BIT << 1):
+        major_hash = (c_ext.EXT4_HTREE_EOF_32BIT - 1) << 1
+
+    return major_hash, minor_hash
+
+
+def _char(value: int, signed: bool) -> int:
+    return value - 0x100 if signed and value >= 0x80 else value
+
+
+def _dx_hack_hash(name: bytes, signed: bool) -> int:
+    hash0, hash1 = 0x12A3FE2D, 0x37ABE8F9
+
+    for c in name:
+        value = hash1 + (hash0 ^ ((_char(c, signed) * 7152373) & 0xFFFFFFFF))
+        value &= 0xFFFFFFFF
+        if value & 0x80000000:
+            value = (value - 0x7FFFFFFF) & 0xFFFFFFFF
+        hash1, hash0 = hash0, value
+
+    return (hash0 << 1) & 0xFFFFFFFF
+
+
+def _str2hashbuf(msg: bytes, num: int, signed: bool) -> list[int]:
+    length = len(msg)
+    pad = (length | (length << 8)) & 0xFFFFFFFF
+    pad |= (pad << 16) & 0xFFFFFFFF
+
+    result = []
+    value = pad
+    for i, c in enumerate(msg[: num * 4]):
+        value = (_char(c, signed) + (value << 8)) & 0xFFFFFFFF
+        if i % 4 == 3:
+            result.append(value)
+            value = pad
+
+    if len(result) < num:
+        result.append(value)
+    result.extend([pad] * (num - len(result)))
+
+    return result
+
+
+def _tea_transform(buf: list[int], data: list[int]) -> None:
+    total = 0
+    b0, b1 = buf[0], buf[1]
+    a, b, c, d = data
+
+    for _ in range(16):
+        total = (total + TEA_DELTA) & 0xFFFFFFFF
+        b0 = (b0 + ((((b1 << 4) + a) ^ (b1 + total) ^ ((b1 >> 5) + b)) & 0xFFFFFFFF)) & 0xFFFFFFFF
+        b1 = (b1 + ((((b0 << 4) + c) ^ (b0 + total) ^ ((b0 >> 5) + d)) & 0xFFFFFFFF)) & 0xFFFFFFFF
+
+    buf[0] = (buf[0] + b0) & 0xFFFFFFFF
+    buf[1] = (buf[1] + b1) & 0xFFFFFFFF
+
+
+def _rol32(value: int, shift: int) -> int:
+    value &= 0xFFFFFFFF
+    return ((value << shift) | (value >> (32 - shift))) & 0xFFFFFFFF
+
+
+def _half_md4_transform(buf: list[int], data: list[int]) -> None:
+    def f(x: int, y: int, z: int) -> int:
+        return z ^ (x & (y ^ z))
+
+    def g(x: int, y: int, z: int) -> int:
+        return (x & y) + ((x ^ y) & z)
+
+    def h(x: int, y: int, z: int) -> int:
+        return x ^ y ^ z
+
+    a, b, c, d = buf
+
+    # Round 1
+    a = _rol32(a + f(b, c, d) + data[0], 3)
+    d = _rol32(d + f(a, b, c) + data[1], 7)
+    c = _rol32(c + f(d, a, b) + data[2], 11)
+    b = _rol32(b + f(c, d, a) + data[3], 19)
+    a = _rol32(a + f(b, c, d) + data[4], 3)
+    d = _rol32(d + f(a, b, c) + data[5], 7)
+    c = _rol32(c + f(d, a, b) + data[6], 11)
+    b = _rol32(b + f(c, d, a) + data[7], 19)
+
+    # Round 2
+    a = _rol32(a + g(b, c, d) + data[1] + HALF_MD4_K2, 3)
+    d = _rol32(d + g(a, b, c) + data[3] + HALF_MD4_K2, 5)
+    c = _rol32(c + g(d, a, b) + data[5] + HALF_MD4_K2, 9)
+    b = _rol32(b + g(c, d, a) + data[7] + HALF_MD4_K2, 13)
+    a = _rol32(a + g(b, c, d) + data[0] + HALF_MD4_K2, 3)
+    d = _rol32(d + g(a, b, c) + data[2] + HALF_MD4_K2, 5)
+    c = _rol32(c + g(d, a, b) + data[4] + HALF_MD4_K2, 9)
+    b = _rol32(b + g(c, d, a) + data[6] + HALF_MD4_K2, 13)
+
+    # Round 3
+    a = _rol32(a + h(b, c, d) + data[3] + HALF_MD4_K3, 3)
+    d = _rol32(d + h(a, b, c) + data[7] + HALF_MD4_K3, 9)
+    c = _rol32(c + h(d, a, b) + data[2] + HALF_MD4_K3, 11)
+    b = _rol32(b + h(c, d, a) + data[6] + HALF_MD4_K3, 15)
+    a = _rol32(a + h(b, c, d) + data[1] + HALF_MD4_K3, 3)
+    d = _rol32(d + h(a, b, c) + data[5] + HALF_MD4_K3, 9)
+    c = _rol32(c + h(d, a, b) + data[0] + HALF_MD4_K3, 11)
+    b = _rol32(b + h(c, d, a) + data[4] + HALF_MD4_K3, 15)
+
+    buf[0] = (buf[0] + a) & 0xFFFFFFFF
+    buf[1] = (buf[1] + b) & 0xFFFFFFFF
+    buf[2] = (buf[2] + c) & 0xFFFFFFFF
+    buf[3] = (buf[3] + d) & 0xFFFFFFFF
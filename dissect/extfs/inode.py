@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import struct
+from typing import Any
+
+from dissect.extfs.c_ext import c_ext
+
+# Offset of the variable sized i_extra field, everything before it has a fixed offset and size
+_EXTRA_OFFSET = c_ext.ext4_inode.fields["i_extra"].offset
+_EXTRA_ISIZE = struct.Struct("<H")
+_EXTRA_ISIZE_OFFSET = c_ext.ext4_inode.fields["i_extra_isize"].offset
+
+
+class _IntField:
+    __slots__ = ("offset", "unpack_from")
+
+    def __init__(self, fmt: str, offset: int):
+        self.offset = offset
+        self.unpack_from = struct.Struct(fmt).unpack_from
+
+    def __get__(self, obj: RawInode | None, objtype: type | None = None) -> Any:
+        if obj is None:
+            return self
+        return self.unpack_from(obj._buf, self.offset)[0]
+
+
+class _BytesField:
+    __slots__ = ("end", "offset")
+
+    def __init__(self, offset: int, size: int):
+        self.offset = offset
+        self.end = offset + size
+
+    def __get__(self, obj: RawInode | None, objtype: type | None = None) -> Any:
+        if obj is None:
+            return self
+        return obj._buf[self.offset : self.end]
+
+
+class RawInode:
+    """A memory efficient representation of an on-disk inode.
+
+    Only the raw bytes of the inode are kept, the fields are decoded every time they're accessed. The fields have the
+    same names and values as those of the ``ext4_inode`` structure, but a ``RawInode`` takes a fraction of the memory
+    of a parsed structure and is a lot cheaper to create.
+
+    Args:
+        buf: The raw inode, of ``s_inode_size`` bytes.
+    """
+
+    __slots__ = ("_buf",)
+
+    def __init__(self, buf: bytes):
+        # Pad small (128 byte) inodes, so the extra fields can be decoded as 0 like the structure does
+        if len(buf) < _EXTRA_OFFSET:
+            buf = bytes(buf).ljust(_EXTRA_OFFSET, b"\x00")
+        self._buf = bytes(buf)
+
+    def __repr__(self) -> str:
+        return f"<RawInode i_mode=0x{self.i_mode:x} i_size_lo={self.i_size_lo} i_flags=0x{self.i_flags:x}>"
+
+    def __len__(self) -> int:
+        return _EXTRA_OFFSET + len(self.i_extra)
+
+    @property
+    def i_extra(self) -> bytes:
+        (extra_isize,) = _EXTRA_ISIZE.unpack_from(self._buf, _EXTRA_ISIZE_OFFSET)
+        size = max(0, 256 - 128 - extra_isize)
+        return self._buf[_EXTRA_OFFSET : _EXTRA_OFFSET + size].ljust(size, b"\x00")
+
+    def dumps(self) -> bytes:
+        """Return the inode as the ``ext4_inode`` structure would dump it."""
+        return self._buf[:_EXTRA_OFFSET] + self.i_extra
+
+
+def _add_fields() -> None:
+    formats = {1: "<B", 2: "<H", 4: "<I", 8: "<Q"}
+
+    for field in c_ext.ext4_inode.__fields__:
+        if field.offset >= _EXTRA_OFFSET:
+            continue
+
+        if issubclass(field.type, bytes):
+            setattr(RawInode, field.name, _BytesField(field.offset, field.type.size))
+        else:
+            setattr(RawInode, field.name, _IntField(formats[field.type.size], field.offset))
+
+
+_add_fields()
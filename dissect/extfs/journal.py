@@ -2,36 +2,113 @@ from __future__ import annotations
 
 import datetime
 import io
-from typing import TYPE_CHECKING, BinaryIO
+import struct
+from bisect import bisect_left, bisect_right
+from functools import cached_property
+from typing import TYPE_CHECKING, BinaryIO, NamedTuple
 
 from dissect.util.stream import RangeStream
 
 from dissect.extfs.c_jdb2 import c_jdb2
+from dissect.extfs.checksum import (
+    JOURNAL_BLOCK,
+    JOURNAL_COMMIT,
+    JOURNAL_DESCRIPTOR,
+    JOURNAL_REVOKE,
+    JOURNAL_SUPERBLOCK,
+    crc32c,
+    journal_block_checksum,
+)
 from dissect.extfs.exceptions import Error
+from dissect.extfs.util import PositionalFile, PositionalReader
 
 if TYPE_CHECKING:
     from collections.abc import Iterator
 
+    from dissect.extfs.checksum import ChecksumVerifier
+
+# Amount of bytes to read at once when walking the journal
+WALK_CHUNK_SIZE = 1024 * 1024
+
+
+class JournalBlock(NamedTuple):
+    """A copy of a filesystem block in the journal."""
+
+    sequence: int
+    journal_block: int
+    revoked: bool
+    tag: DescriptorBlockTag
+    commit: CommitBlock
+
 
 class JDB2:
-    def __init__(self, fh: BinaryIO):
+    """JDB2 journal implementation.
+
+    Args:
+        fh: The file-like object of the journal.
+        verifier: Optional :class:`~dissect.extfs.checksum.ChecksumVerifier` to verify the checksums of the journal
+                  superblock and of the journal blocks when they are read, if the journal has checksums.
+    """
+
+    def __init__(self, fh: BinaryIO, verifier: ChecksumVerifier | None = None):
         self.fh = fh
+        self._reader = PositionalReader(fh)
+        self.verifier = verifier
 
-        sb = c_jdb2.journal_superblock(self.fh)
+        sb_buf = self.read_at(0, len(c_jdb2.journal_superblock))
+        sb = c_jdb2.journal_superblock(sb_buf)
         self.sb = sb
 
         if sb.s_header.h_magic != c_jdb2.JBD2_MAGIC_NUMBER:
             raise Error("Not a valid JDB2 journal (magic mismatch)")
 
         self.block_size = sb.s_blocksize
-        self._blocktag = c_jdb2.journal_block_tag
-        if sb.s_feature_incompat & c_jdb2.JBD2_FEATURE_INCOMPAT_CSUM_V3:
+        self.is_64bit = bool(sb.s_feature_incompat & c_jdb2.JBD2_FEATURE_INCOMPAT_64BIT)
+
+        csum_v2 = sb.s_feature_incompat & c_jdb2.JBD2_FEATURE_INCOMPAT_CSUM_V2
+        csum_v3 = sb.s_feature_incompat & c_jdb2.JBD2_FEATURE_INCOMPAT_CSUM_V3
+
+        # Size of the tags in a descriptor block, see journal_tag_bytes() in the kernel
+        if csum_v3:
             self._blocktag = c_jdb2.journal_block_tag3
+            self._tag_size = len(c_jdb2.journal_block_tag3)
+            self._tag_flags = struct.Struct(">4xI")
+        else:
+            self._blocktag = c_jdb2.journal_block_tag
+            self._tag_size = len(c_jdb2.journal_block_tag) + (2 if csum_v2 else 0) - (0 if self.is_64bit else 4)
+            self._tag_flags = struct.Struct(">6xH")
+
+        # Descriptor and revoke blocks end with a checksum tail when journal checksums are enabled
+        self._tail_size = 4 if csum_v2 or csum_v3 else 0
+
+        self._csum_seed = None
+        self._verify_csum = False
+        if csum_v2 or csum_v3:
+            self._csum_seed = crc32c(0xFFFFFFFF, sb.s_uuid)
+            self._verify_csum = verifier is not None
+
+        if self._verify_csum:
+            offset = len(c_jdb2.journal_superblock) - len(sb.s_users) - 4
+            calculated = crc32c(0xFFFFFFFF, sb_buf[:offset] + b"\x00" * 4 + sb_buf[offset + 4 :])
+            verifier.verify(JOURNAL_SUPERBLOCK, 0, sb.s_checksum, calculated)
+
+    def read_at(self, offset: int, size: int) -> bytes:
+        return self._reader.read_at(offset, size)
 
     def read_block(self, block: int, count: int = 1) -> bytes:
-        offset = block * self.block_size
-        self.fh.seek(offset)
-        return self.fh.read(self.block_size * count)
+        return self.read_at(block * self.block_size, self.block_size * count)
+
+    def _verify_block(self, kind: str, journal_block: int, buf: bytes, offset: int) -> None:
+        # Checksum over the entire block, with the checksum itself (at offset) treated as zero
+        (expected,) = struct.unpack_from(">I", buf, offset)
+        calculated = crc32c(self._csum_seed, buf[:offset] + b"\x00" * 4 + buf[offset + 4 :])
+        self.verifier.verify(kind, journal_block, expected, calculated)
+
+    def _wrap(self, block: int) -> int:
+        # The log is circular, wrapping around from the end of the journal back to s_first
+        if block >= self.sb.s_maxlen:
+            block -= self.sb.s_maxlen - self.sb.s_first
+        return block
 
     def commits(self) -> Iterator[CommitBlock]:
         cur_seq = None
@@ -46,6 +123,7 @@ class JDB2:
 
     def commits_all(self) -> Iterator[CommitBlock]:
         desc_buf = {}
+        revoke_buf = {}
 
         for block in self.walk():
             if isinstance(block, DescriptorBlock):
@@ -53,35 +131,217 @@ class JDB2:
                     desc_buf[block.sequence] = []
 
                 desc_buf[block.sequence].append(block)
-            elif isinstance(block, CommitBlock):
-                block.descriptors = desc_buf.get(block.sequence, [])
+            elif isinstance(block, RevokeBlock):
+                if block.sequence not in revoke_buf:
+                    revoke_buf[block.sequence] = []
 
-                if block.sequence in desc_buf:
-                    del desc_buf[block.sequence]
+                revoke_buf[block.sequence].append(block)
+            elif isinstance(block, CommitBlock):
+                block.descriptors = desc_buf.pop(block.sequence, [])
+                block.revokes = revoke_buf.pop(block.sequence, [])
 
                 yield block
 
-    def walk(self) -> Iterator[CommitBlock]:
-        block_num = self.sb.s_first
+    @cached_property
+    def block_index(self) -> dict[int, list[JournalBlock]]:
+        """An index of all copies of filesystem blocks in the committed transactions of the journal.
+
+        Maps filesystem block numbers to a list of :class:`JournalBlock`, ordered by transaction sequence. A copy is
+        marked as revoked if the block is revoked in the same or a later transaction.
+        """
+        index = {}
+        revoked = {}
+
+        for commit in self.commits_all():
+            for descriptor in commit.descriptors:
+                for tag in descriptor.tags():
+                    entry = (commit.sequence, tag.journal_block, tag, commit)
+                    index.setdefault(tag.block, []).append(entry)
+
+            for revoke in commit.revokes:
+                for block in revoke.blocks():
+                    revoked[block] = max(revoked.get(block, commit.sequence), commit.sequence)
+
+        result = {}
+        for block, entries in index.items():
+            entries.sort(key=lambda entry: (entry[0], entry[1]))
+            revoked_sequence = revoked.get(block, -1)
+            result[block] = [
+                JournalBlock(sequence, journal_block, sequence <= revoked_sequence, tag, commit)
+                for sequence, journal_block, tag, commit in entries
+            ]
+
+        return result
+
+    def block_versions(self, block: int) -> list[JournalBlock]:
+        """Return all copies of a filesystem block in the committed transactions of the journal.
+
+        Args:
+            block: The filesystem block number.
+        """
+        return self.block_index.get(block, [])
+
+    def walk(self) -> Iterator[DescriptorBlock | RevokeBlock | CommitBlock]:
+        """Walk all journal blocks in the journal, including those of old transactions.
+
+        The journal is read in large chunks, in which the journal headers are located by searching the start of
+        every block for the journal magic number at once. The data blocks of descriptor blocks are skipped. If the
+        journal is in use, the walk starts at the start of the log (``s_start``) and wraps around the end of the
+        journal, so that the blocks are yielded in the order they were written.
+        """
+        first, end = self.sb.s_first, self.sb.s_maxlen
+        start = self.sb.s_start if first < self.sb.s_start < end else first
+
+        block_size = self.block_size
+        chunk_blocks = max(1, WALK_CHUNK_SIZE // block_size)
+        magic = c_jdb2.uint32(c_jdb2.JBD2_MAGIC_NUMBER).dumps()
+        header_size = len(c_jdb2.journal_header)
+        commit_header_size = len(c_jdb2.commit_header)
+        descriptor_type, commit_type, revoke_type = (
+            c_jdb2.JBD2_DESCRIPTOR_BLOCK,
+            c_jdb2.JBD2_COMMIT_BLOCK,
+            c_jdb2.JBD2_REVOKE_BLOCK,
+        )
+
+        # Position in the journal relative to the start of the walk
+        pos = 0
+        total = end - first
+
+        while pos < total:
+            chunk_start = self._wrap(start + pos)
+            # Chunks can't cross the end of the journal
+            count = min(chunk_blocks, total - pos, end - chunk_start)
+            buf = self.read_block(chunk_start, count)
+
+            # Gather the first 4 bytes of every block, so we only have to search those for the magic number
+            num_read = len(buf) // block_size
+            heads = memoryview(buf)[: num_read * block_size].cast("I")[:: block_size // 4].tobytes()
+
+            next_pos = pos + count
+            idx = 0
+            while (idx := heads.find(magic, idx)) != -1:
+                if idx % 4:
+                    idx += 4 - idx % 4
+                    continue
+
+                offset = idx * (block_size // 4)
+                block_num = chunk_start + offset // block_size
+                header = c_jdb2.journal_header(buf[offset : offset + header_size])
+
+                num_blocks = 1
+                if header.h_blocktype == descriptor_type:
+                    num_blocks += self._count_tags(buf[offset : offset + block_size])
+                    yield DescriptorBlock(self, header, block_num)
+                elif header.h_blocktype == commit_type:
+                    header = c_jdb2.commit_header(buf[offset : offset + commit_header_size])
+                    if self._verify_csum:
+                        self._verify_block(JOURNAL_COMMIT, block_num, buf[offset : offset + block_size], 16)
+                    yield CommitBlock(self, header, block_num)
+                elif header.h_blocktype == revoke_type:
+                    yield RevokeBlock(self, header, block_num)
+
+                idx += num_blocks * 4
+                if idx >= len(heads):
+                    # Data blocks of a descriptor block may continue into the next chunk
+                    next_pos = pos + idx // 4
+                    break
+
+            if len(buf) < count * block_size:
+                # The journal is truncated
+                break
 
-        while block_num < self.sb.s_maxlen - 1:
-            offset = block_num * self.block_size
-            self.fh.seek(offset)
+            pos = next_pos
+
+    def _count_tags(self, buf: bytes) -> int:
+        # Only look at the flags of the tags, which is a lot cheaper than parsing them like tags() does
+        count = 0
+        offset = len(c_jdb2.journal_header)
+        end = len(buf) - self._tail_size
+        tag_size = self._tag_size
+        unpack_flags = self._tag_flags.unpack_from
+        last_tag, same_uuid = c_jdb2.JBD2_FLAG_LAST_TAG, c_jdb2.JBD2_FLAG_SAME_UUID
+
+        while offset + tag_size <= end:
+            count += 1
+            (flags,) = unpack_flags(buf, offset)
+            if flags & last_tag:
+                break
 
-            header = c_jdb2.journal_header(self.fh)
-            if header.h_magic != c_jdb2.JBD2_MAGIC_NUMBER:
-                block_num += 1
-                continue
+            offset += tag_size
+            if not flags & same_uuid:
+                offset += 16
 
+        return count
+
+    def log(self) -> Iterator[DescriptorBlock | RevokeBlock | CommitBlock]:
+        """Walk the active part of the log, the same way the kernel does when recovering the journal.
+
+        The log starts at ``s_start`` with transaction ``s_sequence`` and ends at the first block that is not a
+        journal block of the expected transaction. The data blocks of descriptor blocks are skipped.
+        """
+        if not self.sb.s_start:
+            # Clean journal, nothing to recover
+            return
+
+        block_num = self.sb.s_start
+        sequence = self.sb.s_sequence
+        remaining = self.sb.s_maxlen - self.sb.s_first
+
+        while remaining > 0:
+            header = c_jdb2.journal_header(self.read_at(block_num * self.block_size, len(c_jdb2.journal_header)))
+            if header.h_magic != c_jdb2.JBD2_MAGIC_NUMBER or header.h_sequence != sequence:
+                break
+
+            num_blocks = 1
             if header.h_blocktype == c_jdb2.JBD2_DESCRIPTOR_BLOCK:
-                yield DescriptorBlock(self, header, block_num)
+                block = DescriptorBlock(self, header, block_num)
+                num_blocks += sum(1 for _ in block.tags())
             elif header.h_blocktype == c_jdb2.JBD2_COMMIT_BLOCK:
-                self.fh.seek(offset)
-                yield CommitBlock(self, c_jdb2.commit_header(self.fh), block_num)
+                header = c_jdb2.commit_header(self.read_at(block_num * self.block_size, len(c_jdb2.commit_header)))
+                if self._verify_csum:
+                    self._verify_block(JOURNAL_COMMIT, block_num, self.read_block(block_num), 16)
+                block = CommitBlock(self, header, block_num)
+                sequence = (sequence + 1) & 0xFFFFFFFF
             elif header.h_blocktype == c_jdb2.JBD2_REVOKE_BLOCK:
-                pass
+                block = RevokeBlock(self, header, block_num)
+            else:
+                break
+
+            yield block
+
+            block_num = self._wrap(block_num + num_blocks)
+            remaining -= num_blocks
+
+    def replay_map(self) -> dict[int, DescriptorBlockTag]:
+        """Determine the newest journal copy of every filesystem block that a journal recovery would write.
+
+        Only transactions that have been committed are taken into account. Blocks revoked in a transaction are not
+        replayed from that or any earlier transaction.
+
+        Returns:
+            A dictionary mapping filesystem block numbers to the descriptor block tag of the journal copy.
+        """
+        result = {}
+        tags = []
+        revoked = set()
+
+        for block in self.log():
+            if isinstance(block, DescriptorBlock):
+                tags.extend(block.tags())
+            elif isinstance(block, RevokeBlock):
+                revoked.update(block.blocks())
+            elif isinstance(block, CommitBlock):
+                for fs_block in revoked:
+                    result.pop(fs_block, None)
+
+                for tag in tags:
+                    if tag.block not in revoked:
+                        result[tag.block] = tag
 
-            block_num += 1
+                tags = []
+                revoked = set()
+
+        return result
 
 
 class DescriptorBlock:
@@ -96,19 +356,29 @@ class DescriptorBlock:
         return f"<descriptor_block sequence={self.sequence} journal_block={self.journal_block}>"
 
     def tags(self) -> Iterator[DescriptorBlockTag]:
-        self.jdb2.fh.seek((self.journal_block * self.jdb2.block_size) + c_jdb2.journal_header.size)
+        jdb2 = self.jdb2
+        buf = jdb2.read_block(self.journal_block)
+        tag_struct_size = len(jdb2._blocktag)
+
+        if jdb2._verify_csum:
+            jdb2._verify_block(JOURNAL_DESCRIPTOR, self.journal_block, buf, len(buf) - 4)
 
-        block_count = 1
-        while True:
-            tag = self.jdb2._blocktag(self.jdb2.fh)
-            yield DescriptorBlockTag(self, tag, self.journal_block + block_count)
+        offset = len(c_jdb2.journal_header)
+        end = len(buf) - jdb2._tail_size
+        journal_block = self.journal_block
+
+        while offset + jdb2._tag_size <= end:
+            # Tags can be smaller than the structure, e.g. without the high 32 bits of the block number
+            tag = jdb2._blocktag(buf[offset : offset + tag_struct_size].ljust(tag_struct_size, b"\x00"))
+            journal_block = jdb2._wrap(journal_block + 1)
+            yield DescriptorBlockTag(self, tag, journal_block)
 
             if tag.t_flags & c_jdb2.JBD2_FLAG_LAST_TAG:
                 break
 
+            offset += jdb2._tag_size
             if not tag.t_flags & c_jdb2.JBD2_FLAG_SAME_UUID:
-                self.jdb2.fh.seek(16, io.SEEK_CUR)
-            block_count += 1
+                offset += 16
 
 
 class DescriptorBlockTag:
@@ -119,14 +389,68 @@ class DescriptorBlockTag:
         self.tag = tag
         self.journal_block = journal_block
 
-        self.block = (self.tag.t_blocknr_high << 32) | self.tag.t_blocknr
+        self.block = self.tag.t_blocknr
+        if descriptor.jdb2.is_64bit:
+            self.block |= self.tag.t_blocknr_high << 32
 
     def __repr__(self) -> str:
         return f"<block_tag block={self.block} journal_block={self.journal_block} flags=0x{self.tag.t_flags:x}>"
 
+    @property
+    def escaped(self) -> bool:
+        """Whether the journal copy of the block starts with an escaped journal magic number."""
+        return bool(self.tag.t_flags & c_jdb2.JBD2_FLAG_ESCAPE)
+
+    def read(self) -> bytes:
+        """Read the journal copy of the block, restoring the journal magic number if it was escaped."""
+        jdb2 = self.descriptor.jdb2
+        buf = jdb2.read_block(self.journal_block)
+
+        if jdb2._verify_csum:
+            # The checksum covers the block as it's stored in the journal, so before restoring the magic number
+            calculated = journal_block_checksum(jdb2._csum_seed, self.descriptor.sequence, buf)
+            if jdb2._blocktag is not c_jdb2.journal_block_tag3:
+                calculated &= 0xFFFF
+            jdb2.verifier.verify(JOURNAL_BLOCK, self.journal_block, self.tag.t_checksum, calculated)
+
+        if self.escaped:
+            buf = c_jdb2.uint32(c_jdb2.JBD2_MAGIC_NUMBER).dumps() + buf[4:]
+        return buf
+
     def open(self) -> BinaryIO:
+        if self.escaped:
+            return io.BytesIO(self.read())
+
         block_size = self.descriptor.jdb2.block_size
-        return RangeStream(self.descriptor.jdb2.fh, self.journal_block * block_size, block_size)
+        fh = PositionalFile(self.descriptor.jdb2.read_at)
+        return RangeStream(fh, self.journal_block * block_size, block_size)
+
+
+class RevokeBlock:
+    def __init__(self, jdb2: JDB2, header: c_jdb2.journal_header, journal_block: int):
+        self.jdb2 = jdb2
+        self.header = header
+        self.journal_block = journal_block
+
+        self.sequence = self.header.h_sequence
+
+    def __repr__(self) -> str:
+        return f"<revoke_block sequence={self.sequence} journal_block={self.journal_block}>"
+
+    def blocks(self) -> list[int]:
+        """Return the filesystem blocks revoked by this revoke block."""
+        buf = self.jdb2.read_block(self.journal_block)
+        header = c_jdb2.journal_revoke_header(buf)
+
+        if self.jdb2._verify_csum:
+            self.jdb2._verify_block(JOURNAL_REVOKE, self.journal_block, buf, len(buf) - 4)
+
+        offset = len(c_jdb2.journal_revoke_header)
+        count = min(header.r_count, len(buf) - self.jdb2._tail_size)
+        record_type = c_jdb2.uint64 if self.jdb2.is_64bit else c_jdb2.uint32
+
+        num_records = max(count - offset, 0) // len(record_type)
+        return list(record_type[num_records](buf[offset : offset + num_records * len(record_type)]))
 
 
 class CommitBlock:
@@ -136,18 +460,88 @@ class CommitBlock:
         header: c_jdb2.commit_header,
         journal_block: int,
         descriptors: list[DescriptorBlock] | None = None,
+        revokes: list[RevokeBlock] | None = None,
     ):
         self.jdb2 = jdb2
         self.header = header
         self.journal_block = journal_block
         self.descriptors = descriptors if descriptors else []
+        self.revokes = revokes if revokes else []
 
         self.sequence = self.header.h_sequence
-        self.ts = datetime.datetime.fromtimestamp(self.header.h_commit_sec, tz=datetime.timezone.utc)
-        self.ts += datetime.timedelta(microseconds=self.header.h_commit_nsec // 1000)
+
+    @cached_property
+    def ts(self) -> datetime.datetime:
+        # Parsed lazily, so a corrupt commit time doesn't get in the way of using the rest of the commit
+        ts = datetime.datetime.fromtimestamp(self.header.h_commit_sec, tz=datetime.timezone.utc)
+        return ts + datetime.timedelta(microseconds=self.header.h_commit_nsec // 1000)
 
     def __repr__(self) -> str:
         return (
             f"<commit sequence={self.sequence} journal_block={self.journal_block} "
             f"ts={self.ts} num_descriptors={len(self.descriptors)}>"
         )
+
+
+class JournalOverlay:
+    """Positional reader that applies the committed transactions of a journal on top of a filesystem.
+
+    Reads of filesystem blocks that a journal recovery would write are redirected to the newest copy of that block
+    in the journal, without modifying or copying the filesystem. The mapping of blocks is built in a single pass over
+    the active part of the log.
+
+    Args:
+        reader: The positional reader of the filesystem.
+        jdb2: The journal of the filesystem.
+    """
+
+    # All reads must go through the overlay, so a memory map of the filesystem can't be exposed
+    view = None
+
+    def __init__(self, reader: PositionalReader, jdb2: JDB2):
+        self.reader = reader
+        self.fh = reader.fh
+        self.jdb2 = jdb2
+        self.block_size = jdb2.block_size
+
+        self.blocks = jdb2.replay_map()
+        self._sorted_blocks = sorted(self.blocks)
+
+    def read_at(self, offset: int, size: int) -> bytes:
+        """Read ``size`` bytes from ``offset`` of the filesystem, with the journal applied.
+
+        Args:
+            offset: The absolute offset to read from.
+            size: The amount of bytes to read.
+        """
+        block_size = self.block_size
+        end = offset + size
+
+        idx = bisect_left(self._sorted_blocks, offset // block_size)
+        if size <= 0 or idx == len(self._sorted_blocks) or self._sorted_blocks[idx] * block_size >= end:
+            return self.reader.read_at(offset, size)
+
+        result = []
+        while offset < end:
+            block, block_offset = divmod(offset, block_size)
+
+            if (tag := self.blocks.get(block)) is not None:
+                read_count = min(block_size - block_offset, end - offset)
+                buf = tag.read()[block_offset : block_offset + read_count]
+            else:
+                # Read everything up to the next block in the journal at once
+                idx = bisect_right(self._sorted_blocks, block)
+                next_offset = self._sorted_blocks[idx] * block_size if idx < len(self._sorted_blocks) else end
+                read_count = min(next_offset, end) - offset
+                buf = self.reader.read_at(offset, read_count)
+
+            result.append(buf)
+            if len(buf) != read_count:
+                break
+            offset += read_count
+
+        return b"".join(result)
+
+    def close(self) -> None:
+        """Close the underlying reader."""
+        self.reader.close()
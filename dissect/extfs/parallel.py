@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import stat
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, TypeVar
+
+from dissect.extfs.c_ext import c_ext
+from dissect.extfs.exceptions import Error
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator
+    from concurrent.futures import Future
+
+    from dissect.extfs.extfs import ExtFS, INode
+
+log = logging.getLogger(__name__)
+log.setLevel(os.getenv("DISSECT_LOG_EXTFS", "CRITICAL"))
+
+T = TypeVar("T")
+
+DEFAULT_WORKERS = 8
+DEFAULT_BATCH_SIZE = 1024
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+
+def map_files(
+    extfs: ExtFS,
+    func: Callable[[INode], T],
+    path: str = "/",
+    workers: int = DEFAULT_WORKERS,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> Iterator[tuple[str, INode, T]]:
+    """Apply a function to every regular file below ``path`` using a pool of worker threads.
+
+    Directories are listed by the workers as well. Files are processed in batches of ``batch_size``, ordered by the
+    physical location of their first data block to keep the reads on the underlying image as sequential as possible.
+    At most ``batch_size`` files and ``workers`` directory listings and results are held in memory at any time.
+
+    Files for which ``func`` raises an exception and directories that can't be listed are logged and skipped.
+
+    Args:
+        extfs: The filesystem to process the files of.
+        func: The function to call with the inode of every regular file.
+        path: The directory to start from.
+        workers: The amount of worker threads.
+        batch_size: The maximum amount of files to order and process at once.
+
+    Returns:
+        An iterator of tuples with the path, inode and result of ``func`` of each file.
+    """
+    with ThreadPoolExecutor(workers) as pool:
+        todo = deque([("/" + path.strip("/"), extfs.get(path))])
+        listing: deque[tuple[str, Future[list[tuple[str, INode, int]]]]] = deque()
+        batch = []
+
+        while todo or listing:
+            while todo and len(listing) < workers:
+                dir_path, dir_inode = todo.popleft()
+                listing.append((dir_path, pool.submit(_list_dir, dir_path, dir_inode)))
+
+            dir_path, future = listing.popleft()
+            try:
+                entries = future.result()
+            except (Error, EOFError) as e:
+                log.warning("Unable to list %s: %s", dir_path, e)
+                entries = []
+
+            for entry_path, entry, sort_key in entries:
+                if entry.filetype == stat.S_IFDIR:
+                    todo.append((entry_path, entry))
+                else:
+                    batch.append((sort_key, entry_path, entry))
+
+            if len(batch) >= batch_size or (batch and not todo and not listing):
+                batch.sort(key=lambda item: item[0])
+                yield from _map_batch(pool, func, batch, workers * 2)
+                batch = []
+
+
+def hash_files(
+    extfs: ExtFS,
+    path: str = "/",
+    algorithm: str = "sha256",
+    workers: int = DEFAULT_WORKERS,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator[tuple[str, INode, bytes]]:
+    """Hash every regular file below ``path`` using a pool of worker threads.
+
+    See :func:`map_files` for details on how the files are scheduled.
+
+    Args:
+        extfs: The filesystem to hash the files of.
+        path: The directory to start from.
+        algorithm: The name of the ``hashlib`` algorithm to use.
+        workers: The amount of worker threads.
+        batch_size: The maximum amount of files to order and process at once.
+        chunk_size: The amount of bytes to read from a file at once.
+
+    Returns:
+        An iterator of tuples with the path, inode and digest of each file.
+    """
+    # Raise for an unsupported algorithm right away, instead of skipping every file
+    hashlib.new(algorithm)
+
+    def _hash(inode: INode) -> bytes:
+        ctx = hashlib.new(algorithm)
+        fh = inode.open()
+        while chunk := fh.read(chunk_size):
+            ctx.update(chunk)
+        return ctx.digest()
+
+    return map_files(extfs, _hash, path, workers, batch_size)
+
+
+def _list_dir(path: str, inode: INode) -> list[tuple[str, INode, int]]:
+    prefix = path.rstrip("/")
+    entries = []
+
+    for entry in inode.scandir():
+        if entry.name in (".", ".."):
+            continue
+
+        if entry.is_dir():
+            entries.append((f"{prefix}/{entry.name}", entry.inode, 0))
+        elif entry.is_file():
+            entries.append((f"{prefix}/{entry.name}", entry.inode, _first_block(entry.inode)))
+
+    return entries
+
+
+def _first_block(inode: INode) -> int:
+    try:
+        if inode.size and not inode.inode.i_flags & c_ext.EXT4_INLINE_DATA_FL:
+            for block, _ in inode.dataruns():
+                if block is not None:
+                    return block
+    except Exception as e:
+        log.debug("Unable to determine the first block of %s", inode, exc_info=e)
+    return 0
+
+
+def _map_batch(
+    pool: ThreadPoolExecutor, func: Callable[[INode], T], batch: list[tuple[int, str, INode]], window: int
+) -> Iterator[tuple[str, INode, T]]:
+    pending: deque[tuple[str, INode, Future[T]]] = deque()
+    items = iter(batch)
+
+    while True:
+        for _, path, inode in items:
+            pending.append((path, inode, pool.submit(func, inode)))
+            if len(pending) >= window:
+                break
+
+        if not pending:
+            break
+
+        path, inode, future = pending.popleft()
+        try:
+            result = future.result()
+        except Exception as e:
+            log.warning("Unable to process %s (%s)", path, inode)
+            log.debug("", exc_info=e)
+            continue
+
+        yield path, inode, result
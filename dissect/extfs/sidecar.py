@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import sqlite3
+import sys
+from array import array
+from threading import Lock
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+    from pathlib import Path
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key BLOB NOT NULL);
+CREATE TABLE IF NOT EXISTS group_descs (data BLOB NOT NULL);
+CREATE TABLE IF NOT EXISTS dirs (inum INTEGER PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS dentries (
+    parent INTEGER NOT NULL,
+    idx INTEGER NOT NULL,
+    name BLOB NOT NULL,
+    inum INTEGER NOT NULL,
+    ftype INTEGER,
+    PRIMARY KEY (parent, idx)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS dentries_name ON dentries (parent, name);
+CREATE TABLE IF NOT EXISTS runs (inum INTEGER PRIMARY KEY, tag BLOB NOT NULL, data BLOB NOT NULL);
+"""
+
+_TABLES = ("meta", "group_descs", "dirs", "dentries", "runs")
+
+
+class Sidecar:
+    """A persistent index of a filesystem, stored in an SQLite database.
+
+    The index contains the group descriptor table, the entries of the directories that have been listed and the
+    runlists of the inodes of which the data runs have been determined. It's filled as the filesystem is used, so
+    a second run over the same image doesn't have to parse any of it again.
+
+    The index is only valid for the filesystem state it was built from, which is identified by a key. An index
+    with a different key is emptied when it's opened.
+
+    Args:
+        path: The path of the database, which is created if it doesn't exist.
+        key: Identifies the filesystem and its state.
+    """
+
+    def __init__(self, path: str | Path, key: bytes):
+        self.path = path
+        self.key = key
+        self._lock = Lock()
+
+        # The index is a cache that can always be rebuilt, so durability is traded for speed
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute("PRAGMA synchronous = OFF")
+
+        with self._lock, self._db:
+            self._db.executescript(_SCHEMA)
+
+            row = self._db.execute("SELECT key FROM meta").fetchone()
+            if row is None or row[0] != key:
+                for table in _TABLES:
+                    self._db.execute(f"DELETE FROM {table}")
+                self._db.execute("INSERT INTO meta (key) VALUES (?)", (key,))
+
+    def __repr__(self) -> str:
+        return f"<Sidecar path={self.path!s}>"
+
+    def close(self) -> None:
+        """Close the database."""
+        with self._lock:
+            self._db.close()
+
+    def get_group_descs(self) -> bytes | None:
+        """Return the stored group descriptor table, if any."""
+        with self._lock:
+            row = self._db.execute("SELECT data FROM group_descs").fetchone()
+        return None if row is None else row[0]
+
+    def put_group_descs(self, buf: bytes) -> None:
+        """Store the group descriptor table."""
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM group_descs")
+            self._db.execute("INSERT INTO group_descs (data) VALUES (?)", (buf,))
+
+    def get_dir(self, inum: int) -> list[tuple[int, str, int | None]] | None:
+        """Return the stored entries of a directory, or ``None`` if the directory hasn't been stored.
+
+        Returns:
+            A list of tuples with the inode number, name and file type of every entry, in the original order.
+        """
+        with self._lock:
+            if self._db.execute("SELECT 1 FROM dirs WHERE inum = ?", (inum,)).fetchone() is None:
+                return None
+            rows = self._db.execute(
+                "SELECT inum, name, ftype FROM dentries WHERE parent = ? ORDER BY idx", (inum,)
+            ).fetchall()
+        return [(entry_inum, name.decode(errors="surrogateescape"), ftype) for entry_inum, name, ftype in rows]
+
+    def put_dir(self, inum: int, entries: Iterable[tuple[int, str, int | None]]) -> None:
+        """Store all entries of a directory.
+
+        Args:
+            inum: The inode number of the directory.
+            entries: Tuples with the inode number, name and file type of every entry.
+        """
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM dentries WHERE parent = ?", (inum,))
+            self._db.executemany(
+                "INSERT INTO dentries (parent, idx, name, inum, ftype) VALUES (?, ?, ?, ?, ?)",
+                (
+                    (inum, idx, name.encode(errors="surrogateescape"), entry_inum, ftype)
+                    for idx, (entry_inum, name, ftype) in enumerate(entries)
+                ),
+            )
+            self._db.execute("INSERT OR IGNORE INTO dirs (inum) VALUES (?)", (inum,))
+
+    def lookup(self, parent: int, name: str) -> tuple[int, int | None] | None:
+        """Look up a name in a stored directory.
+
+        Returns:
+            A tuple of the inode number and file type of the entry, ``(0, None)`` if the directory has been stored
+            but doesn't contain the name, or ``None`` if the directory hasn't been stored.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT inum, ftype FROM dentries WHERE parent = ? AND name = ? LIMIT 1",
+                (parent, name.encode(errors="surrogateescape")),
+            ).fetchone()
+            if row is not None:
+                return row
+
+            if self._db.execute("SELECT 1 FROM dirs WHERE inum = ?", (parent,)).fetchone() is None:
+                return None
+        return 0, None
+
+    def get_runs(self, inum: int, tag: bytes) -> list[tuple[int | None, int]] | None:
+        """Return the stored runlist of an inode, or ``None`` if it hasn't been stored.
+
+        Args:
+            inum: The inode number.
+            tag: The tag the runlist was stored with, which identifies the version of the inode.
+        """
+        with self._lock:
+            row = self._db.execute("SELECT data FROM runs WHERE inum = ? AND tag = ?", (inum, tag)).fetchone()
+        if row is None:
+            return None
+
+        values = array("Q", row[0])
+        if sys.byteorder == "big":
+            values.byteswap()
+        # A block of 0 represents a sparse run, like in Runlist
+        return [(values[idx] or None, values[idx + 1]) for idx in range(0, len(values), 2)]
+
+    def put_runs(self, inum: int, tag: bytes, runs: Iterable[tuple[int | None, int]]) -> None:
+        """Store the runlist of an inode.
+
+        Args:
+            inum: The inode number.
+            tag: Identifies the version of the inode, such as its block map and size.
+            runs: The runlist of the inode.
+        """
+        values = array("Q")
+        for block, count in runs:
+            values.append(block or 0)
+            values.append(count)
+        if sys.byteorder == "big":
+            values.byteswap()
+
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO runs (inum, tag, data) VALUES (?, ?, ?)", (inum, tag, values.tobytes())
+            )
@@ -0,0 +1,339 @@
+from __future__ import annotations
+
+import io
+import sys
+from array import array
+from bisect import bisect_right
+from collections.abc import Sequence
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+from dissect.util.stream import AlignedStream
+
+from dissect.extfs.c_ext import c_ext
+from dissect.extfs.exceptions import Error
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Iterator
+
+# Extents longer than this are uninitialized, with the remainder being the actual length
+EXT_INIT_MAX_LEN = 0x8000
+
+
+class Runlist(Sequence):
+    """A compact runlist, storing the runs in typed arrays instead of a list of tuples.
+
+    Behaves like a sequence of ``(block_offset, block_count)`` tuples, so it can be used as the runlist of any
+    runlist stream. A ``block_offset`` of ``None`` represents a sparse run. Adjacent runs are coalesced when added.
+    """
+
+    def __init__(self, runs: Iterable[tuple[int | None, int]] = ()):
+        # A block offset of 0 represents a sparse run, as block 0 never contains file data
+        self._blocks = array("Q")
+        self._counts = array("Q")
+
+        for block, count in runs:
+            self.append(block, count)
+
+    def __len__(self) -> int:
+        return len(self._blocks)
+
+    def __getitem__(self, idx: int) -> tuple[int | None, int]:
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        return self._blocks[idx] or None, self._counts[idx]
+
+    def __iter__(self) -> Iterator[tuple[int | None, int]]:
+        for block, count in zip(self._blocks, self._counts, strict=True):
+            yield block or None, count
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, Runlist):
+            return self._blocks == other._blocks and self._counts == other._counts
+        if isinstance(other, Sequence):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"<Runlist runs={len(self)} blocks={sum(self._counts)}>"
+
+    def append(self, block: int | None, count: int) -> None:
+        """Add a run, coalescing it with the last run if they are contiguous.
+
+        Args:
+            block: The starting block of the run, or ``None`` for a sparse run.
+            count: The amount of blocks in the run.
+        """
+        if count <= 0:
+            return
+
+        block = block or 0
+        if self._blocks:
+            last_block, last_count = self._blocks[-1], self._counts[-1]
+            if (last_block == block == 0) or (block and last_block and last_block + last_count == block):
+                self._counts[-1] = last_count + count
+                return
+
+        self._blocks.append(block)
+        self._counts.append(count)
+
+    def extend_blocks(self, buf: bytes) -> int:
+        """Add the runs of a buffer of little endian 32-bit block pointers, such as an indirect block.
+
+        Instead of looking at every block pointer individually, the pointers are split in halves until every
+        part is either entirely sparse or entirely contiguous, which are compared in bulk.
+
+        Args:
+            buf: The buffer of block pointers, where a pointer of 0 means a sparse block.
+
+        Returns:
+            The amount of blocks that were added.
+        """
+        pointers = array("I", buf)
+        if sys.byteorder == "big":
+            pointers.byteswap()
+
+        self._extend_pointers(pointers, 0, len(pointers))
+        return len(pointers)
+
+    def _extend_pointers(self, pointers: array, start: int, end: int) -> None:
+        count = end - start
+        block = pointers[start]
+
+        if block == 0:
+            if pointers[start:end].count(0) == count:
+                self.append(None, count)
+                return
+        elif pointers[end - 1] - block == count - 1 and pointers[start:end] == array("I", range(block, block + count)):
+            self.append(block, count)
+            return
+
+        middle = start + count // 2
+        self._extend_pointers(pointers, start, middle)
+        self._extend_pointers(pointers, middle, end)
+
+
+class MappedRunlistStream(io.RawIOBase):
+    """Create a stream from a runlist on a memory mapped filesystem image.
+
+    Reads are served directly from the memory map, without any intermediate buffering. :meth:`read_view` returns
+    a zero-copy ``memoryview`` of the memory map if the requested range lies within a single run.
+
+    Args:
+        view: A ``memoryview`` of the memory mapped filesystem image.
+        runlist: The runlist for this stream in block units.
+        size: The size of the stream.
+        block_size: The block size in bytes.
+    """
+
+    def __init__(self, view: memoryview, runlist: list[tuple[int | None, int]], size: int, block_size: int):
+        super().__init__()
+        self.view = view
+        self.runlist = runlist
+        self.size = size
+        self.block_size = block_size
+        self._pos = 0
+
+        # Logical starting block of each run, so we can bisect it quickly when reading
+        self._offsets = []
+        offset = 0
+        for _, block_count in runlist:
+            self._offsets.append(offset)
+            offset += block_count
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def seek(self, pos: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            pos += self._pos
+        elif whence == io.SEEK_END:
+            pos += self.size
+        elif whence != io.SEEK_SET:
+            raise ValueError(f"Invalid whence value: {whence}")
+
+        if pos < 0:
+            raise ValueError(f"Negative seek position {pos}")
+
+        self._pos = pos
+        return pos
+
+    def tell(self) -> int:
+        return self._pos
+
+    def read(self, n: int = -1) -> bytes:
+        return bytes(self.read_view(n))
+
+    def readinto(self, b: bytearray) -> int:
+        view = self.read_view(len(b))
+        b[: len(view)] = view
+        return len(view)
+
+    def read_view(self, n: int = -1) -> memoryview:
+        """Read and return up to ``n`` bytes as a ``memoryview``.
+
+        If the requested range lies within a single run, the result is a view on the memory map itself.
+        """
+        remaining = self.size - self._pos
+        n = remaining if n is None or n < 0 else min(n, remaining)
+        if n <= 0:
+            return memoryview(b"")
+
+        chunks = list(self._iter_chunks(self._pos, n))
+        if not chunks:
+            return memoryview(b"")
+
+        result = chunks[0] if len(chunks) == 1 else memoryview(b"".join(chunks))
+
+        self._pos += len(result)
+        return result
+
+    def _iter_chunks(self, offset: int, length: int) -> Iterator[memoryview]:
+        block_size = self.block_size
+        run_idx = bisect_right(self._offsets, offset // block_size) - 1
+
+        while length > 0 and 0 <= run_idx < len(self.runlist):
+            run_block, run_count = self.runlist[run_idx]
+
+            run_pos = offset - self._offsets[run_idx] * block_size
+            read_count = min(run_count * block_size - run_pos, length)
+            if read_count <= 0:
+                break
+
+            if run_block is None:
+                yield memoryview(bytes(read_count))
+            else:
+                start = run_block * block_size + run_pos
+                chunk = self.view[start : start + read_count]
+                yield chunk
+
+                if len(chunk) != read_count:
+                    # Run extends beyond the end of the image
+                    break
+
+            offset += read_count
+            length -= read_count
+            run_idx += 1
+
+
+class ExtentStream(AlignedStream):
+    """Create a stream from an extent tree, without materializing the full runlist.
+
+    The extent tree is descended on demand for every read, using a binary search over the ``ei_block`` and
+    ``ee_block`` fields of every node, so random reads only touch the nodes on the path to the requested data.
+    Visited index and leaf blocks are cached.
+
+    Args:
+        read_at: A callable that reads ``size`` bytes from ``offset`` of the filesystem.
+        root: The root node of the extent tree (the ``i_block`` field of the inode).
+        size: The size of the stream.
+        block_size: The block size in bytes.
+        cache_size: The amount of parsed extent tree blocks to cache.
+        read_block: Optional callable that reads a single extent tree block by block number, e.g. through a block
+                    cache. By default, extent tree blocks are read using ``read_at``.
+    """
+
+    def __init__(
+        self,
+        read_at: Callable[[int, int], bytes],
+        root: bytes,
+        size: int,
+        block_size: int,
+        cache_size: int = 128,
+        read_block: Callable[[int], bytes] | None = None,
+    ):
+        super().__init__(size, block_size)
+        self._read_at = read_at
+        self._read_block = read_block
+        self.block_size = block_size
+
+        self._root = self._parse_node(root)
+        self._read_node = lru_cache(cache_size)(self._read_node)
+
+    def _parse_node(self, buf: bytes) -> tuple[int, list[int], list[tuple[int, ...]]]:
+        header = c_ext.ext4_extent_header(buf)
+        if header.eh_magic != 0xF30A:
+            raise Error("Invalid extent_header magic")
+
+        offset = len(c_ext.ext4_extent_header)
+        if header.eh_depth == 0:
+            extents = c_ext.ext4_extent[header.eh_entries](buf[offset:])
+            entries = [
+                (
+                    extent.ee_block,
+                    extent.ee_len - EXT_INIT_MAX_LEN if extent.ee_len > EXT_INIT_MAX_LEN else extent.ee_len,
+                    (extent.ee_start_hi << 32) | extent.ee_start_lo,
+                    extent.ee_len <= EXT_INIT_MAX_LEN,
+                )
+                for extent in extents
+            ]
+        else:
+            indexes = c_ext.ext4_extent_idx[header.eh_entries](buf[offset:])
+            entries = [(idx.ei_block, (idx.ei_leaf_hi << 32) | idx.ei_leaf_lo) for idx in indexes]
+
+        return header.eh_depth, [entry[0] for entry in entries], entries
+
+    def _read_node(self, block: int) -> tuple[int, list[int], list[tuple[int, ...]]]:
+        if self._read_block is not None:
+            return self._parse_node(self._read_block(block))
+        return self._parse_node(self._read_at(block * self.block_size, self.block_size))
+
+    def _lookup(self, block: int) -> tuple[int | None, int | None]:
+        """Map a logical block to a physical block.
+
+        Returns:
+            A tuple of the physical block (``None`` for sparse or uninitialized blocks) and the amount of contiguous
+            blocks from that point (``None`` if sparse until the end of the file).
+        """
+        depth, keys, entries = self._root
+        # The first logical block of the next subtree, which bounds any hole at the end of the current subtree
+        end = None
+
+        while depth:
+            idx = bisect_right(keys, block) - 1
+            if idx < 0:
+                return None, keys[0] - block
+
+            if idx + 1 < len(keys):
+                end = keys[idx + 1]
+
+            child_depth, keys, entries = self._read_node(entries[idx][1])
+            if child_depth != depth - 1:
+                raise Error(f"Invalid extent tree depth: {child_depth} (expected {depth - 1})")
+            depth = child_depth
+
+        idx = bisect_right(keys, block) - 1
+        if idx >= 0:
+            ee_block, ee_len, ee_start, initialized = entries[idx]
+            if block < ee_block + ee_len:
+                offset = block - ee_block
+                return (ee_start + offset if initialized else None), ee_len - offset
+
+        if idx + 1 < len(keys):
+            end = keys[idx + 1]
+
+        return None, None if end is None else end - block
+
+    def _read(self, offset: int, length: int) -> bytes:
+        result = []
+        block_size = self.block_size
+        length = min(length, self.size - offset)
+
+        while length > 0:
+            block, block_offset = divmod(offset, block_size)
+            run_block, run_count = self._lookup(block)
+
+            read_count = length if run_count is None else min(length, run_count * block_size - block_offset)
+
+            if run_block is None:
+                result.append(b"\x00" * read_count)
+            else:
+                result.append(self._read_at(run_block * block_size + block_offset, read_count))
+
+            offset += read_count
+            length -= read_count
+
+        return b"".join(result)
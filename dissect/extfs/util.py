@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import io
+import mmap
+import os
+from threading import Lock
+from typing import TYPE_CHECKING, BinaryIO
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+
+class PositionalReader:
+    """Read from a file-like object at absolute offsets, without relying on a shared file position.
+
+    Regular files are read using ``os.pread``, other file-like objects are read with a lock around the
+    ``seek`` and ``read``. This allows a single file-like object to be shared between threads.
+
+    Optionally, regular files can be memory mapped instead. Reads are then served from the memory map and
+    :attr:`view` exposes the mapped file as a ``memoryview``.
+
+    Args:
+        fh: The file-like object to read from.
+        use_mmap: Whether to memory map the file, if it's a regular file.
+    """
+
+    def __init__(self, fh: BinaryIO, use_mmap: bool = False):
+        self.fh = fh
+        self._fd = _file_fd(fh)
+        self._lock = Lock()
+
+        self._mmap = None
+        self.view: memoryview | None = None
+        if use_mmap and self._fd is not None:
+            try:
+                self._mmap = mmap.mmap(self._fd, 0, access=mmap.ACCESS_READ)
+                self.view = memoryview(self._mmap)
+            except (OSError, ValueError, OverflowError):
+                # E.g. empty files, special files or images that don't fit in the address space
+                self._mmap = None
+
+    def read_at(self, offset: int, size: int) -> bytes:
+        """Read ``size`` bytes from ``offset``.
+
+        Args:
+            offset: The absolute offset to read from.
+            size: The amount of bytes to read.
+        """
+        if self._mmap is not None:
+            return self._mmap[offset : offset + size]
+
+        if self._fd is None or not hasattr(os, "pread"):
+            with self._lock:
+                self.fh.seek(offset)
+                return self.fh.read(size)
+
+        buf = os.pread(self._fd, size, offset)
+        if len(buf) == size or not buf:
+            return buf
+
+        # Short read, keep reading until we have everything or reach EOF
+        result = [buf]
+        while size > (read := len(buf)):
+            offset += read
+            size -= read
+            if not (buf := os.pread(self._fd, size, offset)):
+                break
+            result.append(buf)
+
+        return b"".join(result)
+
+    def close(self) -> None:
+        """Close the memory map, if any. The file-like object itself is left open."""
+        if self._mmap is None:
+            return
+
+        self.view.release()
+        try:
+            self._mmap.close()
+        except BufferError:
+            # Streams still hold views on the map, it's unmapped when the last of them is gone
+            pass
+
+        self._mmap = None
+        self.view = None
+
+
+class PositionalFile(io.RawIOBase):
+    """File-like object with its own position on top of a positional read function.
+
+    Every instance tracks its own position, so multiple instances on top of the same read function
+    can be used from different threads.
+
+    Args:
+        read_at: A callable that reads ``size`` bytes from ``offset``.
+        size: Optional size of the file-like object.
+    """
+
+    def __init__(self, read_at: Callable[[int, int], bytes], size: int | None = None):
+        super().__init__()
+        self._read_at = read_at
+        self.size = size
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def seek(self, pos: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            pos += self._pos
+        elif whence == io.SEEK_END:
+            if self.size is None:
+                raise io.UnsupportedOperation("SEEK_END on a file-like object of unknown size")
+            pos += self.size
+        elif whence != io.SEEK_SET:
+            raise ValueError(f"Invalid whence value: {whence}")
+
+        if pos < 0:
+            raise ValueError(f"Negative seek position {pos}")
+
+        self._pos = pos
+        return pos
+
+    def tell(self) -> int:
+        return self._pos
+
+    def read(self, n: int = -1) -> bytes:
+        if n is None or n < 0:
+            if self.size is None:
+                raise io.UnsupportedOperation("Unbounded read on a file-like object of unknown size")
+            n = self.size - self._pos
+
+        if self.size is not None:
+            n = min(n, self.size - self._pos)
+
+        if n <= 0:
+            return b""
+
+        buf = self._read_at(self._pos, n)
+        self._pos += len(buf)
+        return buf
+
+    def readinto(self, b: bytearray) -> int:
+        buf = self.read(len(b))
+        b[: len(buf)] = buf
+        return len(buf)
+
+
+def _file_fd(fh: BinaryIO) -> int | None:
+    """Return the file descriptor to read from directly for ``fh``, if possible.
+
+    Only plain (buffered) files are eligible, as other file-like objects may expose the file descriptor of a
+    file they transform (e.g. compressed files).
+    """
+    raw = fh.raw if isinstance(fh, (io.BufferedReader, io.BufferedRandom)) else fh
+    if not isinstance(raw, io.FileIO):
+        return None
+
+    try:
+        return raw.fileno()
+    except (OSError, ValueError):
+        return None
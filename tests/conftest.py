@@ -32,3 +32,33 @@ def ext4_sparse_bin() -> Iterator[BinaryIO]:
 @pytest.fixture
 def ext4_symlink_bin() -> Iterator[BinaryIO]:
     yield from gzip_file("data/ext4_symlink_test.bin.gz")
+
+
+@pytest.fixture
+def ext4_htree_bin() -> Iterator[BinaryIO]:
+    yield from gzip_file("data/ext4_htree.bin.gz")
+
+
+@pytest.fixture
+def ext4_multigroup_bin() -> Iterator[BinaryIO]:
+    yield from gzip_file("data/ext4_multigroup.bin.gz")
+
+
+@pytest.fixture
+def ext3_indirect_bin() -> Iterator[BinaryIO]:
+    yield from gzip_file("data/ext3_indirect.bin.gz")
+
+
+@pytest.fixture
+def ext4_journal_bin() -> Iterator[BinaryIO]:
+    yield from gzip_file("data/ext4_journal.bin.gz")
+
+
+@pytest.fixture
+def ext4_journal_csum_bin() -> Iterator[BinaryIO]:
+    yield from gzip_file("data/ext4_journal_csum.bin.gz")
+
+
+@pytest.fixture
+def ext4_deleted_bin() -> Iterator[BinaryIO]:
+    yield from gzip_file("data/ext4_deleted.bin.gz")
@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import asyncio
+import io
+import stat
+import struct
+from typing import TYPE_CHECKING, BinaryIO
+
+import pytest
+
+from dissect.extfs.aio import AsyncExtFS
+from dissect.extfs.exceptions import Error, FileNotFoundError, NotADirectoryError
+from dissect.extfs.extfs import ExtFS
+
+if TYPE_CHECKING:
+    from dissect.extfs.aio import AsyncINode
+    from dissect.extfs.extfs import INode
+
+
+class FakeRangeReader:
+    """An in-process async backend that keeps track of the amount of reads in flight."""
+
+    def __init__(self, fh: BinaryIO):
+        fh.seek(0)
+        self.buf = fh.read()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def read_range(self, offset: int, size: int) -> bytes:
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            # Yield to the event loop, like a real backend would while waiting for a response
+            await asyncio.sleep(0)
+            return self.buf[offset : offset + size]
+        finally:
+            self.in_flight -= 1
+
+
+async def _walk(node: AsyncINode, path: str = "") -> list[tuple]:
+    result = []
+    async for entry in node.aiterdir():
+        if entry.filename in (".", ".."):
+            continue
+
+        entry_path = f"{path}/{entry.filename}"
+        if entry.filetype == stat.S_IFDIR:
+            result.append((entry_path, entry.inum, None))
+            result.extend(await _walk(entry, entry_path))
+        elif entry.filetype == stat.S_IFLNK:
+            result.append((entry_path, entry.inum, await entry.link()))
+        else:
+            result.append((entry_path, entry.inum, await entry.open().read()))
+    return result
+
+
+def _sync_walk(node: INode, path: str = "") -> list[tuple]:
+    result = []
+    for entry in node.iterdir():
+        if entry.filename in (".", ".."):
+            continue
+
+        entry_path = f"{path}/{entry.filename}"
+        if entry.filetype == stat.S_IFDIR:
+            result.append((entry_path, entry.inum, None))
+            result.extend(_sync_walk(entry, entry_path))
+        elif entry.filetype == stat.S_IFLNK:
+            result.append((entry_path, entry.inum, entry.link))
+        else:
+            result.append((entry_path, entry.inum, entry.open().read()))
+    return result
+
+
+@pytest.mark.parametrize("fixture", ["ext4_multigroup_bin", "ext3_indirect_bin", "ext4_symlink_bin"])
+def test_aio_walk(fixture: str, request: pytest.FixtureRequest) -> None:
+    fh = request.getfixturevalue(fixture)
+    expected = _sync_walk(ExtFS(fh).root)
+
+    async def main() -> list[tuple]:
+        extfs = await AsyncExtFS.open(FakeRangeReader(fh))
+        return await _walk(await extfs.get("/"))
+
+    assert asyncio.run(main()) == expected
+
+
+def test_aio_get(ext4_multigroup_bin: BinaryIO) -> None:
+    sync_extfs = ExtFS(ext4_multigroup_bin)
+    reader = FakeRangeReader(ext4_multigroup_bin)
+
+    async def main() -> None:
+        extfs = await AsyncExtFS.open(reader)
+
+        doc = await extfs.get("docs/doc_1.txt")
+        assert doc.inum == sync_extfs.get("docs/doc_1.txt").inum
+        assert doc.filename == "doc_1.txt"
+        assert (await extfs.get(doc.inum)).size == doc.size
+
+        # The inodes of the entries of a directory are read at once
+        reader.max_in_flight = 0
+        docs = await (await extfs.get("docs")).alistdir()
+        assert sorted(docs) == sorted(sync_extfs.get("docs").listdir())
+        assert reader.max_in_flight > 1
+
+        with pytest.raises(FileNotFoundError):
+            await extfs.get("docs/nonexistent")
+
+        with pytest.raises(NotADirectoryError):
+            await extfs.get("docs/doc_1.txt/foo")
+
+        # Inode 40 has a depth 1 extent tree, and all runs of a read are read at once
+        sync_inode = sync_extfs.get_inode(40)
+        inode = await extfs.get(40)
+        assert await inode.dataruns() == sync_inode.dataruns()
+
+        reader.max_in_flight = 0
+        stream = inode.open()
+        assert await stream.read() == sync_inode.open().read()
+        assert reader.max_in_flight > 1
+
+        assert stream.seek(-100, io.SEEK_END) == inode.size - 100
+        assert await stream.read(1000) == sync_inode.open().read()[-100:]
+        assert await stream.read() == b""
+
+        stream.seek(4000)
+        assert await stream.read(10000) == sync_inode.open().read()[4000:14000]
+        assert stream.tell() == 14000
+
+    asyncio.run(main())
+
+
+def test_aio_extent_index(ext4_multigroup_bin: BinaryIO) -> None:
+    sync_extfs = ExtFS(ext4_multigroup_bin)
+    sync_inode = sync_extfs.get_inode(40)
+    reader = FakeRangeReader(ext4_multigroup_bin)
+    reader.buf = bytearray(reader.buf)
+
+    # Split the single leaf of inode 40 in two leaves in free blocks, so the root has two index entries
+    block_size = sync_extfs.block_size
+    i_block = bytearray(sync_inode.inode.i_block)
+    leaf = sync_extfs.read_block(struct.unpack_from("<4xI", i_block, 12)[0])
+    magic, entries, eh_max, _, generation = struct.unpack_from("<4HI", leaf)
+    free_block = list(sync_extfs.unallocated_runs())[-1][0]
+
+    index = b""
+    for idx, (start, end) in enumerate([(0, entries // 2), (entries // 2, entries)]):
+        extents = leaf[12 + start * 12 : 12 + end * 12]
+        buf = struct.pack("<4HI", magic, end - start, eh_max, 0, generation) + extents
+        reader.buf[(free_block + idx) * block_size : (free_block + idx) * block_size + len(buf)] = buf
+        index += struct.pack("<IIH2x", struct.unpack_from("<I", extents)[0], free_block + idx, 0)
+
+    i_block[:12] = struct.pack("<4HI", 0xF30A, 2, 4, 1, 0)
+    i_block[12:48] = index.ljust(36, b"\x00")
+
+    async def main() -> None:
+        extfs = await AsyncExtFS.open(reader)
+
+        group_num, index = divmod(40 - 1, extfs.sb.s_inodes_per_group)
+        table = extfs._inode_table(await extfs._read_group_desc(group_num))
+        offset = table * block_size + index * extfs.sb.s_inode_size + 40
+        reader.buf[offset : offset + 60] = i_block
+
+        inode = await extfs.get(40)
+        assert inode.inode.i_block == i_block
+
+        reader.max_in_flight = 0
+        assert await inode.dataruns() == sync_inode.dataruns()
+        assert reader.max_in_flight == 2
+
+    asyncio.run(main())
+
+
+def test_aio_extent_bounds(ext4_multigroup_bin: BinaryIO) -> None:
+    async def main() -> None:
+        extfs = await AsyncExtFS.open(FakeRangeReader(ext4_multigroup_bin))
+        inode = await extfs.get(40)
+
+        # The amount of entries of a corrupt node is limited to what fits in it
+        extent = struct.pack("<IHHI", 0, 4, 0, 1000)
+        header = struct.pack("<4HI", 0xF30A, 100, 4, 0, 0)
+        assert await inode._read_extents(header + extent, None) == [(0, 4, 1000, True)]
+
+        with pytest.raises(Error, match="Truncated"):
+            await inode._read_extents(header[:6], None)
+
+        with pytest.raises(Error, match="depth"):
+            await inode._read_extents(header, 1)
+
+    asyncio.run(main())
@@ -0,0 +1,308 @@
+from __future__ import annotations
+
+import asyncio
+import io
+import random
+import stat
+import struct
+import tracemalloc
+from types import SimpleNamespace
+from typing import TYPE_CHECKING, BinaryIO
+
+import pytest
+
+from dissect.extfs.aio import AsyncExtFS
+from dissect.extfs.blockmap import BlockMap
+from dissect.extfs.c_ext import c_ext
+from dissect.extfs.cache import DentryCache
+from dissect.extfs.columns import decode_inode_table
+from dissect.extfs.extfs import (
+    DEFAULT_DENTRY_CACHE_SIZE,
+    ExtFS,
+    INode,
+    _iter_clear_bits,
+    _parse_indirect_runs,
+    _test_bit,
+)
+from dissect.extfs.inode import RawInode
+from dissect.extfs.journal import JDB2
+from tests.test_aio import FakeRangeReader
+from tests.test_journal import build_journal
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from pytest_benchmark.fixture import BenchmarkFixture
+
+    from dissect.extfs.aio import AsyncINode
+
+
+@pytest.fixture
+def ext4_multigroup_path(ext4_multigroup_bin: BinaryIO, tmp_path: Path) -> Path:
+    path = tmp_path / "ext4_multigroup.bin"
+    path.write_bytes(ext4_multigroup_bin.read())
+    return path
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("mmap", [False, True], ids=["runlist", "mmap"])
+@pytest.mark.parametrize("chunk_size", [4096, -1], ids=["4k", "full"])
+def test_benchmark_read_file(
+    benchmark: BenchmarkFixture, ext4_multigroup_path: Path, mmap: bool, chunk_size: int
+) -> None:
+    with ext4_multigroup_path.open("rb") as fh:
+        inode = ExtFS(fh, mmap=mmap).get("frag/fragmented.bin")
+
+        def read() -> None:
+            stream = inode.open()
+            while stream.read(chunk_size):
+                pass
+
+        benchmark(read)
+
+
+@pytest.mark.benchmark
+def test_benchmark_indirect_runlist(benchmark: BenchmarkFixture) -> None:
+    # A synthetic 4 GiB ext3 file with 4 KiB blocks, with a fragment every 4000 blocks
+    block_size = 4096
+    per_block = block_size // 4
+    num_blocks = 1024 * 1024
+
+    data_blocks = [100_000 + i + (i // 4000) * 10 for i in range(num_blocks)]
+    image = bytearray(block_size)
+
+    def write_pointers(pointers: list[int]) -> int:
+        block = len(image) // block_size
+        image.extend(struct.pack(f"<{len(pointers)}I", *pointers).ljust(block_size, b"\x00"))
+        return block
+
+    ind = write_pointers(data_blocks[12 : 12 + per_block])
+    remaining = data_blocks[12 + per_block :]
+    dind = write_pointers([write_pointers(remaining[i : i + per_block]) for i in range(0, len(remaining), per_block)])
+
+    i_block = struct.pack("<15I", *data_blocks[:12], ind, dind, 0)
+    extfs = SimpleNamespace(
+        block_size=block_size, read_block=lambda block: bytes(image[block * block_size : (block + 1) * block_size])
+    )
+
+    runlist = benchmark(_parse_indirect_runs, extfs, i_block, num_blocks)
+    assert len(runlist) == (num_blocks + 3999) // 4000
+    assert sum(count for _, count in runlist) == num_blocks
+
+
+@pytest.mark.benchmark
+def test_benchmark_journal_walk(benchmark: BenchmarkFixture) -> None:
+    # A synthetic 64 MiB journal with 4 KiB blocks, filled with transactions of 8 blocks each
+    num_transactions = 1600
+    fh = build_journal([[i] * 8 for i in range(num_transactions)], block_size=4096, maxlen=16 * 1024)
+    journal = JDB2(fh)
+
+    def walk() -> int:
+        return sum(1 for _ in journal.walk())
+
+    assert benchmark(walk) == 2 * num_transactions
+
+
+def build_dir(num_entries: int, block_size: int = 4096) -> bytes:
+    """Build the blocks of a directory with ``num_entries`` files, with a checksum tail in every block."""
+    blocks = []
+    block = bytearray()
+    last = 0
+    end = block_size - 12
+    tail = struct.pack("<IHBBI", 0, 12, 0, 0xDE, 0)
+
+    def finish_block() -> None:
+        # Extend the last entry up to the checksum tail
+        struct.pack_into("<H", block, last + 4, end - last)
+        blocks.append(block.ljust(end, b"\x00") + tail)
+
+    for i in range(num_entries):
+        name = f"file_{i:08d}.txt".encode()
+        rec_len = (8 + len(name) + 3) & ~3
+        if len(block) + rec_len > end:
+            finish_block()
+            block = bytearray()
+
+        last = len(block)
+        block += struct.pack("<IHBB", 12 + i, rec_len, len(name), 1) + name.ljust(rec_len - 8, b"\x00")
+
+    finish_block()
+    return b"".join(blocks)
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("num_entries", [1_000, 100_000, 1_000_000], ids=["1k", "100k", "1m"])
+def test_benchmark_iterdir(benchmark: BenchmarkFixture, num_entries: int) -> None:
+    buf = build_dir(num_entries)
+    extfs = SimpleNamespace(
+        block_size=4096,
+        sb=SimpleNamespace(s_inodes_count=num_entries + 12),
+        _dirtype=c_ext.ext2_dir_entry_2,
+        _verify_csum=False,
+        dentry_cache=DentryCache(DEFAULT_DENTRY_CACHE_SIZE),
+        sidecar=None,
+    )
+
+    inode = INode(extfs, 2, filetype=stat.S_IFDIR)
+    inode.size = len(buf)
+    inode.open = lambda: io.BytesIO(buf)
+
+    def iterdir() -> int:
+        return sum(1 for _ in inode._iter_entries())
+
+    assert benchmark.pedantic(iterdir, rounds=3 if num_entries >= 1_000_000 else 10) == num_entries
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize(
+    "parse", [RawInode, lambda buf: c_ext.ext4_inode(buf.ljust(288, b"\x00"))], ids=["raw", "cstruct"]
+)
+def test_benchmark_inode_decode(benchmark: BenchmarkFixture, ext4_multigroup_bin: BinaryIO, parse: type) -> None:
+    extfs = ExtFS(ext4_multigroup_bin)
+    inode_size = extfs.sb.s_inode_size
+    buf = extfs.read_at(extfs._inode_table(extfs._read_group_desc(0)) * extfs.block_size, 1024 * inode_size)
+    inodes = [buf[offset : offset + inode_size] for offset in range(0, len(buf), inode_size)]
+
+    # Memory per decoded inode, including the buffer of the inode if it's kept around
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    decoded = [parse(buf[offset : offset + inode_size]) for offset in range(0, len(buf), inode_size)]
+    per_inode = (tracemalloc.get_traced_memory()[0] - before) / len(decoded)
+    tracemalloc.stop()
+    benchmark.extra_info["bytes_per_inode"] = per_inode
+
+    def decode() -> int:
+        # Decode every inode and access the fields of a typical timeline entry
+        total = 0
+        for inode_buf in inodes:
+            inode = parse(inode_buf)
+            total += inode.i_mode + inode.i_size_lo + inode.i_mtime + inode.i_mtime_extra + inode.i_flags
+        return total
+
+    assert benchmark(decode) == sum(
+        inode.i_mode + inode.i_size_lo + inode.i_mtime + inode.i_mtime_extra + inode.i_flags for inode in decoded
+    )
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("columnar", [True, False], ids=["columns", "objects"])
+def test_benchmark_inode_columns(benchmark: BenchmarkFixture, ext4_multigroup_bin: BinaryIO, columnar: bool) -> None:
+    extfs = ExtFS(ext4_multigroup_bin)
+    inode_size = extfs.sb.s_inode_size
+    # A large inode table, made up of copies of the used part of the inode table of group 0
+    table = extfs.read_at(extfs._inode_table(extfs._read_group_desc(0)) * extfs.block_size, 1024 * inode_size)
+    buf = table * 64
+
+    def decode() -> int:
+        if columnar:
+            columns = decode_inode_table(buf, inode_size, 1)
+            return sum(columns.size) + sum(columns.mtime_ns)
+
+        total = 0
+        for offset in range(0, len(buf), inode_size):
+            inode = INode(extfs, 1 + offset // inode_size, inode=RawInode(buf[offset : offset + inode_size]))
+            total += inode.size + inode.mtime_ns
+        return total
+
+    benchmark.extra_info["inodes"] = len(buf) // inode_size
+    assert benchmark(decode) == 64 * sum(
+        INode(extfs, 1, inode=RawInode(table[offset : offset + inode_size])).size
+        + INode(extfs, 1, inode=RawInode(table[offset : offset + inode_size])).mtime_ns
+        for offset in range(0, len(table), inode_size)
+    )
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("bulk", [True, False], ids=["bulk", "per_bit"])
+def test_benchmark_unallocated_runs(benchmark: BenchmarkFixture, bulk: bool) -> None:
+    # A 32k block group that is half full, with allocated and free stretches of varying length
+    rng = random.Random(0x4558)
+    bitmap = bytearray()
+    while len(bitmap) < 4096:
+        bitmap += bytes([rng.choice([0x00, 0xFF, rng.randrange(256)])]) * rng.randrange(1, 64)
+    bitmap = bytes(bitmap[:4096])
+    num_bits = len(bitmap) * 8
+
+    def per_bit() -> list[tuple[int, int]]:
+        runs = []
+        for index in range(num_bits):
+            if _test_bit(bitmap, index):
+                continue
+            if runs and sum(runs[-1]) == index:
+                runs[-1] = (runs[-1][0], runs[-1][1] + 1)
+            else:
+                runs.append((index, 1))
+        return runs
+
+    def decode() -> list[tuple[int, int]]:
+        return list(_iter_clear_bits(bitmap, num_bits)) if bulk else per_bit()
+
+    assert benchmark(decode) == per_bit()
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("batch", [True, False], ids=["batch", "single"])
+def test_benchmark_owner_of_block(benchmark: BenchmarkFixture, batch: bool) -> None:
+    # A million runs of 8 blocks with gaps in between, like a large filesystem with fragmented files
+    block_map = BlockMap(b"", ((block * 16, 8, 12 + block // 4, block % 4 * 8) for block in range(1_000_000)))
+    # Hits cluster in a limited amount of files, like the hits of a scan of the raw device would
+    rng = random.Random(0x4558)
+    blocks = [rng.randrange(run * 16, run * 16 + 16) for run in rng.sample(range(1_000_000), 1000) for _ in range(100)]
+
+    def lookup() -> int:
+        results = block_map.lookup_many(blocks) if batch else [block_map.lookup(block) for block in blocks]
+        return sum(result is not None for result in results)
+
+    assert benchmark.pedantic(lookup, rounds=3) == sum(block % 16 < 8 for block in blocks)
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("sidecar", [True, False], ids=["sidecar", "cold"])
+def test_benchmark_sidecar(
+    benchmark: BenchmarkFixture, ext4_multigroup_path: Path, tmp_path: Path, sidecar: bool
+) -> None:
+    index_path = tmp_path / "index.db" if sidecar else None
+
+    def open_and_walk() -> int:
+        # Open the filesystem like a new worker would, and resolve every directory and runlist
+        with ext4_multigroup_path.open("rb") as fh:
+            extfs = ExtFS(fh, sidecar=index_path)
+            num_runs = sum(len(entry.dataruns()) for _, _, files in extfs.walk() for entry in files)
+            if extfs.sidecar is not None:
+                extfs.sidecar.close()
+            return num_runs
+
+    expected = open_and_walk()
+    assert benchmark(open_and_walk) == expected
+
+
+class _LatencyRangeReader(FakeRangeReader):
+    async def read_range(self, offset: int, size: int) -> bytes:
+        # Every request takes a round trip, like a read from an object store
+        await asyncio.sleep(0.0005)
+        return await super().read_range(offset, size)
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("max_concurrency", [64, 1], ids=["concurrent", "sequential"])
+def test_benchmark_aio_walk(benchmark: BenchmarkFixture, ext4_multigroup_bin: BinaryIO, max_concurrency: int) -> None:
+    reader = _LatencyRangeReader(ext4_multigroup_bin)
+
+    async def walk(node: AsyncINode) -> int:
+        total = 0
+        async for entry in node.aiterdir():
+            if entry.filename in (".", ".."):
+                continue
+            if entry.filetype == stat.S_IFDIR:
+                total += await walk(entry)
+            elif entry.filetype == stat.S_IFREG:
+                total += len(await entry.open().read())
+        return total
+
+    async def main() -> int:
+        extfs = await AsyncExtFS.open(reader, max_concurrency)
+        return await walk(await extfs.get("/"))
+
+    extfs = ExtFS(ext4_multigroup_bin)
+    expected = sum(entry.size for _, _, files in extfs.walk() for entry in files if entry.filetype == stat.S_IFREG)
+    assert benchmark.pedantic(lambda: asyncio.run(main()), rounds=3) == expected
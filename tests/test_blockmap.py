@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import io
+from typing import BinaryIO
+
+import pytest
+
+from dissect.extfs.blockmap import BlockMap
+from dissect.extfs.exceptions import Error
+from dissect.extfs.extfs import ExtFS
+
+
+def test_block_map() -> None:
+    block_map = BlockMap(b"key", [(100, 10, 12, 0), (50, 5, 13, 2), (110, 1, 12, 10)])
+    assert len(block_map) == 3
+
+    assert block_map.lookup(49) is None
+    assert block_map.lookup(50) == (13, 2)
+    assert block_map.lookup(54) == (13, 6)
+    assert block_map.lookup(55) is None
+    assert block_map.lookup(109) == (12, 9)
+    assert block_map.lookup(110) == (12, 10)
+    assert block_map.lookup(111) is None
+
+    blocks = [111, 50, 0, 105, 54, 105]
+    assert block_map.lookup_many(blocks) == [block_map.lookup(block) for block in blocks]
+    assert BlockMap(b"key").lookup_many(blocks) == [None] * len(blocks)
+
+
+def test_block_map_persist() -> None:
+    block_map = BlockMap(b"key", [(100, 10, 12, 0), (50, 5, 13, 2)])
+
+    fh = io.BytesIO()
+    block_map.save(fh)
+
+    fh.seek(0)
+    loaded = BlockMap.load(fh, b"key")
+    assert loaded.key == b"key"
+    assert [loaded.lookup(block) for block in range(120)] == [block_map.lookup(block) for block in range(120)]
+
+    fh.seek(0)
+    with pytest.raises(Error, match="different filesystem"):
+        BlockMap.load(fh, b"other")
+
+    with pytest.raises(Error, match="truncated runs"):
+        BlockMap.load(io.BytesIO(fh.getvalue()[:-1]))
+
+    with pytest.raises(Error, match="magic"):
+        BlockMap.load(io.BytesIO(b"\x00" * 64))
+
+
+def test_owner_of_block(ext4_multigroup_bin: BinaryIO) -> None:
+    extfs = ExtFS(ext4_multigroup_bin)
+
+    blocks = []
+    for _, _, files in extfs.walk():
+        for entry in files:
+            file_block = 0
+            for run_block, run_count in entry.dataruns():
+                for offset in range(run_count):
+                    if run_block is not None:
+                        owner = extfs.owner_of_block(run_block + offset)
+                        assert owner.inode.inum == entry.inum
+                        assert owner.file_block == file_block + offset
+                        blocks.append(run_block + offset)
+                file_block += run_count
+
+    # The journal owns its blocks as well, bitmaps and inode tables don't belong to any inode
+    journal_block = extfs.get_inode(extfs.sb.s_journal_inum).dataruns()[0][0]
+    assert extfs.owner_of_block(journal_block).inode.inum == extfs.sb.s_journal_inum
+    assert extfs.owner_of_block(extfs._block_bitmap(extfs._read_group_desc(0))) is None
+    assert extfs.owner_of_block(extfs.last_block) is None
+
+    blocks += [0, extfs.last_block]
+    assert extfs.owners_of_blocks(blocks) == [extfs.owner_of_block(block) for block in blocks]
+
+    fh = io.BytesIO()
+    extfs.block_map.save(fh)
+
+    fh.seek(0)
+    extfs = ExtFS(ext4_multigroup_bin)
+    extfs.load_block_map(fh)
+    assert extfs.owners_of_blocks(blocks)[:-2] == [extfs.owner_of_block(block) for block in blocks[:-2]]
+    assert all(owner is not None for owner in extfs.owners_of_blocks(blocks[:-2]))
+
+    # A block map of a different filesystem state is rejected
+    extfs.sb.s_wtime += 1
+    del extfs._index_key
+    fh.seek(0)
+    with pytest.raises(Error):
+        extfs.load_block_map(fh)
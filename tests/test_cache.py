@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+from typing import BinaryIO
+from unittest.mock import patch
+
+import pytest
+
+from dissect.extfs.cache import BlockCache, BlockCacheInfo, DentryCache, DentryCacheInfo
+from dissect.extfs.exceptions import FileNotFoundError
+from dissect.extfs.extfs import ExtFS, INode
+
+
+def test_block_cache() -> None:
+    cache = BlockCache(3 * 1024)
+
+    assert cache.get(1) is None
+    cache.put(1, b"\x01" * 1024)
+    cache.put(2, b"\x02" * 1024)
+    cache.put(3, b"\x03" * 1024)
+    assert cache.get(1) == b"\x01" * 1024
+    assert len(cache) == 3
+
+    # Block 2 is now the least recently used block
+    cache.put(4, b"\x04" * 1024)
+    assert 2 not in cache
+    assert 1 in cache
+    assert cache.cache_info() == BlockCacheInfo(hits=1, misses=1, evictions=1, size=3 * 1024, capacity=3 * 1024)
+
+    # Replacing a block doesn't count towards the size twice
+    cache.put(4, b"\x04" * 512)
+    assert cache.size == 2 * 1024 + 512
+
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.cache_info() == BlockCacheInfo(hits=0, misses=0, evictions=0, size=0, capacity=3 * 1024)
+
+    # Disabled cache
+    cache = BlockCache(0)
+    cache.put(1, b"\x01" * 1024)
+    assert len(cache) == 0
+
+
+def test_dentry_cache() -> None:
+    cache = DentryCache(3)
+
+    assert cache.get(2, "a") is None
+    cache.put(2, "a", 12, 0o100000)
+    cache.put(2, "b", 0)
+    cache.put_many(12, [("c", 13, None), ("d", 14, None)])
+    assert (12, "d") in cache
+    assert (2, "a") not in cache
+
+    assert cache.get(2, "b") == (0, None)
+    assert cache.get(12, "c") == (13, None)
+    assert cache.cache_info() == DentryCacheInfo(hits=2, misses=1, evictions=1, size=3, capacity=3)
+
+    cache.clear()
+    assert len(cache) == 0
+
+    cache = DentryCache(0)
+    cache.put(2, "a", 12)
+    assert len(cache) == 0
+
+
+def test_extfs_dentry_cache(ext4_multigroup_bin: BinaryIO) -> None:
+    extfs = ExtFS(ext4_multigroup_bin)
+    content = extfs.get("docs/doc_1.txt").open().read()
+
+    # Scanning a directory adds all of its entries
+    extfs.get("docs").listdir()
+    assert (extfs.get("docs").inum, "doc_12.txt") in extfs.dentry_cache
+
+    with pytest.raises(FileNotFoundError):
+        extfs.get("docs/missing.txt")
+
+    # Both existing and missing names are resolved without reading any directory
+    extfs.get_inode.cache_clear()
+    with patch.object(INode, "_lookup_uncached", side_effect=AssertionError("directory read")):
+        assert extfs.get("docs/doc_1.txt").open().read() == content
+        assert extfs.get("docs/doc_12.txt").inum == extfs.dentry_cache.get(extfs.get("docs").inum, "doc_12.txt")[0]
+
+        with pytest.raises(FileNotFoundError):
+            extfs.get("docs/missing.txt")
+
+    assert extfs.cache_info()["dentry"].hits > 0
+
+    extfs = ExtFS(ext4_multigroup_bin, dentry_cache_size=0)
+    assert extfs.get("docs/doc_1.txt").open().read() == content
+    assert len(extfs.dentry_cache) == 0
+
+
+def test_extfs_dentry_cache_versions(ext4_deleted_bin: BinaryIO) -> None:
+    extfs = ExtFS(ext4_deleted_bin)
+
+    # A directory with another version of its inode, e.g. from the journal, doesn't end up in the dentry cache
+    other = INode(extfs, 15, inode=extfs.get_inode(2).inode)
+    assert "kept.txt" in other.listdir()
+    assert other._lookup("kept.txt").inum == 12
+    assert len(extfs.dentry_cache) == 0
+
+    with pytest.raises(FileNotFoundError):
+        extfs.get("/subdir/kept.txt")
+    assert extfs.get("/subdir/other.txt").inum == 17
+
+    # Nor is it served from the dentry cache
+    assert other._lookup("other.txt") is None
+
+
+def test_extfs_block_cache(ext4_multigroup_bin: BinaryIO) -> None:
+    extfs = ExtFS(ext4_multigroup_bin)
+    extfs.block_cache.clear()
+
+    content = extfs.get("docs/doc_1.txt").open().read()
+    extfs.get("logs").listdir()
+    info = extfs.block_cache.cache_info()
+    assert info.misses > 0
+    assert info.size == len(extfs.block_cache) * extfs.block_size
+
+    # Resolving the same path again (with a cold inode cache) is served entirely from the block cache
+    extfs.get_inode.cache_clear()
+    with patch.object(extfs, "read_at", wraps=extfs.read_at) as mock_read_at:
+        extfs.get("docs/doc_1.txt")
+        names = sorted(extfs.get("logs").listdir())
+    assert mock_read_at.call_count == 0
+    assert names == [".", "..", "big.log"]
+    assert extfs.block_cache.cache_info().hits > info.hits
+
+    # File contents are not cached
+    assert extfs.get("docs/doc_1.txt").open().read() == content
+    assert extfs.block_cache.cache_info().size == info.size
+
+    extfs.block_cache.clear()
+    assert extfs.block_cache.cache_info().size == 0
+
+    extfs = ExtFS(ext4_multigroup_bin, block_cache_size=0)
+    assert extfs.get("docs/doc_1.txt").open().read() == content
+    assert len(extfs.block_cache) == 0
+
+
+def test_extfs_cache_config(ext4_multigroup_bin: BinaryIO) -> None:
+    extfs = ExtFS(ext4_multigroup_bin, inode_cache_size=4, group_desc_cache_size=None)
+    for inum in range(11, 21):
+        extfs.get_inode(inum)
+
+    info = extfs.cache_info()
+    assert set(info) == {"inode", "group_desc", "inode_bitmap", "block_bitmap", "block", "dentry"}
+    assert info["inode"].maxsize == 4
+    assert info["inode"].currsize == 4
+    assert info["group_desc"].maxsize is None
+    assert info["block"].capacity == extfs.block_cache.capacity
+
+    with patch.object(ExtFS, "read_at", autospec=True, side_effect=ExtFS.read_at) as mock_read_at:
+        eager = ExtFS(ext4_multigroup_bin, load_group_descs=True)
+        offsets = [call.args[1] for call in mock_read_at.call_args_list]
+    assert eager._group_desc_table is not None
+    assert offsets.count(eager.groups_offset) == 1
+
+    # Group descriptors are parsed from the table that was read at mount time
+    with patch.object(eager, "read_at", wraps=eager.read_at) as mock_read_at:
+        for group in range(eager.groups_count):
+            assert eager._read_group_desc(group).dumps() == extfs._read_group_desc(group).dumps()
+    assert mock_read_at.call_count == 0
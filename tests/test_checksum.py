@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import io
+from typing import TYPE_CHECKING
+
+from dissect.extfs.checksum import (
+    DIR_BLOCK,
+    EXTENT_BLOCK,
+    INODE,
+    JOURNAL_BLOCK,
+    JOURNAL_COMMIT,
+    JOURNAL_SUPERBLOCK,
+    SUPERBLOCK,
+    ChecksumMismatch,
+    ChecksumVerifier,
+    crc16,
+    crc32c,
+)
+from dissect.extfs.extfs import ExtFS
+
+if TYPE_CHECKING:
+    from typing import BinaryIO
+
+
+def _verify_all(extfs: ExtFS) -> None:
+    for _, _, files in extfs.walk():
+        for entry in files:
+            entry.open().read()
+
+    list(extfs.iter_inodes())
+    for group_num in range(extfs.groups_count):
+        extfs._read_inode_bitmap(group_num)
+        extfs._read_block_bitmap(group_num)
+
+
+def test_crc() -> None:
+    assert crc32c(0xFFFFFFFF, b"123456789") ^ 0xFFFFFFFF == 0xE3069283
+    assert crc16(0xFFFF, b"123456789") == 0x4B37
+
+
+def test_checksum_verifier() -> None:
+    mismatches = []
+    verifier = ChecksumVerifier(mismatches.append)
+
+    assert verifier.verify(INODE, 12, 0x1234, 0x1234)
+    assert not verifier.verify(INODE, 13, 0x1234, 0x4321)
+
+    assert verifier.checked == {INODE: 2}
+    assert verifier.errors == {INODE: 1}
+    assert mismatches == [ChecksumMismatch(INODE, 13, 0x1234, 0x4321)]
+
+    verifier.reset()
+    assert not verifier.checked
+    assert not verifier.errors
+
+
+def test_checksum_disabled(ext4_htree_bin: BinaryIO) -> None:
+    extfs = ExtFS(ext4_htree_bin)
+    assert extfs.checksums is None
+    assert extfs.get("/").listdir()
+
+
+def test_checksum_htree(ext4_htree_bin: BinaryIO) -> None:
+    extfs = ExtFS(ext4_htree_bin, verify_checksums=True)
+    _verify_all(extfs)
+
+    # Also covers the hash index blocks of the large directories
+    assert extfs.checksums.checked[SUPERBLOCK] == 1
+    assert extfs.checksums.checked[INODE] > 0
+    assert extfs.checksums.checked[DIR_BLOCK] > 0
+    assert not extfs.checksums.errors
+
+
+def test_checksum_multigroup(ext4_multigroup_bin: BinaryIO) -> None:
+    extfs = ExtFS(ext4_multigroup_bin, verify_checksums=True)
+    _verify_all(extfs)
+
+    assert extfs.checksums.checked[EXTENT_BLOCK] > 0
+    assert not extfs.checksums.errors
+
+
+def test_checksum_mismatch(ext4_symlink_bin: BinaryIO) -> None:
+    buf = bytearray(ext4_symlink_bin.read())
+    extfs = ExtFS(io.BytesIO(buf))
+    inode = extfs.get("/path/to/dir")
+
+    # Corrupt the modification time of the inode
+    group_num, index = divmod(inode.inum - 1, extfs.sb.s_inodes_per_group)
+    offset = extfs._inode_table(extfs._read_group_desc(group_num)) * extfs.block_size
+    offset += index * extfs.sb.s_inode_size
+    buf[offset + 0x10] ^= 0xFF
+
+    mismatches = []
+    extfs = ExtFS(io.BytesIO(buf), verify_checksums=True, checksum_callback=mismatches.append)
+
+    # The mismatch is reported, but the inode is still usable
+    assert extfs.get("/path/to/dir/with/file.ext").link == "../../../../other/path/source/to/my/file.ext"
+    assert extfs.checksums.errors == {INODE: 1}
+    assert [(mismatch.kind, mismatch.identifier) for mismatch in mismatches] == [(INODE, inode.inum)]
+
+
+def test_checksum_journal(ext4_journal_csum_bin: BinaryIO) -> None:
+    extfs = ExtFS(ext4_journal_csum_bin, verify_checksums=True)
+    journal = extfs.journal
+
+    for commit in journal.commits():
+        for descriptor in commit.descriptors:
+            for tag in descriptor.tags():
+                tag.read()
+        for revoke in commit.revokes:
+            revoke.blocks()
+
+    assert extfs.checksums.checked[JOURNAL_SUPERBLOCK] == 1
+    assert extfs.checksums.checked[JOURNAL_COMMIT] == 2
+    assert extfs.checksums.checked[JOURNAL_BLOCK] == 2
+    assert not extfs.checksums.errors
@@ -1,16 +1,26 @@
 from __future__ import annotations
 
 import datetime
+import random
 import stat
+import struct
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
+from itertools import pairwise
 from typing import TYPE_CHECKING, BinaryIO
 from unittest.mock import call, patch
 
+import pytest
+from dissect.util.stream import RunlistStream
+
 from dissect.extfs.c_ext import c_ext
-from dissect.extfs.extfs import EXT4, ExtFS, INode
+from dissect.extfs.extfs import EXT4, ExtFS, INode, _iter_clear_bits
+from dissect.extfs.inode import RawInode
+from dissect.extfs.stream import ExtentStream, MappedRunlistStream, Runlist
 
 if TYPE_CHECKING:
     from logging import Logger
+    from pathlib import Path
 
 
 def test_ext4(ext4_bin: BinaryIO) -> None:
@@ -90,8 +100,418 @@ def test_symlinks(ext4_symlink_bin: BinaryIO) -> None:
 def test_infinite_loop_protection(ExtFS: ExtFS, log: Logger, *args) -> None:
     ExtFS.sb.s_inodes_count = 69
     ExtFS._dirtype = c_ext.ext2_dir_entry_2
+    ExtFS._verify_csum = False
+    ExtFS.block_size = 4096
+    ExtFS.sidecar = None
     inode = INode(ExtFS, 1, filetype=stat.S_IFDIR)
     inode.size = 16
     for _ in inode.iterdir():
         pass
     assert call.critical("Zero-length directory entry in %s (offset 0x%x)", inode, 0) in log.mock_calls
+
+
+def test_iter_inodes(ext4_multigroup_bin: BinaryIO) -> None:
+    extfs = ExtFS(ext4_multigroup_bin)
+    assert extfs.groups_count == 4
+
+    inodes = list(extfs.iter_inodes())
+    # Only the used part of the inode table of group 0 is read, the other groups are uninitialized
+    assert [inode.inum for inode in inodes] == list(range(1, 162))
+    assert list(extfs.iter_inodes([1, 2, 3])) == []
+
+    for inode in inodes:
+        assert inode.inode.dumps() == extfs.get_inode(inode.inum).inode.dumps()
+
+    assert inodes[1].filetype == stat.S_IFDIR
+    assert inodes[1].inode.i_links_count == extfs.root.inode.i_links_count
+
+
+def test_inode_columns(ext4_multigroup_bin: BinaryIO) -> None:
+    extfs = ExtFS(ext4_multigroup_bin)
+
+    columns = extfs.inode_columns()
+    inodes = list(extfs.iter_inodes())
+    assert list(columns.inum) == [inode.inum for inode in inodes]
+
+    for idx, inode in enumerate(inodes):
+        assert columns.mode[idx] == inode.inode.i_mode
+        assert columns.uid[idx] == inode.inode.i_uid | inode.inode.i_uid_high << 16
+        assert columns.gid[idx] == inode.inode.i_gid | inode.inode.i_gid_high << 16
+        assert columns.size[idx] == inode.size
+        assert columns.links[idx] == inode.inode.i_links_count
+        assert columns.flags[idx] == inode.inode.i_flags
+        assert columns.atime_ns[idx] == inode.atime_ns
+        assert columns.mtime_ns[idx] == inode.mtime_ns
+        assert columns.ctime_ns[idx] == inode.ctime_ns
+        assert columns.crtime_ns[idx] == inode.crtime_ns
+        assert columns.dtime[idx] == inode.inode.i_dtime
+
+    for allocated in (True, False):
+        columns = extfs.inode_columns(allocated=allocated)
+        assert list(columns.inum) == [inode.inum for inode in extfs.iter_inodes(allocated=allocated)]
+        assert all(len(column) == len(columns.inum) for column in columns)
+
+    assert [len(group.inum) for group in extfs.iter_inode_columns()] == [161]
+    assert len(extfs.inode_columns([1, 2, 3]).inum) == 0
+
+
+def test_raw_inode(ext4_multigroup_bin: BinaryIO) -> None:
+    extfs = ExtFS(ext4_multigroup_bin)
+    group_desc = extfs._read_group_desc(0)
+    buf = extfs.read_at(extfs._inode_table(group_desc) * extfs.block_size, 32 * extfs.sb.s_inode_size)
+
+    for offset in range(0, len(buf), extfs.sb.s_inode_size):
+        inode_buf = buf[offset : offset + extfs.sb.s_inode_size]
+
+        # Small inodes don't have the extra fields, which are decoded as 0
+        for raw in (inode_buf, inode_buf[:128]):
+            inode = RawInode(raw)
+            parsed = c_ext.ext4_inode(raw.ljust(288, b"\x00"))
+
+            for field in c_ext.ext4_inode.__fields__:
+                assert getattr(inode, field.name) == getattr(parsed, field.name)
+            assert inode.dumps() == parsed.dumps()
+            assert len(inode) == len(parsed)
+
+    assert isinstance(extfs.root.inode, RawInode)
+
+
+def test_bitmaps(ext4_multigroup_bin: BinaryIO) -> None:
+    extfs = ExtFS(ext4_multigroup_bin)
+
+    assert extfs.is_inode_allocated(c_ext.EXT2_ROOT_INO)
+    assert extfs.is_inode_allocated(extfs.get("docs/doc_1.txt").inum)
+    assert not extfs.is_inode_allocated(16)
+    assert not extfs.is_inode_allocated(2048)
+
+    # Block 0 precedes s_first_data_block, group 1 has an uninitialized block bitmap
+    assert extfs.is_block_allocated(0)
+    assert extfs.is_block_allocated(8193)
+    assert extfs.is_block_allocated(8449)
+    assert not extfs.is_block_allocated(8450)
+    assert not extfs.is_block_allocated(extfs.last_block)
+
+    allocated = list(extfs.iter_inodes(allocated=True))
+    unallocated = list(extfs.iter_inodes(allocated=False))
+    assert len(allocated) == 100
+    assert all(extfs.is_inode_allocated(inode.inum) for inode in allocated)
+
+    assert len(unallocated) == 61
+    assert unallocated[0].inum == 16
+    assert unallocated[0].size == 43000
+    assert all(inode.inode.i_dtime for inode in unallocated)
+
+
+def test_unallocated_runs(ext4_multigroup_bin: BinaryIO) -> None:
+    extfs = ExtFS(ext4_multigroup_bin)
+
+    runs = list(extfs.unallocated_runs())
+    free = {block for run_block, run_count in runs for block in range(run_block, run_block + run_count)}
+    assert all((block in free) != extfs.is_block_allocated(block) for block in range(extfs.block_count))
+    assert len(free) == sum(extfs._read_group_desc(num).bg_free_blocks_count_lo for num in range(extfs.groups_count))
+
+    # Adjacent runs are coalesced, group 1 has an uninitialized block bitmap
+    assert all(block + count < next_block for (block, count), (next_block, _) in pairwise(runs))
+    assert (8450, 16385 - 8450) in runs
+    assert sum(runs[-1]) == extfs.block_count
+
+    fh = extfs.open_unallocated()
+    assert fh.size == len(free) * extfs.block_size
+    assert fh.runlist == runs
+
+    fh.seek(runs[0][1] * extfs.block_size)
+    assert fh.read(extfs.block_size) == extfs.read_at(runs[1][0] * extfs.block_size, extfs.block_size)
+
+
+@pytest.mark.parametrize(
+    ("bitmap", "num_bits", "expected"),
+    [
+        (b"\xff\xff", 16, []),
+        (b"\x00\x00", 16, [(0, 16)]),
+        (b"\x00\x00", 12, [(0, 12)]),
+        (b"\x0f\xf0", 16, [(4, 8)]),
+        (b"\x55\xff\x00", 24, [(1, 1), (3, 1), (5, 1), (7, 1), (16, 8)]),
+        (b"\xff\x00\x00", 12, [(8, 4)]),
+    ],
+)
+def test_iter_clear_bits(bitmap: bytes, num_bits: int, expected: list[tuple[int, int]]) -> None:
+    assert list(_iter_clear_bits(bitmap, num_bits)) == expected
+
+
+def test_recover_deleted(ext4_deleted_bin: BinaryIO) -> None:
+    extfs = ExtFS(ext4_deleted_bin)
+
+    deleted = list(extfs.recover_deleted())
+    assert [(entry.inode.inum, entry.name, entry.parent) for entry in deleted] == [
+        (13, "deleted.txt", 2),
+        (14, "frag.bin", 2),
+        (18, "gone", 2),
+        (16, "nested.txt", 15),
+        # Found in the blocks of the deleted directory "gone"
+        (19, "inner.txt", 18),
+    ]
+    assert all(entry.overwritten == 0 for entry in deleted)
+
+    assert deleted[0].open().read() == b"This file was deleted\n" * 100
+    assert deleted[3].open().read() == b"nested deleted file\n" * 10
+    assert deleted[2].inode.filetype == stat.S_IFDIR
+
+    # A fragmented file with an extent tree of depth 1, of which the leaf block is free
+    assert deleted[1].inode.inode.i_block[6:8] == b"\x01\x00"
+    buf = deleted[1].open().read()
+    assert len(buf) == 94208
+    assert [buf[offset] for offset in range(0, len(buf), 8192)] == list(range(0x41, 0x41 + 12))
+    assert buf[4096:8192] == b"\x00" * 4096
+
+    # The data of live files is not recovered
+    assert not any(entry.name in ("kept.txt", "other.txt") for entry in deleted)
+
+
+def test_recover_deleted_residual(ext4_deleted_bin: BinaryIO) -> None:
+    buf = bytearray(ext4_deleted_bin.read())
+    extfs = ExtFS(BytesIO(buf))
+
+    # Like the kernel does, clear the extent count of the deleted file and reuse its first block
+    first_block = extfs.get_inode(13).dataruns()[0][0] - extfs.sb.s_first_data_block
+    inode_offset = extfs._inode_table(extfs._read_group_desc(0)) * extfs.block_size + 12 * extfs.sb.s_inode_size
+    i_block = inode_offset + c_ext.ext4_inode.fields["i_block"].offset
+    struct.pack_into("<H", buf, i_block + 2, 0)
+
+    bitmap = extfs._block_bitmap(extfs._read_group_desc(0)) * extfs.block_size
+    buf[bitmap + first_block // 8] |= 1 << (first_block % 8)
+
+    # Remove the names from the slack of the root directory
+    root_block = extfs.root.dataruns()[0][0] * extfs.block_size
+    buf[root_block + 60 : root_block + 96] = b"\x00" * 36
+
+    extfs = ExtFS(BytesIO(buf))
+    deleted = {entry.inode.inum: entry for entry in extfs.recover_deleted()}
+
+    assert deleted[13].name is None
+    assert deleted[13].inode.inode.i_dtime
+    assert deleted[13].overwritten == 1
+    assert deleted[13].open().read() == b"This file was deleted\n" * 100
+    assert deleted[14].name is None
+    assert deleted[16].name == "nested.txt"
+
+
+def test_concurrent_reads(ext4_multigroup_bin: BinaryIO) -> None:
+    extfs = ExtFS(ext4_multigroup_bin)
+
+    paths = ["docs/doc_1.txt", "data/blob_0.bin", "data/blob_4.bin", "logs/big.log", "frag/fragmented.bin"]
+    expected = {path: extfs.get(path).open().read() for path in paths}
+
+    def read(path: str) -> tuple[str, bytes]:
+        return path, extfs.get(path).open().read()
+
+    with ThreadPoolExecutor(8) as pool:
+        for path, data in pool.map(read, paths * 8):
+            assert data == expected[path]
+
+
+def test_walk(ext4_multigroup_bin: BinaryIO) -> None:
+    extfs = ExtFS(ext4_multigroup_bin)
+
+    result = {path: (dirs, files) for path, dirs, files in extfs.walk()}
+    assert list(result.keys()) == ["/", "/lost+found", "/data", "/docs", "/frag", "/logs"]
+    assert sorted(inode.filename for inode in result["/"][0]) == ["data", "docs", "frag", "logs", "lost+found"]
+    assert len(result["/docs"][1]) == 19
+    assert "doc_7.txt" not in [inode.filename for inode in result["/docs"][1]]
+
+    assert [path for path, _, _ in extfs.walk("/docs")] == ["/docs"]
+    assert [path for path, _, _ in extfs.walk("docs", extfs.get("/docs"))] == ["/docs"]
+
+    # Pruning the subdirectories stops the walk from descending into them
+    walk = extfs.walk()
+    _, dirs, _ = next(walk)
+    dirs.clear()
+    assert list(walk) == []
+
+
+def test_walk_nested(ext4_symlink_bin: BinaryIO) -> None:
+    extfs = ExtFS(ext4_symlink_bin)
+
+    # The yielded paths are absolute, also when starting from an inode of a nested directory
+    expected = [
+        "/other/path/target",
+        "/other/path/target/to",
+        "/other/path/target/to/my",
+    ]
+    assert [path for path, _, _ in extfs.walk("/other/path/target")] == expected
+    assert [path for path, _, _ in extfs.walk("/other/path/target", extfs.get("/other/path/target"))] == expected
+
+
+def test_scandir(ext4_multigroup_bin: BinaryIO) -> None:
+    extfs = ExtFS(ext4_multigroup_bin)
+    extfs.get_inode.cache_clear()
+
+    entries = list(extfs.root.scandir())
+    assert [(entry.name, entry.inum) for entry in entries] == [
+        (".", 2),
+        ("..", 2),
+        ("lost+found", 11),
+        ("data", 12),
+        ("docs", 18),
+        ("frag", 39),
+        ("logs", 160),
+    ]
+    assert all(entry.file_type == stat.S_IFDIR and entry.is_dir() for entry in entries)
+
+    # Listing a directory doesn't touch the inode cache or the inodes of the entries
+    assert extfs.get_inode.cache_info().currsize == 0
+    assert all(entry._inode is None for entry in entries)
+
+    docs = entries[4].inode
+    assert docs.inum == 18
+    assert docs.filename == "docs"
+    assert entries[4].inode is docs
+
+    names = extfs.get("docs").listdir()
+    assert len(names) == 21
+    assert names["doc_1.txt"].filetype == stat.S_IFREG
+    assert names["doc_1.txt"].open().read() == extfs.get("docs/doc_1.txt").open().read()
+
+
+def test_mmap(ext4_multigroup_bin: BinaryIO, tmp_path: Path) -> None:
+    path = tmp_path / "ext4.bin"
+    path.write_bytes(ext4_multigroup_bin.read())
+
+    with path.open("rb") as fh:
+        extfs = ExtFS(fh)
+        mapped = ExtFS(fh, mmap=True)
+        assert extfs._reader.view is None
+        assert mapped._reader.view is not None
+
+        for name in ("logs/big.log", "frag/fragmented.bin", "docs/doc_1.txt"):
+            stream = mapped.get(name).open()
+            assert isinstance(stream, MappedRunlistStream)
+            assert stream.read() == extfs.get(name).open().read()
+
+        content = extfs.get("frag/fragmented.bin").open().read()
+        stream = mapped.get("frag/fragmented.bin").open()
+        stream.seek(1000)
+        view = stream.read_view(24)
+        assert view.obj is mapped._reader._mmap
+        assert view == content[1000:1024]
+
+        # Reads spanning multiple runs are joined
+        stream.seek(2040)
+        view = stream.read_view(16)
+        assert view.obj is not mapped._reader._mmap
+        assert view == content[2040:2056]
+
+        # Closing the filesystem unmaps the file, after which it's read with positional reads again
+        mapping = mapped._reader._mmap
+        del stream, view
+        mapped.close()
+        assert mapped._reader.view is None
+        with pytest.raises(ValueError, match="closed"):
+            len(mapping)
+        assert mapped.get("docs/doc_1.txt").open().read() == extfs.get("docs/doc_1.txt").open().read()
+
+        with ExtFS(fh, mmap=True) as mapped:
+            mapping = mapped._reader._mmap
+        with pytest.raises(ValueError, match="closed"):
+            len(mapping)
+
+    # Not a regular file, so it can't be memory mapped
+    assert ExtFS(ext4_multigroup_bin, mmap=True)._reader.view is None
+
+
+def test_indirect_runlist(ext3_indirect_bin: BinaryIO) -> None:
+    extfs = ExtFS(ext3_indirect_bin)
+
+    inode = extfs.get("indirect.bin")
+    assert not inode.inode.i_flags & c_ext.EXT4_EXTENTS_FL
+    runlist = inode.dataruns()
+    assert isinstance(runlist, Runlist)
+    # The fragment in the direct blocks and the runs interrupted by the indirect blocks
+    assert runlist == [(1594, 3), (1600, 9), (1610, 256), (1868, 84)]
+    assert inode.open().read() == b"".join(b"indirect %08d\n" % i for i in range(20000))
+
+    inode = extfs.get("sparse.bin")
+    assert inode.dataruns() == [(None, 4), (1952, 4), (None, 292), (1958, 5), (None, 71375), (1966, 1)]
+
+    buf = inode.open().read()
+    assert len(buf) == 70 * 1024 * 1024 + 10
+    assert buf[5000:8000] == b"a" * 3000
+    assert buf[300 * 1024 : 300 * 1024 + 5000] == b"b" * 5000
+    assert buf[-10:] == b"c" * 10
+    assert buf.count(0) == len(buf) - 8010
+
+
+def test_runlist() -> None:
+    runlist = Runlist([(10, 2), (12, 3), (None, 1), (None, 2), (20, 1)])
+    assert runlist == [(10, 5), (None, 3), (20, 1)]
+    assert runlist[1] == (None, 3)
+    assert runlist[-1] == (20, 1)
+    assert len(runlist) == 3
+
+    pointers = [*range(100, 150), 0, 0, 0, *range(151, 160), 200, 0, *range(201, 204)]
+    runlist = Runlist()
+    assert runlist.extend_blocks(struct.pack(f"<{len(pointers)}I", *pointers)) == len(pointers)
+    assert runlist == [(100, 50), (None, 3), (151, 9), (200, 1), (None, 1), (201, 3)]
+
+
+def test_extent_stream(ext4_multigroup_bin: BinaryIO) -> None:
+    extfs = ExtFS(ext4_multigroup_bin)
+    inode = extfs.get("frag/fragmented.bin")
+    content = b"".join(b"fragment %08d\n" % i for i in range(12000))
+
+    stream = inode.open()
+    assert isinstance(stream, ExtentStream)
+    assert stream._root[0] == 1
+    assert stream.read() == content
+
+    # Random reads only descend into the leaves they need
+    stream = inode.open()
+    rng = random.Random(1337)
+    for _ in range(100):
+        offset = rng.randrange(len(content))
+        size = rng.randrange(1, 5000)
+        stream.seek(offset)
+        assert stream.read(size) == content[offset : offset + size]
+    assert stream._read_node.cache_info().currsize == 1
+
+    runlist = RunlistStream(extfs.fh, inode.dataruns(), inode.size, extfs.block_size)
+    assert runlist.read() == content
+
+
+def test_extent_stream_sparse() -> None:
+    block_size = 1024
+
+    def node(depth: int, entries: list[bytes]) -> bytes:
+        return struct.pack("<HHHHI", 0xF30A, len(entries), 4, depth, 0) + b"".join(entries)
+
+    def extent(block: int, length: int, start: int) -> bytes:
+        return struct.pack("<IHHI", block, length, start >> 32, start & 0xFFFFFFFF)
+
+    # Leaf at block 5: data, hole, uninitialized extent, hole, data
+    leaf = node(0, [extent(1, 2, 10), extent(4, 0x8000 + 2, 20), extent(8, 1, 30)])
+    root = node(1, [struct.pack("<IIHH", 1, 5, 0, 0)])
+
+    image = bytearray(64 * block_size)
+    image[5 * block_size : 5 * block_size + len(leaf)] = leaf
+    for block in (10, 11, 20, 21, 30):
+        image[block * block_size : (block + 1) * block_size] = bytes([block]) * block_size
+
+    def read_at(offset: int, size: int) -> bytes:
+        return bytes(image[offset : offset + size])
+
+    stream = ExtentStream(read_at, root, 11 * block_size - 100, block_size)
+    expected = (
+        bytes(block_size)
+        + bytes([10]) * block_size
+        + bytes([11]) * block_size
+        + bytes(5 * block_size)
+        + bytes([30]) * block_size
+        + bytes(2 * block_size - 100)
+    )
+    assert stream.read() == expected
+
+    assert stream._lookup(0) == (None, 1)
+    assert stream._lookup(2) == (11, 1)
+    assert stream._lookup(3) == (None, 1)
+    assert stream._lookup(5) == (None, 1)
+    assert stream._lookup(8) == (30, 1)
+    assert stream._lookup(9) == (None, None)
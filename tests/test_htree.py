@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import io
+from typing import BinaryIO
+from unittest.mock import patch
+
+import pytest
+
+from dissect.extfs.c_ext import c_ext
+from dissect.extfs.extfs import ExtFS
+from dissect.extfs.htree import dx_hash
+
+SEED = (0x4E2A6D7C, 0x8A4E1F3B, 0x2B1A2D9C, 0x6F5E4D3C)
+
+
+@pytest.mark.parametrize(
+    ("name", "hash_version", "seed", "expected"),
+    [
+        (b"entry_00042", c_ext.DX_HASH_LEGACY, SEED, (0xDC286F0C, 0)),
+        (b"entry_00042", c_ext.DX_HASH_HALF_MD4, SEED, (0x9FFC2F1C, 0x5A34A81E)),
+        (b"entry_00042", c_ext.DX_HASH_TEA, SEED, (0x470DAD14, 0x18BADC09)),
+        (b"b" * 70, c_ext.DX_HASH_LEGACY, None, (0x7B670D2A, 0)),
+        (b"b" * 70, c_ext.DX_HASH_HALF_MD4, None, (0x8CB10A14, 0xA2859344)),
+        (b"b" * 70, c_ext.DX_HASH_TEA, None, (0x9256B37E, 0x14CC6EE9)),
+        ("été".encode(), c_ext.DX_HASH_LEGACY, None, (0x70D7B7FC, 0)),
+        ("été".encode(), c_ext.DX_HASH_HALF_MD4, None, (0xA69A4D3A, 0x22BAC128)),
+        ("été".encode(), c_ext.DX_HASH_TEA, None, (0x04D337A6, 0x0615A017)),
+    ],
+)
+def test_dx_hash(name: bytes, hash_version: int, seed: tuple[int, ...] | None, expected: tuple[int, int]) -> None:
+    assert dx_hash(name, hash_version, seed) == expected
+
+
+def test_htree_lookup(ext4_htree_bin: BinaryIO) -> None:
+    extfs = ExtFS(ext4_htree_bin)
+    assert extfs.hash_seed == SEED
+
+    big = extfs.get("big")
+    assert big.inode.i_flags & c_ext.EXT4_INDEX_FL
+
+    target = extfs.get("big/target")
+    assert target.open().read() == b"htree target\n"
+
+    with patch.object(big, "scandir", side_effect=AssertionError("linear scan used")):
+        for i in (0, 42, 4321, 7999):
+            inode = big._lookup(f"entry_{i:05d}")
+            assert inode.filename == f"entry_{i:05d}"
+            assert inode.inum == target.inum
+
+        assert big._lookup("nonexistent") is None
+
+
+def test_htree_corrupt_fallback(ext4_htree_bin: BinaryIO) -> None:
+    buf = bytearray(ext4_htree_bin.read())
+
+    # Corrupt the reserved_zero field of the dx_root of the big directory
+    buf[1170 * 1024 + 24] = 0xFF
+
+    extfs = ExtFS(io.BytesIO(buf))
+    assert extfs.get("big/entry_04321").inum == extfs.get("big/target").inum
@@ -0,0 +1,259 @@
+from __future__ import annotations
+
+import struct
+from io import BytesIO
+from typing import TYPE_CHECKING, BinaryIO
+
+from dissect.extfs import journal as journal_module
+from dissect.extfs.c_ext import c_ext
+from dissect.extfs.c_jdb2 import c_jdb2
+from dissect.extfs.extfs import ExtFS
+from dissect.extfs.journal import JDB2, CommitBlock, DescriptorBlock, JournalOverlay, RevokeBlock
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    import pytest
+
+# The ext4_journal.bin.gz test image needs recovery, with these transactions in the journal:
+#  1: an inode table and directory block from before docs/deleted.txt (inode 16) was deleted
+#  2: docs/a.txt "version 1"
+#  3: the same inode table and directory block from after the deletion
+#  4: docs/a.txt "version 2"
+#  5: docs/b.txt, starting with the (escaped) journal magic
+#  6: docs/c.txt "c revoked"
+#  7: revoke of docs/c.txt
+#  8: docs/a.txt "uncommitted", without a commit block
+ITABLE_BLOCK = 101
+DIR_BLOCK = 1618
+A_BLOCK = 1619
+B_BLOCK = 1620
+C_BLOCK = 1621
+
+
+def test_journal_log(ext4_journal_bin: BinaryIO) -> None:
+    extfs = ExtFS(ext4_journal_bin)
+    assert extfs.sb.s_feature_incompat & c_ext.EXT3_FEATURE_INCOMPAT_RECOVER
+
+    journal = extfs.journal
+    log = list(journal.log())
+    assert [(type(block), block.sequence) for block in log] == [
+        *[(cls, seq) for seq in range(1, 7) for cls in (DescriptorBlock, CommitBlock)],
+        (RevokeBlock, 7),
+        (CommitBlock, 7),
+        # Transaction 8 is never committed
+        (DescriptorBlock, 8),
+    ]
+
+    assert log[12].blocks() == [C_BLOCK]
+    assert [(tag.block, tag.journal_block) for tag in log[0].tags()] == [(ITABLE_BLOCK, 2), (DIR_BLOCK, 3)]
+
+    replay_map = journal.replay_map()
+    assert {block: tag.journal_block for block, tag in replay_map.items()} == {
+        ITABLE_BLOCK: 9,
+        DIR_BLOCK: 10,
+        A_BLOCK: 13,
+        B_BLOCK: 16,
+    }
+    assert replay_map[B_BLOCK].escaped
+    assert replay_map[B_BLOCK].read().startswith(b"\xc0\x3b\x39\x98 escaped block\n")
+    assert replay_map[B_BLOCK].open().read() == replay_map[B_BLOCK].read()
+
+
+def test_journal_replay(ext4_journal_bin: BinaryIO) -> None:
+    extfs = ExtFS(ext4_journal_bin)
+    assert extfs.get("docs/a.txt").open().read() == b"version 0\n"
+    assert extfs.get("docs/b.txt").open().read() == b"b original\n"
+
+    replayed = ExtFS(ext4_journal_bin, replay_journal=True)
+    assert isinstance(replayed._reader, JournalOverlay)
+
+    # The newest committed version, not the uncommitted one
+    assert replayed.get("docs/a.txt").open().read() == b"version 2\n"
+    # Escaped blocks are restored
+    assert replayed.get("docs/b.txt").open().read() == b"\xc0\x3b\x39\x98 escape"
+    # Revoked blocks are not replayed
+    assert replayed.get("docs/c.txt").open().read() == b"c original\n"
+
+    # Reads spanning journal and filesystem blocks
+    block_size = extfs.block_size
+    buf = replayed.read_at(A_BLOCK * block_size - 10, 2 * block_size + 20)
+    assert buf[:10] == extfs.read_at(A_BLOCK * block_size - 10, 10)
+    assert buf[10:20] == b"version 2\n"
+    assert buf[block_size + 10 : block_size + 14] == b"\xc0\x3b\x39\x98"
+    assert buf[-10:] == b"c original"
+
+
+def test_journal_replay_mmap(ext4_journal_bin: BinaryIO, tmp_path: Path) -> None:
+    path = tmp_path / "ext4.bin"
+    path.write_bytes(ext4_journal_bin.read())
+
+    with path.open("rb") as fh:
+        replayed = ExtFS(fh, mmap=True, replay_journal=True)
+        # The memory map can't be used directly, as that would bypass the journal
+        assert replayed._reader.view is None
+        assert replayed._reader.reader.view is not None
+        assert replayed.get("docs/a.txt").open().read() == b"version 2\n"
+
+        replayed.close()
+        assert replayed._reader.reader.view is None
+
+
+def test_journal_replay_clean(ext4_multigroup_bin: BinaryIO) -> None:
+    extfs = ExtFS(ext4_multigroup_bin, replay_journal=True)
+    assert not isinstance(extfs._reader, JournalOverlay)
+
+
+def test_journal_block_index(ext4_journal_bin: BinaryIO) -> None:
+    journal = ExtFS(ext4_journal_bin).journal
+
+    commits = list(journal.commits_all())
+    assert [len(commit.revokes) for commit in commits] == [0, 0, 0, 0, 0, 0, 1]
+
+    index = journal.block_index
+    assert set(index) == {ITABLE_BLOCK, DIR_BLOCK, A_BLOCK, B_BLOCK, C_BLOCK}
+    assert [(entry.sequence, entry.journal_block, entry.revoked) for entry in index[A_BLOCK]] == [
+        (2, 6, False),
+        (4, 13, False),
+    ]
+    assert [(entry.sequence, entry.revoked) for entry in index[ITABLE_BLOCK]] == [(1, False), (3, False)]
+    assert [(entry.sequence, entry.revoked) for entry in index[C_BLOCK]] == [(6, True)]
+
+    entry = journal.block_versions(A_BLOCK)[0]
+    assert entry.tag.read().startswith(b"version 1\n")
+    assert entry.commit.sequence == 2
+    assert int(entry.commit.ts.timestamp()) == 1700000000 + 2 * 60
+
+    assert journal.block_versions(1) == []
+    # The index is only built once
+    assert journal.block_index is index
+
+
+def build_journal(
+    transactions: list[list[int]], block_size: int = 1024, maxlen: int = 64, start: int = 1, sequence: int = 1
+) -> BytesIO:
+    """Build a journal without any features, with a transaction for each list of filesystem blocks.
+
+    The transactions are written from journal block ``start`` onwards, wrapping around the end of the journal.
+    Every data block is filled with the number of the filesystem block it's a copy of.
+    """
+    buf = bytearray(maxlen * block_size)
+    magic = c_jdb2.JBD2_MAGIC_NUMBER
+
+    sb = struct.pack(">III", magic, c_jdb2.JBD2_SUPERBLOCK_V2, 0)
+    sb += struct.pack(">IIIII", block_size, maxlen, 1, sequence, start)
+    buf[: len(sb)] = sb
+
+    def write_block(block: int, data: bytes) -> int:
+        buf[block * block_size : block * block_size + len(data)] = data
+        return block + 1 if block + 1 < maxlen else 1
+
+    block = start
+    for seq, blocks in enumerate(transactions, sequence):
+        descriptor = struct.pack(">III", magic, c_jdb2.JBD2_DESCRIPTOR_BLOCK, seq)
+        for i, fs_block in enumerate(blocks):
+            flags = c_jdb2.JBD2_FLAG_LAST_TAG if i == len(blocks) - 1 else 0
+            flags |= c_jdb2.JBD2_FLAG_SAME_UUID if i else 0
+            descriptor += struct.pack(">IHH", fs_block, 0, flags) + (b"" if i else b"\x00" * 16)
+
+        block = write_block(block, descriptor)
+        for fs_block in blocks:
+            block = write_block(block, struct.pack(">I", fs_block) * (block_size // 4))
+
+        commit = struct.pack(">III", magic, c_jdb2.JBD2_COMMIT_BLOCK, seq)
+        commit += b"\x00" * 36 + struct.pack(">QI", 1700000000 + seq, 0)
+        block = write_block(block, commit)
+
+    return BytesIO(bytes(buf))
+
+
+def test_journal_walk_wrap() -> None:
+    # The log starts at block 50 and wraps around to block 1, with the data blocks of transaction 3 wrapping
+    fh = build_journal([[10, 11], [12, 13, 14], [15, 16, 17, 18, 19, 20], [21]], start=50)
+    journal = JDB2(fh)
+
+    walked = [(type(block), block.sequence, block.journal_block) for block in journal.walk()]
+    assert walked == [
+        (DescriptorBlock, 1, 50),
+        (CommitBlock, 1, 53),
+        (DescriptorBlock, 2, 54),
+        (CommitBlock, 2, 58),
+        (DescriptorBlock, 3, 59),
+        (CommitBlock, 3, 3),
+        (DescriptorBlock, 4, 4),
+        (CommitBlock, 4, 6),
+    ]
+    assert walked == [(type(block), block.sequence, block.journal_block) for block in journal.log()]
+
+    tags = list(next(block for block in journal.walk() if block.sequence == 3).tags())
+    assert [(tag.block, tag.journal_block) for tag in tags] == [
+        (15, 60),
+        (16, 61),
+        (17, 62),
+        (18, 63),
+        (19, 1),
+        (20, 2),
+    ]
+    assert [tag.open().read(4) for tag in tags] == [struct.pack(">I", block) for block in range(15, 21)]
+
+    assert [commit.sequence for commit in journal.commits()] == [1, 2, 3, 4]
+    assert {block: tag.journal_block for block, tag in journal.replay_map().items()} == {
+        10: 51,
+        11: 52,
+        12: 55,
+        13: 56,
+        14: 57,
+        15: 60,
+        16: 61,
+        17: 62,
+        18: 63,
+        19: 1,
+        20: 2,
+        21: 5,
+    }
+
+
+def test_journal_walk_chunks(monkeypatch: pytest.MonkeyPatch) -> None:
+    fh = build_journal([[block] * 3 for block in range(20)], maxlen=128)
+    expected = [(type(block), block.sequence, block.journal_block) for block in JDB2(fh).walk()]
+    assert len(expected) == 40
+
+    # Data blocks of descriptor blocks that continue into the next chunk are still skipped
+    monkeypatch.setattr(journal_module, "WALK_CHUNK_SIZE", 3 * 1024)
+    assert [(type(block), block.sequence, block.journal_block) for block in JDB2(fh).walk()] == expected
+
+
+def test_inode_history(ext4_journal_bin: BinaryIO) -> None:
+    extfs = ExtFS(ext4_journal_bin)
+
+    versions = extfs.inode_history(16)
+    assert [(version.sequence, version.journal_block, version.revoked) for version in versions] == [
+        (1, 2, False),
+        (3, 9, False),
+    ]
+    assert [int(version.ts.timestamp()) for version in versions] == [1700000060, 1700000180]
+
+    before, after = (version.inode for version in versions)
+    assert before.inum == after.inum == 16
+    assert before.inode.i_links_count == 1
+    assert before.inode.i_dtime == 0
+    assert after.inode.i_links_count == 0
+    assert after.inode.i_dtime != 0
+    assert before.size == after.size == 22
+
+    assert extfs.inode_history(c_ext.EXT2_ROOT_INO) == []
+
+
+def test_dir_history(ext4_journal_bin: BinaryIO) -> None:
+    extfs = ExtFS(ext4_journal_bin)
+    docs = extfs.get("docs")
+
+    versions = extfs.dir_history(docs.inum)
+    assert [(version.sequence, version.block) for version in versions] == [(1, DIR_BLOCK), (3, DIR_BLOCK)]
+
+    before, after = ({entry.filename: entry.inum for entry in version.entries} for version in versions)
+    assert before["deleted.txt"] == 16
+    assert "deleted.txt" not in after
+    assert set(before) - set(after) == {"deleted.txt"}
+
+    assert extfs.dir_history(extfs.get("docs/a.txt").inum) == []
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import hashlib
+import stat
+from typing import TYPE_CHECKING, BinaryIO
+from unittest.mock import patch
+
+import pytest
+
+from dissect.extfs.exceptions import Error
+from dissect.extfs.extfs import ExtFS, INode
+from dissect.extfs.parallel import hash_files, map_files
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+    from dissect.extfs.extfs import DirEntry
+
+
+def test_hash_files(ext4_multigroup_bin: BinaryIO) -> None:
+    extfs = ExtFS(ext4_multigroup_bin)
+
+    expected = {}
+    for path, _, files in extfs.walk():
+        for inode in files:
+            if inode.filetype == stat.S_IFREG:
+                expected[f"{path.rstrip('/')}/{inode.filename}"] = hashlib.md5(inode.open().read()).digest()
+
+    result = list(hash_files(extfs, algorithm="md5", workers=4, batch_size=16))
+    assert {path: digest for path, _, digest in result} == expected
+    assert len(result) == 85
+
+    # Every batch is ordered by the physical location of the files
+    first_blocks = [inode.dataruns()[0][0] for _, inode, _ in result[:16] if inode.size]
+    assert first_blocks == sorted(first_blocks)
+
+
+def test_map_files_error(ext4_multigroup_bin: BinaryIO) -> None:
+    extfs = ExtFS(ext4_multigroup_bin)
+
+    def func(inode: INode) -> int:
+        if inode.filename == "big.log":
+            raise ValueError("Oops")
+        return inode.size
+
+    result = {path: size for path, _, size in map_files(extfs, func, "/logs")}
+    assert result == {}
+
+    result = {path: size for path, _, size in map_files(extfs, func, "/data")}
+    assert result["/data/blob_0.bin"] == 40000
+
+
+def test_map_files_list_error(ext4_multigroup_bin: BinaryIO) -> None:
+    extfs = ExtFS(ext4_multigroup_bin)
+    scandir = INode.scandir
+
+    def failing_scandir(inode: INode) -> Iterator[DirEntry]:
+        if inode.filename == "docs":
+            raise Error("Corrupt directory")
+        return scandir(inode)
+
+    # A directory that can't be listed is skipped, the other directories are still processed
+    with patch.object(INode, "scandir", failing_scandir):
+        result = {path for path, _, _ in map_files(extfs, lambda inode: inode.size)}
+
+    assert result
+    assert not any(path.startswith("/docs/") for path in result)
+    assert "/data/blob_0.bin" in result
+
+    with pytest.raises(ValueError, match="unsupported hash type"):
+        hash_files(extfs, algorithm="nonexistent")
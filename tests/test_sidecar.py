@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import sqlite3
+from typing import TYPE_CHECKING, BinaryIO
+from unittest.mock import patch
+
+import pytest
+from dissect.util.stream import RunlistStream
+
+from dissect.extfs.exceptions import FileNotFoundError
+from dissect.extfs.extfs import ExtFS, INode
+from dissect.extfs.sidecar import Sidecar
+from dissect.extfs.stream import ExtentStream
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+def test_sidecar(tmp_path: Path) -> None:
+    path = tmp_path / "index.db"
+    sidecar = Sidecar(path, b"key")
+
+    assert sidecar.get_group_descs() is None
+    sidecar.put_group_descs(b"\x01" * 64)
+    assert sidecar.get_group_descs() == b"\x01" * 64
+
+    entries = [(12, "b", 1), (13, "a", None), (14, "invalid \udcff", 2)]
+    assert sidecar.get_dir(2) is None
+    assert sidecar.lookup(2, "a") is None
+    sidecar.put_dir(2, entries)
+    assert sidecar.get_dir(2) == entries
+    assert sidecar.lookup(2, "a") == (13, None)
+    assert sidecar.lookup(2, "invalid \udcff") == (14, 2)
+    assert sidecar.lookup(2, "c") == (0, None)
+
+    sidecar.put_dir(3, [])
+    assert sidecar.get_dir(3) == []
+
+    runs = [(100, 2), (None, 3), (2**40, 1)]
+    sidecar.put_runs(12, b"tag", runs)
+    assert sidecar.get_runs(12, b"tag") == runs
+    assert sidecar.get_runs(12, b"other") is None
+    assert sidecar.get_runs(13, b"tag") is None
+    sidecar.close()
+
+    # The index is kept for the same key and emptied for a different key
+    sidecar = Sidecar(path, b"key")
+    assert sidecar.get_dir(2) == entries
+    sidecar.close()
+
+    sidecar = Sidecar(path, b"other")
+    assert sidecar.get_group_descs() is None
+    assert sidecar.get_dir(2) is None
+    assert sidecar.get_runs(12, b"tag") is None
+    sidecar.close()
+
+
+def test_extfs_sidecar(ext4_multigroup_bin: BinaryIO, tmp_path: Path) -> None:
+    path = tmp_path / "index.db"
+
+    def read_all(extfs: ExtFS) -> list[tuple]:
+        result = []
+        for dirpath, _, files in extfs.walk():
+            result.extend((dirpath, entry.filename, entry.inum, entry.open().read()) for entry in files)
+        return result
+
+    extfs = ExtFS(ext4_multigroup_bin, sidecar=path)
+    expected = read_all(extfs)
+    doc = extfs.get("docs/doc_1.txt")
+    doc_runs = doc.dataruns()
+
+    # Nothing is parsed again when the filesystem is opened with the same index
+    with (
+        patch("dissect.extfs.extfs._parse_dir_entries", side_effect=AssertionError),
+        patch("dissect.extfs.extfs._parse_extents", side_effect=AssertionError),
+        patch("dissect.extfs.extfs._parse_indirect_runs", side_effect=AssertionError),
+    ):
+        extfs = ExtFS(ext4_multigroup_bin, sidecar=path)
+        assert read_all(extfs) == expected
+        assert extfs.get("docs/doc_1.txt").inum == doc.inum
+        assert extfs.get("docs/doc_1.txt").dataruns() == doc_runs
+
+        with pytest.raises(FileNotFoundError):
+            extfs.get("docs/nonexistent")
+
+    assert extfs._group_desc_table == extfs.sidecar.get_group_descs()
+
+    # Closing the filesystem closes the index as well
+    extfs.close()
+    with pytest.raises(sqlite3.ProgrammingError):
+        extfs.sidecar.get_group_descs()
+
+
+def test_extfs_sidecar_versions(ext4_deleted_bin: BinaryIO, tmp_path: Path) -> None:
+    path = tmp_path / "index.db"
+
+    # Listing another version of a directory doesn't store its entries in the index
+    with ExtFS(ext4_deleted_bin, sidecar=path) as extfs:
+        other = INode(extfs, 15, inode=extfs.get_inode(2).inode)
+        assert "kept.txt" in other.listdir()
+        assert other._lookup("kept.txt").inum == 12
+        assert extfs.sidecar.get_dir(15) is None
+
+    with ExtFS(ext4_deleted_bin, sidecar=path) as extfs:
+        assert sorted(extfs.get_inode(15).listdir()) == [".", "..", "other.txt"]
+        assert extfs.get("/subdir/other.txt").inum == 17
+
+    with ExtFS(ext4_deleted_bin, sidecar=path) as extfs:
+        assert extfs.sidecar.get_dir(15) is not None
+        assert INode(extfs, 15, inode=extfs.get_inode(2).inode)._lookup("other.txt") is None
+
+
+def test_extfs_sidecar_runs(ext4_multigroup_bin: BinaryIO, tmp_path: Path) -> None:
+    path = tmp_path / "index.db"
+
+    with ExtFS(ext4_multigroup_bin, sidecar=path) as extfs:
+        # The extent tree is read lazily until the runlist has been stored
+        inode = extfs.get("logs/big.log")
+        assert isinstance(inode.open(), ExtentStream)
+        content = inode.open().read()
+
+        inode.dataruns()
+        assert isinstance(inode.open(), RunlistStream)
+
+    with ExtFS(ext4_multigroup_bin, sidecar=path) as extfs:
+        inode = extfs.get("logs/big.log")
+        with patch("dissect.extfs.extfs._parse_extents", side_effect=AssertionError):
+            stream = inode.open()
+            assert isinstance(stream, RunlistStream)
+            assert stream.read() == content
+
+        # An empty runlist is used as well, without querying the index again
+        inode = extfs.get("docs/doc_1.txt")
+        extfs.sidecar.put_runs(inode.inum, inode._sidecar_tag, [])
+        with patch.object(extfs.sidecar, "get_runs", wraps=extfs.sidecar.get_runs) as get_runs:
+            assert inode.dataruns() == []
+            assert inode.dataruns() == []
+            assert get_runs.call_count == 1
@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import io
+from typing import TYPE_CHECKING
+
+from dissect.extfs.util import PositionalFile, PositionalReader
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+def test_positional_reader(tmp_path: Path) -> None:
+    path = tmp_path / "file.bin"
+    path.write_bytes(bytes(range(256)) * 16)
+
+    with path.open("rb") as fh:
+        reader = PositionalReader(fh)
+        assert reader._fd is not None
+
+        fh.seek(1234)
+        assert reader.read_at(16, 4) == b"\x10\x11\x12\x13"
+        assert reader.read_at(4094, 8) == b"\xfe\xff"
+        assert fh.tell() == 1234
+
+    reader = PositionalReader(io.BytesIO(bytes(range(256))))
+    assert reader._fd is None
+    assert reader.read_at(16, 4) == b"\x10\x11\x12\x13"
+
+
+def test_positional_file() -> None:
+    reader = PositionalReader(io.BytesIO(bytes(range(256))))
+
+    fh_a = PositionalFile(reader.read_at, 256)
+    fh_b = PositionalFile(reader.read_at, 256)
+
+    fh_a.seek(16)
+    fh_b.seek(-2, io.SEEK_END)
+    assert fh_a.read(4) == b"\x10\x11\x12\x13"
+    assert fh_b.read(4) == b"\xfe\xff"
+    assert fh_a.tell() == 20
+    assert fh_b.read() == b""